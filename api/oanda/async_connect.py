@@ -0,0 +1,131 @@
+"""
+asyncio client for Oanda's REST API.
+
+The I/O is still blocking: the requests are done by a Connect object in
+the threads of a ThreadPoolExecutor (see get_executor), and the
+coroutines wait for them without blocking the event loop. They use the
+connection pool shared by all the Connect objects (see
+api.oanda.connect.get_session) and return the same CandleList objects.
+The number of requests running at the same time is limited by the
+number of threads of the executor.
+"""
+import asyncio
+import datetime
+import functools
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from api.oanda.connect import Connect
+from api.params import Params as apiparams
+from forex.candle import Candle, CandleList
+
+ao_logger = logging.getLogger(__name__)
+ao_logger.setLevel(logging.INFO)
+
+# executors shared by the AsyncConnect objects, by number of threads
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(max_workers: int = None) -> ThreadPoolExecutor:
+    """Function to get the ThreadPoolExecutor with 'max_workers' threads
+    shared by the AsyncConnect objects
+
+    Args:
+        max_workers: Max number of requests running at the same time.
+                     Default: apiparams.max_workers
+    """
+    max_workers = max_workers or apiparams.max_workers
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = _executors[max_workers] = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="async_connect")
+        return executor
+
+
+class AsyncConnect(object):
+    """Class representing an asynchronous connection to the Oanda's REST
+    API.
+
+    Args:
+        instrument: i.e. AUD_USD
+        granularity: i.e. D, H12, ...
+        executor: ThreadPoolExecutor doing the requests. Its number of
+                  threads is the max number of requests running at the
+                  same time. Default: get_executor()
+    """
+
+    __slots__ = ["_conn", "_executor"]
+
+    def __init__(self, instrument: str, granularity: str,
+                 executor: ThreadPoolExecutor = None) -> None:
+        self._conn = Connect(instrument=instrument, granularity=granularity)
+        self._executor = executor or get_executor()
+
+    @property
+    def instrument(self) -> str:
+        return self._conn.instrument
+
+    @property
+    def granularity(self) -> str:
+        return self._conn.granularity
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs))
+
+    async def query(self, start: str, end: str = None,
+                    count: int = None) -> CandleList:
+        """Coroutine to query Oanda's REST API. See Connect.query"""
+        return await self._run(self._conn.query, start=start, end=end,
+                               count=count)
+
+    async def fetch_candle(self, d: datetime.datetime) -> Candle:
+        """Coroutine to get a single candle. See Connect.fetch_candle"""
+        return await self._run(self._conn.fetch_candle, d=d)
+
+    def __repr__(self) -> str:
+        return "AsyncConnect"
+
+
+async def gather(*aws, limit: int = None, return_exceptions: bool = False):
+    """Function to run awaitables (i.e. AsyncConnect.query(...) calls)
+    concurrently, like asyncio.gather, but with at most 'limit' of them
+    running at the same time. 'limit' tasks take the awaitables in order,
+    so a coroutine is not started until there is a free slot (tasks and
+    futures are already running). The requests are also limited by the
+    threads of the executor of the AsyncConnect objects
+
+    Args:
+        aws: Awaitables
+        limit: Max number of awaitables running at the same time.
+               Default: apiparams.max_workers
+        return_exceptions: See asyncio.gather
+
+    Returns:
+        list with the results, in the order of 'aws'
+    """
+    results = [None] * len(aws)
+    pending = iter(enumerate(aws))
+
+    async def run():
+        for ix, aw in pending:
+            try:
+                results[ix] = await aw
+            except Exception as err:
+                if not return_exceptions:
+                    # the coroutines not started are discarded
+                    for _, left in pending:
+                        if asyncio.iscoroutine(left):
+                            left.close()
+                    raise
+                results[ix] = err
+
+    n_tasks = min(limit or apiparams.max_workers, len(aws))
+    await asyncio.gather(*(run() for _ in range(n_tasks)))
+    return results
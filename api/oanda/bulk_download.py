@@ -0,0 +1,167 @@
+"""
+Bulk download of candles from Oanda's REST API into a CandleArchive.
+
+The time range of each instrument/granularity is split into chunks of
+apiparams.max_count candles, which are downloaded concurrently (the
+request rate of all the threads is limited by the shared Governor, see
+api.oanda.governor). Each chunk is saved to the archive as soon as it
+is downloaded, so an interrupted download is resumed by running the same
+command again: only the chunks that are not in the archive are
+downloaded.
+
+Usage:
+    PYTHONPATH=. python api/oanda/bulk_download.py \
+        --instruments AUD_USD EUR_USD --granularities D H4 H1 \
+        --start 2010-01-01T00:00:00 --end 2020-01-01T00:00:00 \
+        --archive ARCHIVE_DIR [--workers 4] [--rate 50] [--burst 50]
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import List
+
+from api.oanda.connect import Connect, save_complete
+from api.params import Params as apiparams
+from forex.candle_archive import CandleArchive
+from utils import granularity_seconds
+
+bd_logger = logging.getLogger(__name__)
+bd_logger.setLevel(logging.INFO)
+
+
+def plan_chunks(archive: CandleArchive, instrument: str, granularity: str,
+                start: datetime, end: datetime) -> List[tuple]:
+    """Function to split the parts of the time range from 'start' to 'end'
+    that are not in the archive into chunks of at most apiparams.max_count
+    candles. The start and end of a chunk are both included, so chunks
+    span max_count - 1 periods. Consecutive chunks share their bound, so
+    that the coverage of the archive has no holes between them
+
+    Returns:
+        list of (instrument, granularity, start, end) tuples
+    """
+    span = timedelta(seconds=(apiparams.max_count - 1) *
+                     granularity_seconds(granularity))
+    chunks = []
+    for gstart, gend in archive.missing(instrument, granularity, start, end):
+        cstart = gstart
+        while True:
+            cend = min(cstart + span, gend)
+            chunks.append((instrument, granularity, cstart, cend))
+            if cend >= gend:
+                break
+            cstart = cend
+    return chunks
+
+
+def _fetch_chunk(instrument: str, granularity: str, start: datetime,
+                 end: datetime):
+    conn = Connect(instrument=instrument, granularity=granularity)
+    return conn.fetch_range(start, end, return_forming=True)
+
+
+def download(archive_dir: str, instruments: List[str],
+             granularities: List[str], start: datetime, end: datetime,
+             workers: int = None) -> dict:
+    """Function to download the candles of several instruments and
+    granularities into a CandleArchive
+
+    Arguments:
+        archive_dir: Folder with the CandleArchive
+        instruments: i.e. ['AUD_USD', 'EUR_USD']
+        granularities: i.e. ['D', 'H4']
+        start: Start of the time range
+        end: End of the time range
+        workers: Number of chunks downloaded concurrently.
+                 Default: apiparams.max_workers
+
+    Returns:
+        dict with the number of 'chunks' downloaded, the number of
+        'failed' chunks, the number of 'candles' and the 'seconds' spent
+
+    Raises:
+        APIError if any chunk failed, once the rest have been downloaded
+    """
+    archive = CandleArchive(archive_dir)
+    chunks = [chunk for instrument in instruments
+              for granularity in granularities
+              for chunk in plan_chunks(archive, instrument, granularity,
+                                       start, end)]
+    bd_logger.info(f"{len(chunks)} chunks to download")
+    summary = {"chunks": 0, "failed": 0, "candles": 0, "seconds": 0.0}
+    error = None
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(
+            max_workers=workers or apiparams.max_workers) as ex:
+        futures = {ex.submit(_fetch_chunk, *chunk): chunk for chunk in chunks}
+        # the chunks are saved by this thread only, as the archive can not
+        # be written concurrently
+        for future in as_completed(futures):
+            instrument, granularity, cstart, cend = futures[future]
+            try:
+                clO, forming = future.result()
+            except Exception as err:
+                summary["failed"] += 1
+                error = err
+                bd_logger.error(f"{instrument} {granularity} {cstart} - "
+                                f"{cend} failed: {err}")
+                continue
+            save_complete(archive, clO, cstart, cend, forming)
+            summary["chunks"] += 1
+            summary["candles"] += len(clO)
+            elapsed = time.perf_counter() - t0
+            bd_logger.info(
+                f"[{summary['chunks'] + summary['failed']}/{len(chunks)}] "
+                f"{instrument} {granularity} {cstart} - {cend}: "
+                f"{len(clO)} candles ({summary['candles'] / elapsed:.0f} "
+                f"candles/s)")
+    summary["seconds"] = time.perf_counter() - t0
+    if error is not None:
+        raise error
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Download the candles of several instruments and "
+                    "granularities into a CandleArchive")
+    parser.add_argument("--instruments", required=True, nargs="+",
+                        help="i.e. AUD_USD EUR_USD")
+    parser.add_argument("--granularities", required=True, nargs="+",
+                        help="i.e. D H4 H1")
+    parser.add_argument("--start", required=True,
+                        help="Start datetime. i.e.: 2018-05-21T21:00:00")
+    parser.add_argument("--end", required=True,
+                        help="End datetime. i.e.: 2020-05-21T21:00:00")
+    parser.add_argument("--archive", required=True,
+                        help="Folder with the CandleArchive")
+    parser.add_argument("--workers", type=int,
+                        help="Number of chunks downloaded concurrently. "
+                             "Default: apiparams.max_workers")
+    parser.add_argument("--rate", type=float,
+                        help="Max number of requests per second")
+    parser.add_argument("--burst", type=int,
+                        help="Max number of requests sent at once. "
+                             "Default: --rate")
+    parser.add_argument("--url", default=apiparams.url,
+                        help="URL of the API. i.e. the one of a local "
+                             "api/oanda/replay_server.py")
+
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s %(message)s")
+    apiparams.url = args.url
+    if args.rate:
+        apiparams.rate_limit = args.rate
+        # apiparams.rate_burst would allow a larger burst than the rate
+        apiparams.rate_burst = max(1, int(args.rate))
+    if args.burst:
+        apiparams.rate_burst = args.burst
+
+    summary = download(args.archive, args.instruments, args.granularities,
+                       datetime.fromisoformat(args.start),
+                       datetime.fromisoformat(args.end),
+                       workers=args.workers)
+    print(f"Downloaded {summary['candles']} candles in {summary['chunks']} "
+          f"chunks ({summary['seconds']:.1f}s)")
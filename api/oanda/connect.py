@@ -4,23 +4,209 @@
 @email: ernestolowy@gmail.com
 """
 import datetime
-import time
+import functools
 import logging
 import requests
-import re
 import os
-import json
-import flatdict
+import threading
 import argparse
+import numpy as np
 from datetime import timedelta
 
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from api.oanda.governor import APIError, get_governor
 from api.params import Params as apiparams
+from operator import itemgetter
 from typing import Dict, List
-from forex.candle import CandleList
+from forex.candle import CandleList, CandleListView
+from forex.candle_archive import CandleArchive
+from utils import granularity_seconds, parse_times, to_epoch, from_epoch
+
+try:
+    # orjson is optional, it decodes the responses faster than json
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 o_logger = logging.getLogger(__name__)
 o_logger.setLevel(logging.INFO)
 
+# requests.Session shared by all the Connect objects of this process
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Function to get the requests.Session shared by all the Connect
+    objects. The connections to the API are kept in a pool (see the
+    pool_* and keep_alive attributes of api.params.Params), so
+    consecutive queries do not need a new TCP+TLS handshake. A new
+    Session is created in child processes, as a pool can not be shared
+    across a fork"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=apiparams.pool_connections,
+                    pool_maxsize=apiparams.pool_maxsize)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                if not apiparams.keep_alive:
+                    session.headers["Connection"] = "close"
+                _session, _session_pid = session, pid
+    return _session
+
+
+def close_session() -> None:
+    """Function to close the connections in the shared Session. A new
+    Session will be created by the next query"""
+    global _session
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+
+
+def decode_candles(content: bytes) -> Dict[str, np.ndarray]:
+    """Function to decode the body of a response with candles (in 'mid'
+    prices) straight into the columns of a CandleList
+
+    Args:
+        content: Body of the response
+
+    Returns:
+        dict with the 'time' (int64 seconds since utils.EPOCH), 'o', 'h',
+        'l' and 'c' arrays, and the 'complete' bool array with the
+        'complete' flag of the candles (False while a candle is forming)
+    """
+    candles = json_loads(content)["candles"]
+    prices = np.array(
+        list(map(itemgetter("o", "h", "l", "c"), (c["mid"] for c in candles))),
+        dtype=np.float64).reshape(-1, 4).T.copy()
+    return {"time": parse_times([c["time"] for c in candles]),
+            "o": prices[0], "h": prices[1], "l": prices[2], "c": prices[3],
+            "complete": np.array([c.get("complete", True) for c in candles],
+                                 dtype=bool)}
+
+
+class SingleFlight(object):
+    """Class to share the result of a call among the threads doing the
+    same call at the same time. The first thread (the leader) does the
+    call, and the rest wait for its result
+
+    Class variables:
+        calls: Number of calls done
+        hits: Number of calls that got the result of another thread's call
+    """
+
+    __slots__ = ["calls", "hits", "_inflight", "_lock"]
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func) -> tuple:
+        """Function to call 'func', unless another thread is already doing
+        the call identified by 'key'. In that case, wait for its result
+
+        Returns:
+            tuple with the result of 'func' and a bool that is True if
+            the result is shared with another thread. In that case no
+            thread, the leader included, may modify the result: each one
+            has to work on a copy of it
+
+        Raises:
+            the exception raised by 'func'
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                # event, result, exception and number of followers of the
+                # call
+                flight = self._inflight[key] = [threading.Event(), None,
+                                                None, 0]
+            else:
+                self.hits += 1
+                flight[3] += 1
+        if leader:
+            try:
+                flight[1] = func()
+            except BaseException as err:
+                flight[2] = err
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                flight[0].set()
+        else:
+            flight[0].wait()
+        if flight[2] is not None:
+            raise flight[2]
+        # no follower can join once the call is out of _inflight
+        return flight[1], not leader or flight[3] > 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "hits": self.hits}
+
+    def __repr__(self):
+        return "SingleFlight"
+
+
+# identical queries running at the same time in several threads share a
+# single request
+_single_flight = SingleFlight()
+
+
+def single_flight_stats() -> dict:
+    """Function to get the number of queries done by the Connect objects
+    of this process ('calls') and how many of them shared the request of
+    an identical query running at the same time ('hits')"""
+    return _single_flight.stats()
+
+
+def _utcnow() -> datetime.datetime:
+    """Current time in UTC, as a naive datetime like the candle times"""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def save_complete(archive: CandleArchive, clO: CandleList,
+                  start: datetime, end: datetime,
+                  forming: datetime = None) -> CandleList:
+    """Function to save the complete candles of a CandleList fetched for
+    the time range from 'start' to 'end' to a CandleArchive. The part of
+    the time range with candles that are not complete yet is not
+    recorded as covered by the archive
+
+    Arguments:
+        forming: Time of the first candle returned by the API as not
+                 complete. None if all of them are complete
+
+    Returns:
+        CandleList with the candles that are not complete yet
+    """
+    # the candles are filtered on the 'complete' flag of the API. The
+    # clock only keeps the time range that has not elapsed yet (with no
+    # candles in the response) out of the coverage
+    cend = min(end, _utcnow() - timedelta(
+        seconds=granularity_seconds(clO.granularity)))
+    if forming is not None:
+        cend = min(cend, forming - timedelta(seconds=1))
+    if cend < start:
+        return clO
+    n = int(np.searchsorted(clO.get_column("time"), to_epoch(cend), "right"))
+    archive.save(CandleListView(clO, 0, n), start=start, end=cend,
+                 replace=False)
+    return CandleListView(clO, n, len(clO))
+
 
 class Connect(object):
     """Class representing a connection to the Oanda's REST API.
@@ -67,54 +253,136 @@ class Connect(object):
             raise Exception("No valid number of candles in CandleList")
         return
 
-    def retry(cooloff: int = 5, exc_type=None):
-        """Decorator for retrying connection and prevent TimeOut errors"""
-        if not exc_type:
-            exc_type = [requests.exceptions.ConnectionError]
+    def _fetch(self, params: Dict) -> tuple:
+        """Function to fetch a single page of candles from Oanda's REST API.
+        The request is rate limited and retried by the shared Governor (see
+        api.oanda.governor)
 
-        def real_decorator(function):
-            def wrapper(*args, **kwargs):
-                while True:
-                    try:
-                        return function(*args, **kwargs)
-                    except Exception as e:
-                        if e.__class__ in exc_type:
-                            print("failed (?)")
-                            time.sleep(cooloff)
-                        else:
-                            raise e
-
-            return wrapper
+        Args:
+            params: Query parameters ('from', 'to', 'count', ...)
 
-        return real_decorator
+        Returns:
+            CandleList and the time of its first candle that is not
+            complete (None if all of them are complete)
 
-    def _process_data(self, data: List[flatdict.FlatDict], strip: bool = True):
-        """Process candle data
+        Raises:
+            APIError if the API did not return the candles
+        """
+        resp = get_governor().request(functools.partial(
+            get_session().get,
+            url=f"{apiparams.url}/{self.instrument}/candles",
+            params={"granularity": self.granularity, **params},
+            headers={
+                "content-type": f"{apiparams.content_type}",
+                "Authorization": f"Bearer {os.environ.get('TOKEN')}",
+            },
+            timeout=(apiparams.connect_timeout, apiparams.read_timeout),
+        ))
+        if resp.status_code != 200:
+            raise APIError(f"{resp.status_code}. url used was:\n{resp.url}",
+                           status_code=resp.status_code)
+        columns = decode_candles(resp.content)
+        complete = columns.pop("complete")
+        forming = None if complete.all() else \
+            from_epoch(columns["time"][~complete].min())
+        return CandleList.from_arrays(instrument=self.instrument,
+                                      granularity=self.granularity,
+                                      copy=False, **columns), forming
+
+    def fetch_range(self, start: datetime, end: datetime,
+                    return_forming: bool = False):
+        """Function to fetch the candles from 'start' to 'end' (both
+        included) with a single request, i.e. without the paging, the
+        cache and the sharing of Connect.query. The range must not hold
+        more than apiparams.max_count candles
 
         Args:
-            data: data returned by API
-            strip: If True then remove 'complete' and 'volume' fields
+            return_forming: If True, the time of the first candle that is
+                            not complete (None if all of them are) is also
+                            returned
+
+        Returns:
+            CandleList, or (CandleList, forming) if 'return_forming'
+
+        Raises:
+            APIError if the API did not return the candles
+        """
+        clO, forming = self._fetch({"from": start.isoformat(),
+                                    "to": end.isoformat()})
+        return (clO, forming) if return_forming else clO
+
+    def _pages(self, startObj: datetime, endObj: datetime) -> List[Dict]:
+        """Function to split the time range from 'startObj' to 'endObj'
+        into pages containing at most apiparams.max_count candles. The
+        'from' and 'to' parameters of the API are both included, so each
+        page spans max_count - 1 periods and the next one starts one
+        second after it
+
+        Returns:
+            list of dicts with the 'from' and 'to' parameters of each page
+        """
+        try:
+            span = timedelta(seconds=(apiparams.max_count - 1) *
+                             granularity_seconds(self.granularity))
+        except ValueError:
+            # i.e. monthly candles, which are never split
+            span = endObj - startObj
+        pages = []
+        pstart = startObj
+        while True:
+            pend = min(pstart + span, endObj)
+            pages.append({"from": pstart.isoformat(), "to": pend.isoformat()})
+            if pend >= endObj:
+                return pages
+            pstart = pend + timedelta(seconds=1)
+
+    def _fetch_pages(self, pages: List[Dict]) -> tuple:
+        """Function to fetch the pages returned by self._pages (or a single
+        'count' page) concurrently and merge them into a CandleList
+
+        Returns:
+            CandleList and the time of its first candle that is not
+            complete (None if all of them are complete)
         """
-        keys_to_remove = ["complete", "volume", "time"]
-        cldict = list()
-        for candle in data:
-            atime = re.sub(r"\.\d+Z$", "", candle["time"])
-            if strip:
-                candle = {
-                    key: value
-                    for key, value in candle.items()
-                    if key not in keys_to_remove
-                }
-            candle["time"] = atime
-            newc = {key.replace("mid.", ""): value for key, value in candle.items()}
-            cldict.append(newc)
-        return cldict
-
-    @retry()
+        if len(pages) == 1:
+            return self._fetch(pages[0])
+        o_logger.debug(f"Fetching {len(pages)} pages for {self.instrument} "
+                       f"{self.granularity}")
+        with ThreadPoolExecutor(
+                max_workers=min(apiparams.max_workers, len(pages))) as ex:
+            results = list(ex.map(self._fetch, pages))
+        forming = [f for _, f in results if f is not None]
+        return (CandleList.concat([clO for clO, _ in results]),
+                min(forming) if forming else None)
+
+    def _cached_query(self, startObj: datetime, endObj: datetime) -> CandleList:
+        """Function to get the candles from 'startObj' to 'endObj' through
+        the candle cache in apiparams.cache_dir. Only the parts of the time
+        range that are not in the cache are fetched from the API. Complete
+        candles are saved to the cache and never fetched again, while the
+        last candle (that may still be forming) is always fetched
+
+        Returns:
+            CandleList
+        """
+        cache = CandleArchive(apiparams.cache_dir)
+        fresh = []
+        for gstart, gend in cache.missing(self.instrument, self.granularity,
+                                          startObj, endObj):
+            clO, forming = self._fetch_pages(self._pages(gstart, gend))
+            fresh.append(save_complete(cache, clO, gstart, gend, forming))
+        return CandleList.concat(
+            [cache.load(self.instrument, self.granularity, startObj, endObj)]
+            + fresh)
+
     def query(
         self, start: datetime, end: datetime = None, count: int = None
-    ) -> List[Dict]:
-        """Function to query Oanda's REST API
+    ) -> CandleList:
+        """Function to query Oanda's REST API. Time ranges spanning more
+        candles than the API returns in one response (apiparams.max_count)
+        are split into pages, which are fetched concurrently and merged.
+        If apiparams.cache_dir is set, the time ranges are read through
+        the candle cache in that folder (see Connect._cached_query)
 
         Args:
             start: isoformat
@@ -123,53 +391,44 @@ class Connect(object):
                    number of candles from the start
                    that will be retrieved
         Returns:
-            CandleList"""
+            CandleList. Identical queries running at the same time in other
+            threads share the request, and each of them gets its own copy
+            of the CandleList
+
+        Raises:
+            APIError if the API did not return the candles"""
         startObj = self.validate_datetime(start)
-        start = startObj.isoformat()
-        params = {}
+        cached = False
         if end is not None and count is None:
             endObj = self.validate_datetime(end)
-            min = datetime.timedelta(minutes=1)
-            endObj = endObj + min
-            end = endObj.isoformat()
-            params["to"] = end
+            endObj = endObj + datetime.timedelta(minutes=1)
+            pages = self._pages(startObj, endObj)
+            try:
+                cached = apiparams.cache_dir is not None and \
+                    granularity_seconds(self.granularity) > 0
+            except ValueError:
+                # i.e. monthly candles, which are not cached
+                pass
         elif count is not None:
-            params["count"] = count
+            pages = [{"from": startObj.isoformat(), "count": count}]
         elif end is None and count is None:
             raise Exception(
                 "You need to set at least the 'end' or the " "'count' attribute"
             )
 
-        params["granularity"] = self.granularity
-        params["from"] = start
-        try:
-            resp = requests.get(
-                url=f"{apiparams.url}/{self.instrument}/candles",
-                params=params,
-                headers={
-                    "content-type": f"{apiparams.content_type}",
-                    "Authorization": f"Bearer {os.environ.get('TOKEN')}",
-                },
-            )
-            if resp.status_code != 200:
-                raise ConnectionError(resp.status_code)
-            else:
-                data = json.loads(resp.content.decode("utf-8"))
-                newdata = [flatdict.FlatDict(c, delimiter=".") for c in data["candles"]]
-                newdata1 = self._process_data(data=newdata)
-                return CandleList(
-                    instrument=self.instrument,
-                    granularity=self.granularity,
-                    data=newdata1,
-                )
-        except ConnectionError as err:
-            logging.exception(
-                "Something went wrong. url used was:\n{0}".format(resp.url)
-            )
-            logging.exception("Error message was: {0}".format(err))
-            return CandleList(
-                instrument=self.instrument, granularity=self.granularity, data=[]
-            )
+        if cached:
+            key = (apiparams.url, apiparams.cache_dir, self.instrument,
+                   self.granularity, startObj, endObj)
+            clO, shared = _single_flight.do(
+                key, functools.partial(self._cached_query, startObj, endObj))
+        else:
+            key = (apiparams.url, self.instrument, self.granularity,
+                   tuple(tuple(page.items()) for page in pages))
+            (clO, _), shared = _single_flight.do(
+                key, functools.partial(self._fetch_pages, pages))
+        # a shared CandleList is only read (copied) by the threads that
+        # got it, so each one gets its own
+        return clO.copy() if shared else clO
 
     def validate_datetime(self, datestr: str) -> datetime:
         """Function to parse a string datetime to return
@@ -0,0 +1,351 @@
+"""
+Governor of the requests sent to Oanda's REST API.
+
+All the requests of a process go through the same Governor (see
+get_governor), which:
+
+    - limits the request rate with a token bucket shared by all the
+      threads
+    - retries the requests failing with 429 (Too Many Requests), 5xx or
+      connection errors, waiting an exponential backoff with jitter
+      between attempts, up to a max number of retries
+    - fails fast while the API is down: after a number of consecutive
+      requests failing (after all their retries) the circuit breaker
+      opens, and the requests are rejected until some time has passed
+
+The counters in Governor.stats show how the requests are being
+throttled and retried.
+"""
+import collections
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+
+from typing import Callable
+from api.params import Params as apiparams
+
+g_logger = logging.getLogger(__name__)
+g_logger.setLevel(logging.INFO)
+
+# Governor shared by all the Connect objects of this process
+_governor = None
+_governor_pid = None
+_governor_lock = threading.Lock()
+
+
+class APIError(Exception):
+    """Raised when the API does not return the requested data
+
+    Class variables:
+        status_code: HTTP status code of the response. None if there was
+                     no response
+    """
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(APIError):
+    """Raised when a request is rejected because the circuit breaker is
+    open"""
+
+
+class TokenBucket(object):
+    """Class representing a token bucket limiting the rate of requests.
+    It is safe to share it across threads
+
+    Class variables:
+        rate: Tokens added per second (i.e. max requests per second)
+        capacity: Max number of tokens in the bucket (i.e. max burst of
+                  requests)
+    """
+
+    __slots__ = ["rate", "capacity", "_tokens", "_last", "_lock"]
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Function to take a token from the bucket, waiting until there is
+        one available
+
+        Returns:
+            seconds waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # the token is reserved now, so the waiting threads are
+            # served in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def __repr__(self):
+        return "TokenBucket"
+
+
+class CircuitBreaker(object):
+    """Class representing a circuit breaker. It opens after 'threshold'
+    consecutive failures. Once 'reset_timeout' seconds have passed, a
+    single trial request is allowed (half-open): the circuit closes if
+    it succeeds and opens again if it fails
+
+    Class variables:
+        threshold: Number of consecutive failures opening the circuit
+        reset_timeout: Seconds before allowing a trial request
+    """
+
+    __slots__ = ["threshold", "reset_timeout", "_failures", "_opened",
+                 "_trial", "_lock"]
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened = None
+        # thread sending the trial request
+        self._trial = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half-open'"""
+        with self._lock:
+            if self._opened is None:
+                return "closed"
+            if time.monotonic() - self._opened < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+    def allow(self) -> bool:
+        """Function to check if a request can be sent"""
+        with self._lock:
+            if self._opened is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened < self.reset_timeout:
+                return False
+            # trial request. The rest are rejected until it is resolved
+            self._opened = now
+            self._trial = threading.get_ident()
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened = None
+            self._trial = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial is not None:
+                self._reopen()
+            elif self._failures >= self.threshold:
+                if self._opened is None:
+                    g_logger.warning(f"Circuit breaker opened after "
+                                     f"{self._failures} failures")
+                self._opened = time.monotonic()
+
+    def fail_trial(self) -> bool:
+        """Function to open the circuit again if the calling thread sent
+        the trial request, whatever the failure (429 included)
+
+        Returns:
+            True if the circuit was opened again
+        """
+        with self._lock:
+            if self._trial != threading.get_ident():
+                return False
+            self._reopen()
+            return True
+
+    def _reopen(self) -> None:
+        """To be called with the lock held"""
+        g_logger.warning("Circuit breaker opened again: the trial request "
+                         "failed")
+        self._opened = time.monotonic()
+        self._trial = None
+
+    def __repr__(self):
+        return "CircuitBreaker"
+
+
+class Governor(object):
+    """Class governing the requests sent to the API. The default value of
+    the arguments is taken from api.params.Params
+
+    Args:
+        rate_limit: Max requests per second
+        rate_burst: Max number of requests sent at once
+        max_retries: Max number of retries of a request
+        backoff_base: Seconds of the backoff before the first retry. It
+                      doubles with each retry
+        backoff_max: Max seconds of backoff
+        breaker_threshold: Number of consecutive requests failing after
+                           all the retries that open the circuit breaker
+        breaker_reset: Seconds before retrying once the circuit breaker
+                       is open
+    """
+
+    __slots__ = ["bucket", "breaker", "max_retries", "backoff_base",
+                 "backoff_max", "_counters", "_lock"]
+
+    def __init__(self, rate_limit: float = None, rate_burst: int = None,
+                 max_retries: int = None, backoff_base: float = None,
+                 backoff_max: float = None, breaker_threshold: int = None,
+                 breaker_reset: float = None):
+        self.bucket = TokenBucket(
+            rate=rate_limit or apiparams.rate_limit,
+            capacity=rate_burst or apiparams.rate_burst)
+        self.breaker = CircuitBreaker(
+            threshold=breaker_threshold or apiparams.breaker_threshold,
+            reset_timeout=breaker_reset if breaker_reset is not None
+            else apiparams.breaker_reset)
+        self.max_retries = max_retries if max_retries is not None \
+            else apiparams.max_retries
+        self.backoff_base = backoff_base if backoff_base is not None \
+            else apiparams.backoff_base
+        self.backoff_max = backoff_max if backoff_max is not None \
+            else apiparams.backoff_max
+        self._counters = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def stats(self) -> dict:
+        """Function to get the counters of the Governor:
+
+            requests: requests sent
+            retries: requests retried
+            throttled: 429 responses
+            server_errors: 5xx responses
+            connection_errors: requests without response
+            failures: requests that failed after all the retries
+            rejected: requests rejected by the circuit breaker
+            wait: seconds waited for the rate limit
+            backoff: seconds waited between retries
+
+        Returns:
+            dict
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def backoff(self, attempt: int, retry_after: str = None) -> float:
+        """Function to get the seconds to wait before retrying, using an
+        exponential backoff with full jitter
+
+        Arguments:
+            attempt: Number of retries done so far
+            retry_after: Value of the Retry-After header of the response
+        """
+        delay = random.uniform(0, min(self.backoff_max,
+                                      self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def request(self, send: Callable[[], requests.Response]
+                ) -> requests.Response:
+        """Function to send a request through the Governor
+
+        Arguments:
+            send: Function sending the request, i.e. a partial of
+                  requests.Session.get
+
+        Returns:
+            requests.Response. Responses with a status code other than 429
+            or 5xx are returned to the caller
+
+        Raises:
+            APIError if the request failed after all the retries, or if
+            it was the trial request of a half-open circuit breaker and
+            failed (it is not retried)
+            CircuitOpenError if the circuit breaker is open
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError("Circuit breaker is open: the API "
+                                       "failed too many times")
+            self._count("wait", self.bucket.acquire())
+            self._count("requests")
+            retry_after = None
+            try:
+                resp = send()
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as err:
+                self._count("connection_errors")
+                error = APIError(f"Request failed: {err}")
+            else:
+                if resp.status_code == 429:
+                    self._count("throttled")
+                    retry_after = resp.headers.get("Retry-After")
+                elif resp.status_code >= 500:
+                    self._count("server_errors")
+                else:
+                    self.breaker.record_success()
+                    return resp
+                error = APIError(f"{resp.status_code}. url used was:\n"
+                                 f"{resp.url}", status_code=resp.status_code)
+
+            if self.breaker.fail_trial():
+                self._count("failures")
+                raise error
+            if attempt >= self.max_retries:
+                # the breaker counts the requests, not the attempts, so a
+                # single failing request does not open it
+                self._count("failures")
+                self.breaker.record_failure()
+                raise error
+            delay = self.backoff(attempt, retry_after)
+            g_logger.debug(f"Retrying in {delay:.2f}s: {error}")
+            self._count("retries")
+            self._count("backoff", delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def __repr__(self):
+        return "Governor"
+
+
+def get_governor() -> Governor:
+    """Function to get the Governor shared by all the Connect objects of
+    this process"""
+    global _governor, _governor_pid
+    pid = os.getpid()
+    if _governor is None or _governor_pid != pid:
+        with _governor_lock:
+            if _governor is None or _governor_pid != pid:
+                _governor, _governor_pid = Governor(), pid
+    return _governor
+
+
+def reset_governor() -> None:
+    """Function to discard the shared Governor (and its counters). A new
+    one, using the current api.params.Params, is created by the next
+    request"""
+    global _governor
+    with _governor_lock:
+        _governor = None
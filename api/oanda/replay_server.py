@@ -0,0 +1,290 @@
+"""
+Local stand-in for Oanda's REST API.
+
+It serves /v3/instruments/{instrument}/candles from stored candles
+(CandleList objects, store files or a CandleArchive), so the code
+querying the API (Connect, AsyncConnect, the bots...) can be tested and
+benchmarked end to end without network access. The latency, the errors
+(429, 5xx and timeouts) and the max number of candles per response can
+be configured.
+
+Usage:
+    PYTHONPATH=. python api/oanda/replay_server.py --archive ARCHIVE_DIR \
+        --port 8080 --latency 0.05 --error_rate 0.01
+
+    and set api.params.Params.url to http://127.0.0.1:8080/v3/instruments
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from forex.candle import CandleList
+from forex.candle_archive import CandleArchive
+from utils import to_epoch, from_epoch
+
+rs_logger = logging.getLogger(__name__)
+rs_logger.setLevel(logging.INFO)
+
+PATH_RE = re.compile(r"^/v3/instruments/(\w+)/candles$")
+
+
+class CandlesHandler(BaseHTTPRequestHandler):
+    """Serve the candles of the ReplayServer as Oanda's REST API does"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.n_connections += 1
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with server.lock:
+            server.n_requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            error = server.next_error()
+        try:
+            time.sleep(server.latency)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+        if error == "timeout":
+            # no response, the connection is closed after 'stall' seconds
+            time.sleep(server.stall)
+            self.close_connection = True
+            return
+        if error is not None:
+            self.send_error(error)
+            return
+
+        m = PATH_RE.match(url.path)
+        if m is None:
+            self.send_error(404)
+            return
+        try:
+            body = server.candles(m.group(1), params)
+        except ValueError as err:
+            self.send_error(400, str(err))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Class representing a local server replaying stored candles as
+    Oanda's REST API.
+
+    Args:
+        clists: CandleList objects to serve
+        archive: Folder with a CandleArchive. The candles that are not in
+                 'clists' are taken from it
+        host: Host to bind to
+        port: Port to bind to. Default: a free port
+
+    Class variables:
+        latency: Seconds to wait before answering each request
+        max_count: Max number of candles returned in a response
+        errors: Errors returned (in order) instead of the next responses.
+                A status code or 'timeout'
+        error_rate: Probability of answering with a 500
+        throttle_rate: Probability of answering with a 429
+        timeout_rate: Probability of not answering
+        forming: datetime. The candles starting from it are returned as
+                 not complete
+        stall: Seconds to wait before closing the connection when not
+               answering
+        n_connections: Number of connections accepted
+        n_requests: Number of requests received
+        active: Number of requests being answered
+        max_active: Max number of requests answered at the same time
+    """
+
+    daemon_threads = True
+
+    def __init__(self, clists: list = None, archive: str = None,
+                 host: str = "127.0.0.1", port: int = 0, seed: int = None):
+        super().__init__((host, port), CandlesHandler)
+        self.clists = {(clO.instrument, clO.granularity): clO
+                       for clO in clists or []}
+        self.archive = CandleArchive(archive) if archive else None
+        self.latency = 0
+        self.max_count = 5000
+        self.errors = []
+        self.error_rate = 0
+        self.throttle_rate = 0
+        self.timeout_rate = 0
+        self.forming = None
+        self.stall = 5.0
+        self.n_connections = 0
+        self.n_requests = 0
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Value for api.params.Params.url"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v3/instruments"
+
+    def next_error(self):
+        """Function to get the error injected in the next response (to be
+        called with self.lock held)
+
+        Returns:
+            status code, 'timeout' or None
+        """
+        if self.errors:
+            return self.errors.pop(0)
+        x = self._random.random()
+        if x < self.timeout_rate:
+            return "timeout"
+        if x < self.timeout_rate + self.throttle_rate:
+            return 429
+        if x < self.timeout_rate + self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    def _clist(self, instrument: str, granularity: str) -> CandleList:
+        clO = self.clists.get((instrument, granularity))
+        if clO is None and self.archive is not None:
+            coverage = self.archive.coverage(instrument, granularity)
+            if coverage:
+                clO = self.archive.load(instrument, granularity,
+                                        coverage[0][0], coverage[-1][1])
+                with self.lock:
+                    self.clists[(instrument, granularity)] = clO
+        if clO is None:
+            raise ValueError(f"Invalid value specified for 'instrument': "
+                             f"{instrument} {granularity}")
+        return clO
+
+    def candles(self, instrument: str, params: dict) -> bytes:
+        """Function to get the body of the response to a candles request
+
+        Raises:
+            ValueError if the request is not valid
+        """
+        granularity = params.get("granularity", "S5")
+        if "count" in params and "from" in params and "to" in params:
+            raise ValueError("'count' can not be specified with both "
+                             "'from' and 'to'")
+        count = int(params.get("count", min(500, self.max_count)))
+        if count > self.max_count:
+            raise ValueError("Maximum value for 'count' exceeded")
+        clO = self._clist(instrument, granularity)
+        times = clO.get_column("time")
+        lo, hi = 0, len(times)
+        if "from" in params:
+            lo = int(np.searchsorted(
+                times, to_epoch(_parse_time(params["from"])), "left"))
+        if "to" in params:
+            hi = int(np.searchsorted(
+                times, to_epoch(_parse_time(params["to"])), "right"))
+        if "from" in params and "to" in params:
+            if hi - lo > self.max_count:
+                raise ValueError("Maximum value for 'count' exceeded")
+        elif "from" in params:
+            hi = min(hi, lo + count)
+        else:
+            lo = max(lo, hi - count)
+
+        forming = to_epoch(self.forming) if self.forming else None
+        candles = [{"complete": forming is None or t < forming,
+                    "volume": 100,
+                    "time": from_epoch(t).isoformat() + ".000000000Z",
+                    "mid": {"o": str(o), "h": str(h), "l": str(l),
+                            "c": str(c)}}
+                   for t, o, h, l, c in zip(
+                       *(clO.get_column(name)[lo:hi].tolist()
+                         for name in ("time", "o", "h", "l", "c")))]
+        return json.dumps({"instrument": instrument,
+                           "granularity": granularity,
+                           "candles": candles}).encode()
+
+    def start(self) -> "ReplayServer":
+        """Function to serve in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Function to stop serving and close the socket"""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __repr__(self):
+        return "ReplayServer"
+
+
+def _parse_time(value: str) -> datetime:
+    # i.e. 2019-05-07T21:00:00 or 2019-05-07T21:00:00.000000000Z
+    return datetime.fromisoformat(value[:19])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve stored candles as Oanda's REST API does")
+    parser.add_argument("--archive", help="Folder with a CandleArchive")
+    parser.add_argument("--candles", nargs="*", default=[],
+                        help="Store files (.candles) or pickled CandleLists")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0,
+                        help="Seconds to wait before answering")
+    parser.add_argument("--max_count", type=int, default=5000,
+                        help="Max number of candles per response")
+    parser.add_argument("--error_rate", type=float, default=0,
+                        help="Probability of answering with a 500")
+    parser.add_argument("--throttle_rate", type=float, default=0,
+                        help="Probability of answering with a 429")
+    parser.add_argument("--timeout_rate", type=float, default=0,
+                        help="Probability of not answering")
+    parser.add_argument("--seed", type=int, help="Seed for the errors")
+
+    args = parser.parse_args()
+
+    clists = [CandleList.store_load(f, mmap=False) if f.endswith(".candles")
+              else CandleList.pickle_load(f) for f in args.candles]
+    server = ReplayServer(clists=clists, archive=args.archive,
+                          host=args.host, port=args.port, seed=args.seed)
+    server.latency = args.latency
+    server.max_count = args.max_count
+    server.error_rate = args.error_rate
+    server.throttle_rate = args.throttle_rate
+    server.timeout_rate = args.timeout_rate
+    rs_logger.info(f"Serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
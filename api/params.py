@@ -12,3 +12,25 @@ class Params:
     )
     # the market is open. Default=False
     content_type: str = "application/json"
+    # connection pool shared by all the Connect objects of a process
+    pool_connections: int = 10  # number of hosts kept in the pool
+    pool_maxsize: int = 10  # max number of connections per host
+    keep_alive: bool = True  # reuse the connections between queries
+    connect_timeout: float = 10.0  # seconds
+    read_timeout: float = 60.0  # seconds
+    # max number of candles returned by the API in a response. Longer
+    # time ranges are split into pages
+    max_count: int = 5000
+    # number of pages fetched concurrently
+    max_workers: int = 4
+    # folder with the candle cache used by Connect.query (a
+    # forex.candle_archive.CandleArchive). Default: no cache
+    cache_dir: str = None
+    # governor of the requests (see api.oanda.governor)
+    rate_limit: float = 100.0  # max requests per second
+    rate_burst: int = 100  # max requests sent at once
+    max_retries: int = 5  # retries of requests failing with 429/5xx
+    backoff_base: float = 0.5  # seconds before the first retry
+    backoff_max: float = 30.0  # max seconds between retries
+    breaker_threshold: int = 5  # failed requests in a row opening the circuit
+    breaker_reset: float = 30.0  # seconds before retrying once it is open
@@ -0,0 +1,72 @@
+"""
+Benchmark for the construction of a CandleList from the candle data
+returned by the API.
+
+It compares the bulk ingestion path (CandleList(data=...), which parses
+the whole time column at once) with the previous constructor, which
+built a Candle object and parsed the time with try_parsing_date for each
+candle.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_candlelist_init.py [-n 5000 50000]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from forex.candle import Candle, CandleList
+from utils import try_parsing_date
+
+
+def make_data(n: int) -> list:
+    """Function to create 'n' H1 candles formatted as the candle dicts
+    passed to CandleList(data=...) by Connect.query"""
+    start = datetime(2000, 1, 3, 22, 0)
+    return [{"time": (start + timedelta(hours=i)).strftime(
+                "%Y-%m-%dT%H:%M:%S"),
+             "o": "0.70118", "h": "0.70270", "l": "0.69918", "c": "0.70100"}
+            for i in range(n)]
+
+
+def per_candle(data: list) -> tuple:
+    """Function to build the candles and their times as the previous
+    CandleList(data=...) did"""
+    candles = [Candle(**d) for d in data]
+    times = [try_parsing_date(d["time"]) for d in data]
+    return candles, times
+
+
+def bulk(data: list) -> CandleList:
+    return CandleList(instrument="AUD_USD", granularity="H1", data=data)
+
+
+def timeit(func, data: list, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", type=int, nargs="+",
+                        default=[5000, 50000, 500000],
+                        help="Number of candles")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'candles':>10} {'per-candle (s)':>15} {'bulk (s)':>10} "
+          f"{'speedup':>8}")
+    for n in args.n:
+        data = make_data(n)
+        t_slow = timeit(per_candle, data, args.repeat)
+        t_fast = timeit(bulk, data, args.repeat)
+        print(f"{n:>10} {t_slow:>15.4f} {t_fast:>10.4f} "
+              f"{t_slow / t_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
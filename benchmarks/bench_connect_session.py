@@ -0,0 +1,86 @@
+"""
+Benchmark for the per-request latency of Connect.query with the shared
+connection pool, compared with opening a new connection per request
+(what requests.get does).
+
+The queries go to a local stand-in for the API, so the saving shown is
+the TCP handshake only. Against the real API each new connection also
+needs a TLS handshake, so the saving is larger.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_connect_session.py [-n 500]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from api.oanda import connect
+from api.oanda.connect import Connect
+from api.oanda.governor import reset_governor
+from api.params import Params as apiparams
+
+CANDLES = {"instrument": "AUD_USD", "granularity": "D", "candles": [
+    {"complete": True, "volume": 1000, "time": "2019-05-07T21:00:00.000000000Z",
+     "mid": {"o": "0.70118", "h": "0.70270", "l": "0.69918", "c": "0.70100"}}]}
+
+
+class CandlesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps(CANDLES).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(n: int) -> float:
+    # the rate limit of the governor would otherwise set the pace of the
+    # queries instead of the connections
+    apiparams.rate_limit = 1e9
+    apiparams.rate_burst = 10 ** 9
+    reset_governor()
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    t0 = time.perf_counter()
+    for _ in range(n):
+        conn.query("2019-05-07T21:00:00", "2019-05-07T21:00:00")
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", type=int, default=500,
+                        help="Number of queries")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CandlesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    apiparams.url = f"http://127.0.0.1:{server.server_port}/v3/instruments"
+
+    # a new connection per query
+    get_session = connect.get_session
+    connect.get_session = requests.Session
+    t_new = run(args.n)
+    connect.get_session = get_session
+    # connections reused from the shared pool
+    t_pool = run(args.n)
+
+    server.shutdown()
+    print(f"new connection per query: {t_new * 1000:.3f} ms/query")
+    print(f"shared connection pool:   {t_pool * 1000:.3f} ms/query")
+    print(f"saving: {(t_new - t_pool) * 1000:.3f} ms/query "
+          f"({t_new / t_pool:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
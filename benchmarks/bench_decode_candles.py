@@ -0,0 +1,112 @@
+"""
+Benchmark for the decoding of the candles returned by the API.
+
+It compares the previous decoding path with decoding the response
+straight into columns (api.oanda.connect.decode_candles). The previous
+path flattened each candle into dotted keys (as flatdict.FlatDict did),
+renamed the keys and built a Candle object, and parsed the time with
+try_parsing_date, one candle at a time. The json module used by
+decode_candles (orjson if it is installed) is printed.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_decode_candles.py [-n 5000]
+"""
+import argparse
+import json
+import re
+import time
+from datetime import datetime, timedelta
+
+from api.oanda import connect
+from forex.candle import Candle, CandleList
+from utils import try_parsing_date
+
+
+def make_content(n: int) -> bytes:
+    """Function to create the body of a response with 'n' H1 candles"""
+    start = datetime(2000, 1, 3, 22, 0)
+    candles = [{"complete": True,
+                "volume": 1000,
+                "time": (start + timedelta(hours=i)).strftime(
+                    "%Y-%m-%dT%H:%M:%S.000000000Z"),
+                "mid": {"o": "0.70118", "h": "0.70270", "l": "0.69918",
+                        "c": "0.70100"}}
+               for i in range(n)]
+    return json.dumps({"instrument": "AUD_USD", "granularity": "H1",
+                       "candles": candles}).encode()
+
+
+def flatten(d: dict, prefix: str = "") -> dict:
+    """Function to flatten a nested dict into dotted keys, like
+    flatdict.FlatDict(d, delimiter=".") (no longer a dependency)"""
+    flat = {}
+    for key, value in d.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def flatdict_path(content: bytes) -> list:
+    """Function to decode 'content' as Connect.query and the CandleList
+    constructor did before decode_candles
+
+    Returns:
+        list of Candle objects and list with their datetimes
+    """
+    data = json.loads(content.decode("utf-8"))
+    newdata = [flatten(c) for c in data["candles"]]
+    cldict = []
+    for candle in newdata:
+        atime = re.sub(r"\.\d+Z$", "", candle["time"])
+        candle = {key: value for key, value in candle.items()
+                  if key not in ["complete", "volume", "time"]}
+        candle["time"] = atime
+        cldict.append({key.replace("mid.", ""): value
+                       for key, value in candle.items()})
+    candles = [Candle(**d) for d in cldict]
+    times = [try_parsing_date(d["time"]) for d in cldict]
+    return candles, times
+
+
+def columns_path(content: bytes) -> CandleList:
+    return CandleList.from_arrays(instrument="AUD_USD", granularity="H1",
+                                  copy=False,
+                                  **connect.decode_candles(content))
+
+
+def timeit(func, content: bytes, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(content)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", type=int, nargs="+", default=[5000],
+                        help="Number of candles in the response")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"decode_candles uses {connect.json_loads.__module__}.loads")
+    print(f"{'candles':>10} {'per candle (ms)':>16} {'columns (ms)':>13} "
+          f"{'speedup':>8}")
+    for n in args.n:
+        content = make_content(n)
+        candles, times = flatdict_path(content)
+        clO = columns_path(content)
+        assert clO.get_column("c").tolist() == [c.c for c in candles]
+        assert clO.times == times
+        t_slow = timeit(flatdict_path, content, args.repeat)
+        t_fast = timeit(columns_path, content, args.repeat)
+        print(f"{n:>10} {t_slow * 1000:>16.2f} {t_fast * 1000:>13.2f} "
+              f"{t_slow / t_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+End-to-end benchmark of the queries to the API, using a local
+ReplayServer (see api/oanda/replay_server.py) with a configurable
+latency and error rate instead of Oanda's REST API.
+
+It runs the same monthly queries one after the other with Connect and
+concurrently with AsyncConnect, and prints the throughput and the
+counters of the request Governor.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_replay_pipeline.py [-n 100] \
+        [--latency 0.05] [--error_rate 0.05]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import timedelta
+
+from api.oanda.async_connect import AsyncConnect, gather, get_executor
+from api.oanda.connect import Connect, close_session
+from api.oanda.governor import get_governor, reset_governor
+from api.oanda.replay_server import ReplayServer
+from api.params import Params as apiparams
+from forex.candle import CandleList
+from utils import DATA_DIR
+
+
+def make_ranges(clO: CandleList, n: int) -> list:
+    """Function to pick 'n' random time ranges of 30 days"""
+    rnd = random.Random(0)
+    times = clO.times
+    starts = [rnd.choice(times[:-30]) for _ in range(n)]
+    return [(start.isoformat(), (start + timedelta(days=30)).isoformat())
+            for start in starts]
+
+
+def sequential(ranges: list) -> int:
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    return sum(len(conn.query(start, end)) for start, end in ranges)
+
+
+def concurrent(ranges: list, limit: int) -> int:
+    async def run():
+        conn = AsyncConnect(instrument="AUD_USD", granularity="D",
+                            executor=get_executor(limit))
+        return await gather(*(conn.query(start, end)
+                              for start, end in ranges), limit=limit)
+    return sum(len(clO) for clO in asyncio.run(run()))
+
+
+def report(name: str, func, *args) -> None:
+    close_session()
+    reset_governor()
+    t0 = time.perf_counter()
+    ncandles = func(*args)
+    elapsed = time.perf_counter() - t0
+    stats = get_governor().stats()
+    print(f"{name:<22} {elapsed:>8.2f} s {stats['requests'] / elapsed:>9.1f} "
+          f"req/s {ncandles / elapsed:>10.0f} candles/s "
+          f"(retries: {stats.get('retries', 0)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", type=int, default=100,
+                        help="Number of queries")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Seconds the server waits before answering")
+    parser.add_argument("--error_rate", type=float, default=0.0,
+                        help="Probability of answering with a 500")
+    parser.add_argument("--limit", type=int, default=8,
+                        help="Concurrent queries with AsyncConnect")
+    args = parser.parse_args()
+
+    clO = CandleList.pickle_load(DATA_DIR + "/clist_audusd_2010_2020.pckl")
+    server = ReplayServer(clists=[clO], seed=0).start()
+    server.latency = args.latency
+    server.error_rate = args.error_rate
+    apiparams.url = server.url
+    apiparams.backoff_base = 0.01
+
+    ranges = make_ranges(clO, args.n)
+    report("Connect", sequential, ranges)
+    report(f"AsyncConnect (limit={args.limit})", concurrent, ranges,
+           args.limit)
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
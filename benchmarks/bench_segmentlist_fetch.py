@@ -0,0 +1,104 @@
+"""
+Benchmark for the lookups of a Segment by its start/end in a SegmentList.
+
+It compares scanning the list of Segments (the previous implementation of
+SegmentList.fetch_by_start/fetch_by_end) with the binary search over the
+index arrays of the SegmentList, on seglist_audusd.pckl. The previous
+Segments stored their Candles, so the scan runs over stand-ins holding
+the start/end datetimes computed once.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_segmentlist_fetch.py [-n 10000]
+"""
+import argparse
+import datetime
+import random
+import time
+
+from forex.segment import Segment, SegmentList
+from utils import DATA_DIR
+
+
+class StoredSegment(object):
+    """Segment as it was before it was backed by an index range: start()
+    and end() read the time of a stored Candle"""
+
+    __slots__ = ["segment", "_start", "_end"]
+
+    def __init__(self, segment: Segment):
+        self.segment = segment
+        self._start = segment.start()
+        self._end = segment.end()
+
+    def start(self) -> datetime:
+        return self._start
+
+    def end(self) -> datetime:
+        return self._end
+
+
+def scan_by_start(slist: list, dt: datetime, max_diff: int = 3600):
+    for s in slist:
+        if s.start() == dt or s.start() > dt or \
+             abs(s.start()-dt) <= datetime.timedelta(0, max_diff):
+            return s.segment
+    return None
+
+
+def scan_by_end(slist: list, dt: datetime, max_diff: int = 3600):
+    for s in reversed(slist):
+        if s.end() == dt or s.end() < dt or \
+             s.end()-dt <= datetime.timedelta(0, max_diff):
+            return s.segment
+
+
+def bisect_by_start(seglist: SegmentList, dt: datetime):
+    return seglist.fetch_by_start(dt)
+
+
+def bisect_by_end(seglist: SegmentList, dt: datetime):
+    return seglist.fetch_by_end(dt)
+
+
+def timeit(func, seglist, dts: list, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for dt in dts:
+            func(seglist, dt)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", type=int, default=10000,
+                        help="Number of lookups")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    seglist = SegmentList.pickle_load(DATA_DIR + "/seglist_audusd.pckl")
+    rnd = random.Random(0)
+    span = int((seglist.end() - seglist.start()).total_seconds())
+    dts = [seglist.start() + datetime.timedelta(
+        seconds=rnd.randrange(0, span, 3600)) for _ in range(args.n)]
+    stored = [StoredSegment(s) for s in seglist.slist]
+    for dt in dts[:500]:
+        assert scan_by_start(stored, dt) is bisect_by_start(seglist, dt)
+        assert scan_by_end(stored, dt) is bisect_by_end(seglist, dt)
+
+    print(f"{len(seglist)} segments, {args.n} lookups")
+    print(f"{'lookup':>15} {'scan (ms)':>10} {'bisect (ms)':>12} "
+          f"{'speedup':>8}")
+    for name, slow, fast in [("fetch_by_start", scan_by_start,
+                              bisect_by_start),
+                             ("fetch_by_end", scan_by_end, bisect_by_end)]:
+        t_slow = timeit(slow, stored, dts, args.repeat)
+        t_fast = timeit(fast, seglist, dts, args.repeat)
+        print(f"{name:>15} {t_slow * 1000:>10.1f} {t_fast * 1000:>12.1f} "
+              f"{t_slow / t_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,14 +4,19 @@
 @email: ernestolowy@gmail.com
 """
 import logging
+import operator
 import pickle
+from collections.abc import Sequence
 from datetime import timedelta, datetime
 
-import pandas as pd
+import numpy as np
 import matplotlib
 from pandas.plotting import register_matplotlib_converters
 
-from utils import try_parsing_date, calculate_pips
+from forex import candle_store
+from forex.range_extrema import RangeExtrema
+from forex.zigzag import ZigZag
+from utils import calculate_pips, to_epoch, from_epoch, parse_times
 from params import clist_params
 
 register_matplotlib_converters()
@@ -117,25 +122,168 @@ class Candle(object):
         return ", ".join(sb)
 
 
+class _CandleSequence(Sequence):
+    """Read-only sequence of the Candles in a CandleList.
+
+    Candle objects are not stored, they are materialised from the
+    CandleList columns when indexed or iterated"""
+
+    __slots__ = ["_clist"]
+
+    def __init__(self, clist: "CandleList") -> None:
+        self._clist = clist
+
+    def __len__(self):
+        return len(self._clist)
+
+    def __getitem__(self, ix):
+        if isinstance(ix, slice):
+            return [self._clist._make_candle(i)
+                    for i in range(*ix.indices(len(self)))]
+        ix = operator.index(ix)
+        if ix < 0:
+            ix += len(self)
+        if ix < 0 or ix >= len(self):
+            raise IndexError("CandleList index out of range")
+        return self._clist._make_candle(ix)
+
+    def __iter__(self):
+        clist = self._clist
+        rsi = clist._rsi.tolist() if clist._rsi is not None else None
+        for ix, values in enumerate(zip(clist._time.tolist(),
+                                        clist._o.tolist(),
+                                        clist._h.tolist(),
+                                        clist._c.tolist(),
+                                        clist._l.tolist())):
+            c = Candle(from_epoch(values[0]), *values[1:])
+            if rsi is not None:
+                c.rsi = rsi[ix]
+            yield c
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, Sequence)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _ewm_sums(x: np.ndarray, beta: float, block: int = 256) -> np.ndarray:
+    """Calculate num[i] = beta*num[i-1]+x[i] (with num[-1]=0), which is the
+    numerator of an adjusted exponentially weighted mean. The recursion is
+    vectorised within blocks: num[s+j] = beta**j*(beta*num[s-1]+cumsum(
+    x[s+i]/beta**i)[j]), the blocks are short enough for beta**-j not to
+    overflow"""
+    if beta == 0:
+        return np.array(x, dtype=np.float64)
+    num = np.empty(len(x))
+    powers = beta ** np.arange(block)
+    carry = 0.0
+    for s in range(0, len(x), block):
+        xb = x[s:s + block]
+        pw = powers[:len(xb)]
+        num[s:s + len(xb)] = pw * (beta * carry + np.cumsum(xb / pw))
+        carry = num[s + len(xb) - 1]
+    return num
+
+
+def _calc_rsi(avg_gain, avg_loss):
+    """RSI from the average gains and losses (losses are <= 0)"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = np.abs(avg_gain / avg_loss)
+        return 100 - (100 / (1 + rs))
+
+
+def rsi_bounces(rsi: np.ndarray, type, windows: list = None):
+    """Function to calculate the number of times that the RSI has been in
+    the overbought (>70, for type='short') or oversold (<30, for
+    type='long') regions and the number of candles of each of the times.
+    RSI values equal to the threshold (or NaN) do not change the region.
+
+    Arguments:
+        rsi: Array with the RSI values
+        type: 'long'/'short'. A list with one type per window if 'windows'
+              is provided
+        windows: list of (start_ix, end_ix) tuples (end_ix not included).
+                 Optional
+
+    Returns:
+        dict: {number: 3, lengths: [4,5,6]} or a list of dicts (one per
+        window) if 'windows' is provided
+    """
+    rsi = np.asarray(rsi, dtype=np.float64)
+    single = windows is None
+    if single:
+        windows, types = [(0, len(rsi))], [type]
+    else:
+        types = type if isinstance(type, (list, tuple)) else \
+            [type] * len(windows)
+
+    # positions where the region is known and whether the RSI is in
+    # the overbought/oversold region at each of them
+    regions = {}
+    for atype in set(types):
+        if atype == "short":
+            inside, outside = rsi > 70, rsi < 70
+        elif atype == "long":
+            inside, outside = rsi < 30, rsi > 30
+        else:
+            continue
+        ixs = np.flatnonzero(inside | outside)
+        regions[atype] = (ixs, inside[ixs])
+
+    results = []
+    for (start_ix, end_ix), atype in zip(windows, types):
+        if atype not in regions:
+            results.append({"number": 0, "lengths": []})
+            continue
+        ixs, inside = regions[atype]
+        inside = inside[np.searchsorted(ixs, start_ix):
+                        np.searchsorted(ixs, end_ix)]
+        # run-length encoding of the 'inside' runs
+        edges = np.diff(np.concatenate(([0], inside.view(np.int8), [0])))
+        lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+        results.append({"number": len(lengths),
+                        "lengths": lengths.tolist()})
+    return results[0] if single else results
+
+
 class CandleList(object):
     """Class containing a list of Candles.
 
+    The prices are stored column-wise in read-only NumPy arrays (times are
+    stored as int64 seconds since utils.EPOCH) and Candle objects are only
+    materialised when accessed through self.candles or when iterating.
+
     Class variables:
         instrument: i.e. 'AUD_USD'
         granularity: i.e. 'D'
-        candles: List of Candle objects
+        candles: Sequence of Candle objects
         type: Type of this CandleList. Possible values are 'long'/'short'"""
 
     __slots__ = [
         "instrument",
         "granularity",
         "data",
-        "candles",
         "_type",
-        "times",
         "pos",
+        "_time",
+        "_o",
+        "_h",
+        "_l",
+        "_c",
+        "_rsi",
+        "_order",
+        "_stime",
+        "_buf",
+        "_rsi_state",
+        "_extrema",
     ]
 
+    # name of the columns holding the price data
+    COLUMNS = ("time", "o", "h", "l", "c", "rsi")
+
     def __init__(
         self, instrument: str, granularity: str,
         data: list = None, candles=None
@@ -144,119 +292,451 @@ class CandleList(object):
 
         Arguments:
             data: list of Dictionaries, each dict containing data for a Candle
-
-        self.times will be a list of datetime objects
+            candles: list of Candle objects
         """
         if candles:
-            self.candles = candles
-            self.times = [c.time for c in candles]
+            self._set_columns_from_candles(candles)
         elif data:
-            self.candles = [Candle(**d) for d in data]
-            self.times = [
-                try_parsing_date(d["time"]) if isinstance(d["time"], str) else d["time"]
-                for d in data
-            ]
+            self._set_columns(
+                time=parse_times([d["time"] for d in data]),
+                o=[d["o"] for d in data],
+                h=[d["h"] for d in data],
+                l=[d["l"] for d in data],
+                c=[d["c"] for d in data])
         else:
-            self.candles = []
-            self.times = []
+            self._set_columns(time=[], o=[], h=[], l=[], c=[])
         self.instrument = instrument
         self.granularity = granularity
         self._type = self._guess_type()
 
+    @classmethod
+    def from_arrays(cls, instrument: str, granularity: str, time, o, h, l, c,
+                    rsi=None, copy: bool = True) -> "CandleList":
+        """Function to create a CandleList from its columns
+
+        Arguments:
+            time: int64 seconds since utils.EPOCH
+            o, h, l, c: Prices
+            rsi: RSI values. Optional
+            copy: If False, the arrays that already have the right dtype
+                  are used as the columns instead of being copied. The
+                  CandleList then owns them: they are made read-only and
+                  must not be modified by the caller
+        """
+        clO = cls.__new__(cls)
+        clO._set_columns(time=time, o=o, h=h, l=l, c=c, rsi=rsi, copy=copy)
+        clO.instrument = instrument
+        clO.granularity = granularity
+        clO._type = clO._guess_type()
+        return clO
+
+    @classmethod
+    def concat(cls, clists: list) -> "CandleList":
+        """Function to merge several CandleLists into a CandleList sorted
+        by time, keeping a single Candle per time (the one in the last
+        CandleList containing it). The RSI is not kept
+
+        Arguments:
+            clists: list of CandleList objects with the same instrument
+                    and granularity
+
+        Returns:
+            CandleList object
+        """
+        columns = {name: np.concatenate([x.get_column(name)
+                                         for x in reversed(clists)])
+                   for name in ("time", "o", "h", "l", "c")}
+        # np.unique returns the index of the first occurrence
+        _, ixs = np.unique(columns["time"], return_index=True)
+        return cls.from_arrays(instrument=clists[0].instrument,
+                               granularity=clists[0].granularity,
+                               copy=False,
+                               **{name: arr[ixs]
+                                  for name, arr in columns.items()})
+
+    def _set_columns(self, time, o, h, l, c, rsi=None,
+                     copy: bool = False) -> None:
+        """Set the columns. If 'copy' is False, the arrays with the right
+        dtype are used (and made read-only) instead of being copied"""
+        asarray = np.array if copy else np.asarray
+        self._time = asarray(time, dtype=np.int64)
+        self._o = asarray(o, dtype=np.float64)
+        self._h = asarray(h, dtype=np.float64)
+        self._l = asarray(l, dtype=np.float64)
+        self._c = asarray(c, dtype=np.float64)
+        self._rsi = None if rsi is None else asarray(rsi, dtype=np.float64)
+        for name in self.COLUMNS:
+            arr = getattr(self, f"_{name}")
+            if arr is not None:
+                arr.flags.writeable = False
+        self._buf = None
+        self._rsi_state = None
+        self._extrema = {}
+        # the time index is built on the first datetime lookup, so loading
+        # a memory-mapped store does not read the whole 'time' column
+        self._order = None
+        self._stime = None
+
+    def _append_columns(self, time, o, h, l, c, rsi=None) -> None:
+        """Append rows to the columns. The columns are prefixes of growth
+        buffers whose capacity is doubled when full, so appending a single
+        Candle is O(1) amortized. Arrays previously returned by get_column
+        are not modified"""
+        new = {"time": time, "o": o, "h": h, "l": l, "c": c}
+        if self._rsi is not None:
+            new["rsi"] = np.full(len(time), np.nan) if rsi is None else rsi
+        n, k = len(self), len(time)
+        buf = self._buf
+        if buf is None or buf.keys() != new.keys() or \
+                n + k > len(buf["time"]) or \
+                any(getattr(self, f"_{name}").base is not buf[name]
+                    for name in new):
+            # the columns are not (or no longer) backed by our buffers
+            buf = {}
+            for name in new:
+                arr = getattr(self, f"_{name}")
+                buf[name] = np.empty(max(2 * n, n + k, 16), dtype=arr.dtype)
+                buf[name][:n] = arr
+            self._buf = buf
+        last = self._time[-1] if n else None
+        for name, values in new.items():
+            buf[name][n:n + k] = values
+            arr = buf[name][:n + k]
+            arr.flags.writeable = False
+            setattr(self, f"_{name}", arr)
+        # the ZigZag objects only need to process the new candles
+        zigzags = {key: zz for key, zz in self._extrema.items()
+                   if isinstance(zz, ZigZag)}
+        for (_, name, _), zz in zigzags.items():
+            zz.update(getattr(self, f"_{name}"))
+        self._extrema = zigzags
+        new_time = self._time[n:]
+        if self._stime is not None and self._order is None and \
+                (last is None or k == 0 or new_time[0] >= last) and \
+                np.all(new_time[1:] >= new_time[:-1]):
+            self._stime = self._time
+        else:
+            self._order = None
+            self._stime = None
+        self._type = self._guess_type()
+
+    def _build_time_index(self) -> None:
+        """Build the sorted time index used for the datetime lookups.
+        When the candles are already sorted (the usual case) the 'time'
+        column is used directly as index"""
+        if np.all(self._time[1:] >= self._time[:-1]):
+            self._order = None
+            self._stime = self._time
+        else:
+            self._order = np.argsort(self._time, kind="stable")
+            self._stime = self._time[self._order]
+
+    def _time_index(self) -> tuple:
+        """Function to get the sorted time index, building it if needed
+
+        Returns:
+            (stime, order). 'stime' are the sorted times and 'order' the
+            positions of the candles in that order (None if the candles
+            are already sorted)
+        """
+        if self._stime is None:
+            self._build_time_index()
+        return self._stime, self._order
+
+    def _set_columns_from_candles(self, candles) -> None:
+        candles = list(candles)
+        rsi = [getattr(c, "rsi", None) for c in candles]
+        if all(v is None for v in rsi):
+            rsi = None
+        else:
+            rsi = [np.nan if v is None else v for v in rsi]
+        self._set_columns(time=[to_epoch(c.time) for c in candles],
+                          o=[c.o for c in candles],
+                          h=[c.h for c in candles],
+                          l=[c.l for c in candles],
+                          c=[c.c for c in candles],
+                          rsi=rsi)
+
+    def __getstate__(self):
+        # the growth buffers and the time index are rebuilt on load
+        return {key: getattr(self, key) for key in self.__slots__
+                if hasattr(self, key)
+                and key not in ("_buf", "_order", "_stime", "_extrema")}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        state = dict(state)
+        if "candles" in state:
+            # CandleList pickled before the columnar storage was introduced
+            self._set_columns_from_candles(state.pop("candles"))
+            state.pop("times", None)
+        else:
+            for key in ("_order", "_stime", "_buf", "_extrema"):
+                state.pop(key, None)
+            self._set_columns(**{name: state.pop(f"_{name}")
+                                 for name in self.COLUMNS})
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def _make_candle(self, ix: int) -> Candle:
+        """Materialise the Candle at position 'ix'"""
+        c = Candle(time=from_epoch(self._time[ix]),
+                   o=self._o[ix],
+                   h=self._h[ix],
+                   c=self._c[ix],
+                   l=self._l[ix])
+        if self._rsi is not None:
+            c.rsi = float(self._rsi[ix])
+        return c
+
     @property
     def type(self):
         return self._type
 
+    @property
+    def candles(self) -> _CandleSequence:
+        """Sequence of Candle objects in this CandleList"""
+        return _CandleSequence(self)
+
+    @property
+    def times(self) -> list:
+        """List with the datetime of each Candle"""
+        return [from_epoch(t) for t in self._time.tolist()]
+
+    def get_column(self, name: str) -> np.ndarray:
+        """Function to get a read-only array with the values of a column.
+
+        Arguments:
+            name: One of CandleList.COLUMNS. 'time' values are int64 seconds
+                  since utils.EPOCH
+
+        Returns:
+            numpy array. None if name='rsi' and calc_rsi has not been run
+        """
+        if name not in self.COLUMNS:
+            raise ValueError(f"Invalid column name: {name}")
+        return getattr(self, f"_{name}")
+
+    def extrema(self, name: str) -> RangeExtrema:
+        """Function to get the RangeExtrema object used to calculate the
+        max/min of a price column over any range of candles in O(1). It is
+        built the first time it is requested and then cached
+
+        Arguments:
+            name: 'o', 'h', 'l' or 'c'
+
+        Returns:
+            RangeExtrema object
+        """
+        if name not in ("o", "h", "l", "c"):
+            raise ValueError(f"Invalid price column: {name}")
+        ext = self._extrema.get(name)
+        if ext is None:
+            ext = self._extrema[name] = RangeExtrema(
+                getattr(self, f"_{name}"))
+        return ext
+
+    def zigzag(self, th_bounces: float, name: str = "c") -> np.ndarray:
+        """Function to get the peaks and valleys of a price column as
+        identified by the ZigZag indicator. The ZigZag object is cached
+        and only the new candles are processed when candles are appended
+
+        Arguments:
+            th_bounces: Min relative change to define a peak or a valley
+            name: 'o', 'h', 'l' or 'c'
+
+        Returns:
+            Same as forex.zigzag.peak_valley_pivots(column, th_bounces,
+            -th_bounces)
+        """
+        return self._zigzag(th_bounces, name).pivots()
+
+    def _zigzag(self, th_bounces: float, name: str) -> ZigZag:
+        if name not in ("o", "h", "l", "c"):
+            raise ValueError(f"Invalid price column: {name}")
+        key = ("zigzag", name, th_bounces)
+        zz = self._extrema.get(key)
+        if zz is None:
+            zz = self._extrema[key] = ZigZag(getattr(self, f"_{name}"),
+                                             th_bounces, -th_bounces)
+        return zz
+
     def __iter__(self):
         self.pos = 0
         return self
 
     def __next__(self):
-        if self.pos < len(self.candles):
+        if self.pos < len(self):
             self.pos += 1
-            return self.candles[self.pos - 1]
+            return self._make_candle(self.pos - 1)
         else:
             raise StopIteration
 
+    def _find(self, adatetime: datetime) -> int:
+        """Get the index of the Candle starting at 'adatetime'. Candles
+        starting 1h after or before 'adatetime' will be also considered in
+        order to deal with time shifts
+
+        Returns:
+            index. None if there is no Candle for 'adatetime'
+        """
+        t = to_epoch(adatetime)
+        stime, order = self._time_index()
+        for ft in (t, t + 3600, t - 3600):
+            pos = int(np.searchsorted(stime, ft))
+            if pos < len(stime) and stime[pos] == ft:
+                return pos if order is None else int(order[pos])
+
+    def nearest(self, adatetime: datetime,
+                tolerance: timedelta = None) -> int:
+        """Function to get the index of the Candle with the time
+        closest to 'adatetime'.
+
+        Arguments:
+            adatetime: Query datetime
+            tolerance: Max difference allowed between 'adatetime' and the
+                       time of the Candle. If None, then the closest Candle
+                       is returned regardless of the difference
+
+        Returns:
+            index. None if there is no Candle within 'tolerance'. If two
+            candles are equally close, the older one is returned
+        """
+        if len(self) == 0:
+            return None
+        t = to_epoch(adatetime)
+        stime, order = self._time_index()
+        pos = int(np.searchsorted(stime, t))
+        candidates = [p for p in (pos - 1, pos) if 0 <= p < len(self)]
+        sel = min(candidates, key=lambda p: abs(int(stime[p]) - t))
+        if tolerance is not None and \
+                abs(int(stime[sel]) - t) > tolerance.total_seconds():
+            return None
+        return sel if order is None else int(order[sel])
+
     def __getitem__(self, adatetime: datetime) -> Candle:
         if not isinstance(adatetime, datetime):
             raise ValueError("A datetime object is needed!")
-        fdt = None
-        if adatetime not in self.times:
-            dtp1 = adatetime + timedelta(hours=1)
-            dtm1 = adatetime - timedelta(hours=1)
-            if dtp1 in self.times:
-                fdt = dtp1
-            elif dtm1 in self.times:
-                fdt = dtm1
-        else:
-            fdt = adatetime
-        if fdt:
-            return self.candles[self.times.index(fdt)]
+        ix = self._find(adatetime)
+        if ix is not None:
+            return self._make_candle(ix)
 
     def __index__(self, adatetime: datetime) -> int:
-        fdt = None
-        if adatetime not in self.times:
-            dtp1 = adatetime + timedelta(hours=1)
-            dtm1 = adatetime - timedelta(hours=1)
-            if dtp1 in self.times:
-                fdt = dtp1
-            elif dtm1 in self.times:
-                fdt = dtm1
-        else:
-            fdt = adatetime
-        if fdt:
-            return self.times.index(fdt)
-        else:
+        ix = self._find(adatetime)
+        if ix is None:
             raise ValueError(f"{adatetime} not in self.times")
+        return ix
 
     def __len__(self):
-        return len(self.candles)
+        return len(self._time)
 
     def __add__(self, ClO):
-        clist = self.candles + ClO.candles
-        newClO = CandleList(
+        if self._rsi is None and ClO._rsi is None:
+            rsi = None
+        else:
+            rsi = np.concatenate([
+                x._rsi if x._rsi is not None else np.full(len(x), np.nan)
+                for x in (self, ClO)])
+        newClO = CandleList.from_arrays(
             instrument=self.instrument,
-            granularity=self.granularity, candles=clist
-        )
+            granularity=self.granularity,
+            rsi=rsi,
+            copy=False,
+            **{name: np.concatenate([getattr(self, f"_{name}"),
+                                     getattr(ClO, f"_{name}")])
+               for name in ("time", "o", "h", "l", "c")})
         return newClO
 
     def _guess_type(self) -> str:
-        if len(self.candles) == 0:
+        if len(self) == 0:
             return None
-        price_1st = self.candles[0].c
-        price_last = self.candles[-1].c
+        price_1st = self._c[0]
+        price_last = self._c[-1]
         if price_1st > price_last:
             return "short"  # or downtrend
         elif price_1st < price_last:
             return "long"  # or uptrend
 
     def calc_rsi(self):
-        """Calculate the RSI for a certain candle list"""
+        """Calculate the RSI for a certain candle list.
+
+        Average gains and losses are exponentially weighted means with
+        com=rsi_period-1 (i.e. Wilder's smoothing). The EWM state is kept
+        so update_rsi can extend the RSI to new candles"""
         cl_logger.debug("Running calc_rsi")
 
-        series = [c.c for c in self.candles]
+        rsi_period = clist_params.rsi_period
+        beta = 1 - 1 / rsi_period
+        chg = np.diff(self._c)
+        num_gain = _ewm_sums(np.where(chg > 0, chg, 0.0), beta)
+        num_loss = _ewm_sums(np.where(chg < 0, chg, 0.0), beta)
+        # den[i] = beta*den[i-1]+1, with den[0] = 1
+        nobs = np.arange(1, len(chg) + 1)
+        den = nobs.astype(np.float64) if beta == 1 else \
+            (1 - beta ** nobs) / (1 - beta)
+
+        rsi = np.full(len(self), np.nan)
+        rsi[1:] = _calc_rsi(num_gain / den, num_loss / den)
+        rsi[1:][nobs < rsi_period] = np.nan
+
+        # set the rsi column of the CandleList
+        self._rsi = np.round(rsi, 2)
+        self._rsi.flags.writeable = False
+        self._buf = None
+        if len(chg):
+            self._rsi_state = (float(num_gain[-1]), float(num_loss[-1]),
+                               float(den[-1]), len(chg), float(self._c[-1]))
+        else:
+            self._rsi_state = None
+        cl_logger.debug("Done calc_rsi")
 
-        df = pd.DataFrame({"close": series})
-        chg = df["close"].diff(1)
+    def update_rsi(self, new_candles) -> None:
+        """Function to append new candles to this CandleList and to
+        calculate their RSI. The EWM state left by calc_rsi (or by a
+        previous update_rsi) is carried forward, so the cost only depends
+        on the number of new candles. If there is no state (i.e. calc_rsi
+        has not been run) the RSI is calculated for the whole CandleList.
 
-        gain = chg.mask(chg < 0, 0)
-        loss = chg.mask(chg > 0, 0)
+        Arguments:
+            new_candles: list of Candle objects or CandleList. The candles
+                         must be more recent than the last Candle in self
+        """
+        if isinstance(new_candles, CandleList):
+            new = new_candles._window_columns(0, len(new_candles))
+            new.pop("rsi")
+        else:
+            new_candles = list(new_candles)
+            new = {"time": [to_epoch(c.time) for c in new_candles],
+                   "o": [c.o for c in new_candles],
+                   "h": [c.h for c in new_candles],
+                   "l": [c.l for c in new_candles],
+                   "c": [c.c for c in new_candles]}
+        state = self._rsi_state
+        if state is None or self._rsi is None:
+            self._append_columns(**new)
+            self.calc_rsi()
+            return
 
         rsi_period = clist_params.rsi_period
-        avg_gain = gain.ewm(com=rsi_period - 1, min_periods=rsi_period).mean()
-        avg_loss = loss.ewm(com=rsi_period - 1, min_periods=rsi_period).mean()
-
-        rs = abs(avg_gain / avg_loss)
-        rsi = 100 - (100 / (1 + rs))
-
-        rsi4cl = rsi[-len(self.candles) :]
-        # set rsi attribute in each candle of the CandleList
-        ix = 0
-        for _, v in zip(self.candles, rsi4cl):
-            self.candles[ix].rsi = round(v, 2)
-            ix += 1
-        cl_logger.debug("Done calc_rsi")
+        beta = 1 - 1 / rsi_period
+        num_gain, num_loss, den, nobs, last_close = state
+        rsi = []
+        for close in np.asarray(new["c"], dtype=np.float64).tolist():
+            chg = close - last_close
+            num_gain = beta * num_gain + (chg if chg > 0 else 0.0)
+            num_loss = beta * num_loss + (chg if chg < 0 else 0.0)
+            den = beta * den + 1
+            nobs += 1
+            last_close = close
+            if nobs < rsi_period:
+                rsi.append(np.nan)
+            else:
+                rsi.append(round(float(_calc_rsi(np.float64(num_gain / den),
+                                                 np.float64(num_loss / den))),
+                                 2))
+        self._append_columns(rsi=rsi, **new)
+        self._rsi_state = (num_gain, num_loss, den, nobs, last_close)
 
     def pickle_dump(self, outfile: str) -> str:
         """Function to pickle this particular CandleList
@@ -290,11 +770,51 @@ class CandleList(object):
 
         return inclO
 
-    def calc_rsi_bounces(self) -> dict:
+    def store_dump(self, outfile: str) -> str:
+        """Function to write this CandleList to a binary store file (see
+        forex.candle_store), which can be opened without unpickling
+        any object
+
+        Arguments:
+            outfile: Path to store file
+
+        Returns:
+            path to store file
+        """
+        return candle_store.write_store(
+            outfile, self.instrument, self.granularity,
+            **self._window_columns(0, len(self)))
+
+    @classmethod
+    def store_load(cls, infile: str, mmap: bool = True):
+        """Function to load a CandleList from a binary store file
+
+        Arguments:
+            infile: Path to store file
+            mmap: If True (default), the columns are memory-mapped so the
+                  candle data is only paged in when used
+
+        Returns:
+            CandleList object
+        """
+        header, columns = candle_store.read_store(infile, mmap=mmap)
+        return cls.from_arrays(instrument=header["instrument"],
+                               granularity=header["granularity"],
+                               copy=False,
+                               **columns)
+
+    def calc_rsi_bounces(self, windows: list = None):
         """Calculate the number of times that the
         price has been in overbought (>70) or
         oversold (<30) regions
 
+        Arguments:
+            windows: list of (start, end) datetime tuples. If provided,
+                     the bounces are calculated within each of the windows
+                     (both ends included), using the type guessed from the
+                     first and last candles of each window. The RSI array
+                     is processed only once for all the windows
+
         Returns:
             dict:
                  {number: 3
@@ -303,58 +823,46 @@ class CandleList(object):
             has been in overbought/oversold and lengths list
             is formed by the number of candles that the price
             has been in overbought/oversold each of the times
-            sorted from older to newer
+            sorted from older to newer.
+            A list with one dict per window if 'windows' is provided
         """
-        adj = False
-        num_times, length = 0, 0
-        lengths = []
-
-        for c in self.candles:
-            if c.rsi is None:
-                raise Exception(
-                    "RSI values are not defined for this "
-                    "Candlelist, "
-                    "run calc_rsi first"
-                )
-            if self.type is None:
+        if self._rsi is None:
+            raise Exception(
+                "RSI values are not defined for this "
+                "Candlelist, "
+                "run calc_rsi first"
+            )
+        if windows is None:
+            if len(self) > 0 and self.type is None:
                 raise Exception("type is not defined for this Candlelist")
+            return rsi_bounces(self._rsi, self.type)
 
-            if self.type == "short":
-                if c.rsi > 70 and adj is False:
-                    num_times += 1
-                    length = 1
-                    adj = True
-                elif c.rsi > 70 and adj is True:
-                    length += 1
-                elif c.rsi < 70:
-                    if adj is True:
-                        lengths.append(length)
-                    adj = False
-            elif self.type == "long":
-                if c.rsi < 30 and adj is False:
-                    num_times += 1
-                    length = 1
-                    adj = True
-                elif c.rsi < 30 and adj is True:
-                    length += 1
-                elif c.rsi > 30:
-                    if adj is True:
-                        lengths.append(length)
-                    adj = False
-
-        if adj is True and length > 0:
-            lengths.append(length)
-
-        if num_times != len(lengths):
-            raise Exception("Number of times" "and lengths do not" "match")
-        return {"number": num_times, "lengths": lengths}
+        stime, order = self._time_index()
+        if order is None:
+            rsi, c = self._rsi, self._c
+        else:
+            rsi, c = self._rsi[order], self._c[order]
+        starts = np.searchsorted(stime,
+                                 [to_epoch(w[0]) for w in windows], "left")
+        ends = np.searchsorted(stime,
+                               [to_epoch(w[1]) for w in windows], "right")
+        types = []
+        for start_ix, end_ix in zip(starts.tolist(), ends.tolist()):
+            if end_ix <= start_ix:
+                types.append(None)
+            elif c[start_ix] > c[end_ix - 1]:
+                types.append("short")
+            elif c[start_ix] < c[end_ix - 1]:
+                types.append("long")
+            else:
+                raise Exception("type is not defined for window "
+                                f"{from_epoch(stime[start_ix])}")
+        return rsi_bounces(rsi, types,
+                           windows=list(zip(starts.tolist(), ends.tolist())))
 
     def get_length_pips(self) -> int:
         """Function to calculate the length of CandleList in number of pips"""
 
-        start_cl = self.candles[0]
-        end_cl = self.candles[-1]
-
         (first, second) = self.instrument.split("_")
         round_number = None
         if first == "JPY" or second == "JPY":
@@ -362,8 +870,8 @@ class CandleList(object):
         else:
             round_number = 4
 
-        start_price = round(float(start_cl.c), round_number)
-        end_price = round(float(end_cl.c), round_number)
+        start_price = round(float(self._c[0]), round_number)
+        end_price = round(float(self._c[-1]), round_number)
 
         diff = (start_price - end_price) * 10**round_number
 
@@ -372,12 +880,13 @@ class CandleList(object):
     def slice(
         self, start: datetime, end: datetime, inplace: bool = False
     ) -> "CandleList":
-        """Function to slice self on a date interval. It will modify
-        the CandleList in place
+        """Function to slice self on a date interval. If inplace=False,
+        a CandleListView sharing the storage of self is returned
 
         Arguments:
             start: Slice the CandleList from this 'start' datetime.
             end:  This CandleList will have this 'end' datetime.
+            inplace: If True, then modify the CandleList in place
 
         Raises
         ------
@@ -390,25 +899,33 @@ class CandleList(object):
             fgran = self.granularity.replace("H", "")
             delta = timedelta(hours=int(fgran))
 
-        while not self.__getitem__(start):
+        while self._find(start) is None:
             start = start + delta
-        while not self.__getitem__(end):
+        while self._find(end) is None:
             end = end + delta
-        start_ix = self.__index__(start)
-        end_ix = self.__index__(end)
+        start_ix = self._find(start)
+        end_ix = self._find(end)
         if not inplace:
-            cl = CandleList(
-                instrument=self.instrument,
-                granularity=self.granularity,
-                candles=self.candles[start_ix: end_ix + 1],
-            )
-            return cl
+            return CandleListView(self, start_ix, end_ix + 1)
         else:
-            self.candles = self.candles[start_ix: end_ix + 1]
-            self.times = self.times[start_ix: end_ix + 1]
+            self._set_columns(**self._window_columns(start_ix, end_ix + 1))
             self._type = self._guess_type()
             return self
 
+    def _window_columns(self, start_ix: int, end_ix: int) -> dict:
+        """Views of the columns between 'start_ix' and 'end_ix'"""
+        return {name: getattr(self, f"_{name}")[start_ix: end_ix]
+                if getattr(self, f"_{name}") is not None else None
+                for name in self.COLUMNS}
+
+    def copy(self) -> "CandleList":
+        """Function to get a copy of this CandleList not sharing the
+        storage with self"""
+        return CandleList.from_arrays(
+            instrument=self.instrument,
+            granularity=self.granularity,
+            **self._window_columns(0, len(self)))
+
     def get_lasttime(self, price: float, type: str) -> datetime:
         """Function to get the datetime for last time that price has been
           above/below a price level
@@ -418,20 +935,17 @@ class CandleList(object):
                    price was above/below
             trade type: either long/short
         """
-        count = 0
-        for c in reversed(self.candles):
-            count += 1
-            # Last time has to be at least forexparams.min candles before
-            if count <= clist_params.min:
-                continue
-            if type == "long":
-                if c.h < price:
-                    return c.time
-            elif type == "short":
-                if c.l > price:
-                    return c.time
-
-        return self.candles[0].time
+        # Last time has to be at least forexparams.min candles before
+        n = max(len(self) - clist_params.min, 0)
+        ix = None
+        if type == "long":
+            ix = self.extrema("h").last_below(price, end=n)
+        elif type == "short":
+            ix = self.extrema("l").last_above(price, end=n)
+        if ix is not None:
+            return from_epoch(self._time[ix])
+
+        return from_epoch(self._time[0])
 
     def get_highest(self) -> float:
         """Function to calculate the highest
@@ -440,13 +954,9 @@ class CandleList(object):
         Returns:
             highest price
         """
-        max = 0.0
-        for cl in self.candles:
-            price = cl.c
-            if price > max:
-                max = price
-
-        return max
+        if len(self) == 0:
+            return 0.0
+        return max(self.extrema("c").max(), 0.0)
 
     def get_lowest(self) -> float:
         """Function to calculate the lowest
@@ -455,15 +965,9 @@ class CandleList(object):
         Returns:
             lowest price
         """
-        min = None
-        for cl in self.candles:
-            price = cl.c
-            if min is None:
-                min = price
-            else:
-                if price < min:
-                    min = price
-        return min
+        if len(self) == 0:
+            return None
+        return self.extrema("c").min()
 
     def __repr__(self):
         return "CandleList"
@@ -475,3 +979,95 @@ class CandleList(object):
                 sb.append("{key}='{value}'".format(key=key,
                                                    value=getattr(self, key)))
         return ", ".join(sb)
+
+
+class CandleListView(CandleList):
+    """Class representing a window of the candles in a CandleList.
+
+    The view shares the read-only columns of the parent CandleList, so
+    creating it does not copy any candle data. The view supports the
+    CandleList API and copy() can be used to get an independent CandleList.
+
+    Class variables:
+        parent: CandleList holding the storage
+        start_ix: Index in parent of the first Candle in the view
+        end_ix: Index in parent following the last Candle in the view
+    """
+
+    __slots__ = ["parent", "start_ix", "end_ix"]
+
+    def __init__(self, parent: CandleList, start_ix: int, end_ix: int):
+        if not 0 <= start_ix <= end_ix <= len(parent):
+            raise ValueError(f"Invalid window: {start_ix}-{end_ix} for "
+                             f"CandleList of length {len(parent)}")
+        columns = parent._window_columns(start_ix, end_ix)
+        # views always point to the CandleList holding the storage
+        if isinstance(parent, CandleListView):
+            start_ix += parent.start_ix
+            end_ix += parent.start_ix
+            parent = parent.parent
+        self.parent = parent
+        self.start_ix = start_ix
+        self.end_ix = end_ix
+        self.instrument = parent.instrument
+        self.granularity = parent.granularity
+        for name, arr in columns.items():
+            setattr(self, f"_{name}", arr)
+        self._buf = None
+        self._rsi_state = None
+        self._extrema = {}
+        self._order = None
+        if parent._stime is not None and parent._order is None:
+            # a window of sorted times is also sorted
+            self._stime = self._time
+        else:
+            self._stime = None
+        self._type = self._guess_type()
+
+    def slice(
+        self, start: datetime, end: datetime, inplace: bool = False
+    ) -> CandleList:
+        if not inplace:
+            return super().slice(start=start, end=end)
+        view = super().slice(start=start, end=end)
+        CandleListView.__init__(self, self,
+                                view.start_ix - self.start_ix,
+                                view.end_ix - self.start_ix)
+        return self
+
+    def _shares_column(self, name: str) -> bool:
+        """Is the column in the parent still the storage of the view?"""
+        arr, parent_arr = getattr(self, f"_{name}", None), \
+            getattr(self.parent, f"_{name}", None)
+        return len(self) > 0 and parent_arr is not None and \
+            self.end_ix <= len(parent_arr) and \
+            arr.__array_interface__["data"][0] == \
+            parent_arr.__array_interface__["data"][0] + \
+            self.start_ix * parent_arr.itemsize
+
+    def extrema(self, name: str) -> RangeExtrema:
+        # use the sparse tables of the parent
+        if self._shares_column(name):
+            return self.parent.extrema(name).window(self.start_ix,
+                                                    self.end_ix)
+        return super().extrema(name)
+
+    def zigzag(self, th_bounces: float, name: str = "c") -> np.ndarray:
+        # the scan of the window stops when it meets the one of the parent
+        if self._shares_column(name):
+            return self.parent._zigzag(th_bounces, name).pivots(
+                self.start_ix, self.end_ix)
+        return super().zigzag(th_bounces, name)
+
+    def _append_columns(self, *args, **kwargs) -> None:
+        raise TypeError("A CandleListView can not be extended, "
+                        "use copy() to get an independent CandleList")
+
+    def __reduce__(self):
+        # pickle only the window, as an independent CandleList
+        return (CandleList.from_arrays,
+                (self.instrument, self.granularity, self._time, self._o,
+                 self._h, self._l, self._c, self._rsi))
+
+    def __repr__(self):
+        return "CandleListView"
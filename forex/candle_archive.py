@@ -0,0 +1,234 @@
+"""Local archive of candles.
+
+The archive is a directory with one store file (see forex.candle_store)
+per instrument, granularity and year:
+
+    root/AUD_USD/H8/2019.candles
+    root/AUD_USD/H8/2020.candles
+    root/AUD_USD/H8/coverage.json
+
+'coverage.json' keeps the time intervals that have been saved to the
+archive, so it is possible to know if the archive contains all the
+candles for a certain time range (or just some of them).
+"""
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+try:
+    # fcntl is not available on Windows, where the saves are only
+    # serialized across the threads of a process
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import numpy as np
+
+from forex import candle_store
+from forex.candle import CandleList
+from utils import to_epoch, from_epoch
+
+# create logger
+ca_logger = logging.getLogger(__name__)
+ca_logger.setLevel(logging.INFO)
+
+# lock of each instrument/granularity folder, held while its partitions
+# and coverage.json are updated
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _folder_lock(folder: str):
+    """Context manager locking an instrument/granularity folder for the
+    threads of this process and, with a lock on the '.lock' file of the
+    folder, for the other processes"""
+    with _locks_lock:
+        lock = _locks.setdefault(os.path.abspath(folder), threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(folder, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CandleArchive(object):
+    """Class representing a local archive of candles partitioned by
+    instrument/granularity/year
+
+    Class variables:
+        root: Folder containing the archive
+    """
+
+    __slots__ = ["root"]
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _dir(self, instrument: str, granularity: str) -> str:
+        return os.path.join(self.root, instrument, granularity)
+
+    def _partition(self, instrument: str, granularity: str,
+                   year: int) -> str:
+        return os.path.join(self._dir(instrument, granularity),
+                            f"{year}.candles")
+
+    def coverage(self, instrument: str, granularity: str) -> list:
+        """Function to get the time intervals saved in the archive
+
+        Returns:
+            list of (start, end) datetime tuples sorted by start
+        """
+        infile = os.path.join(self._dir(instrument, granularity),
+                              "coverage.json")
+        if not os.path.exists(infile):
+            return []
+        with open(infile) as f:
+            return [(datetime.fromisoformat(start),
+                     datetime.fromisoformat(end))
+                    for start, end in json.load(f)]
+
+    def _add_coverage(self, instrument: str, granularity: str,
+                      start: datetime, end: datetime) -> None:
+        # to be called with the lock of the folder held
+        intervals = []
+        for istart, iend in sorted(self.coverage(instrument, granularity) +
+                                   [(start, end)]):
+            if intervals and istart <= intervals[-1][1]:
+                intervals[-1][1] = max(intervals[-1][1], iend)
+            else:
+                intervals.append([istart, iend])
+        outfile = os.path.join(self._dir(instrument, granularity),
+                               "coverage.json")
+        with tempfile.NamedTemporaryFile(
+                "w", dir=os.path.dirname(outfile), prefix="coverage.json.",
+                suffix=".tmp", delete=False) as f:
+            json.dump([[istart.isoformat(), iend.isoformat()]
+                       for istart, iend in intervals], f)
+        os.replace(f.name, outfile)
+
+    def covers(self, instrument: str, granularity: str,
+               start: datetime, end: datetime) -> bool:
+        """Function to check if all the candles between 'start' and 'end'
+        have been saved to the archive"""
+        return any(istart <= start and end <= iend
+                   for istart, iend in self.coverage(instrument, granularity))
+
+    def missing(self, instrument: str, granularity: str,
+                start: datetime, end: datetime) -> list:
+        """Function to get the parts of the time range between 'start' and
+        'end' that have not been saved to the archive. The ends of each
+        part can be the first or last times of the intervals that have
+        been saved
+
+        Returns:
+            list of (start, end) datetime tuples sorted by start. Empty
+            if the archive covers the time range
+        """
+        gaps = []
+        for istart, iend in self.coverage(instrument, granularity):
+            if iend < start:
+                continue
+            if istart > end:
+                break
+            if istart > start:
+                gaps.append((start, istart))
+            start = iend
+            if start >= end:
+                return gaps
+        gaps.append((start, end))
+        return gaps
+
+    def save(self, clO: CandleList, start: datetime = None,
+             end: datetime = None, replace: bool = True) -> None:
+        """Function to save the candles in a CandleList to the archive
+
+        Arguments:
+            clO: CandleList object
+            start: Start of the time interval covered by 'clO'. Default:
+                   time of the first Candle
+            end: End of the time interval covered by 'clO'. Default:
+                 time of the last Candle
+            replace: If True, then the candles already in the archive are
+                     replaced by the ones in 'clO' with the same time.
+                     Otherwise, they are kept
+        """
+        if len(clO) == 0 and (start is None or end is None):
+            return
+        instrument, granularity = clO.instrument, clO.granularity
+        os.makedirs(self._dir(instrument, granularity), exist_ok=True)
+
+        new = clO._window_columns(0, len(clO))
+        new.pop("rsi")
+        years = new["time"].astype("datetime64[s]").astype("datetime64[Y]")
+        years = years.astype(np.int64) + 1970
+        start = start or from_epoch(new["time"].min())
+        end = end or from_epoch(new["time"].max())
+        # the partitions and coverage.json are read, merged and written
+        # again, so the saves of the same instrument/granularity (i.e. of
+        # the pages of a query, run in several threads or processes) are
+        # serialized
+        with _folder_lock(self._dir(instrument, granularity)):
+            for year in np.unique(years).tolist():
+                sel = years == year
+                columns = {name: arr[sel] for name, arr in new.items()}
+                outfile = self._partition(instrument, granularity, year)
+                if os.path.exists(outfile):
+                    _, old = candle_store.read_store(outfile, mmap=False)
+                    # np.unique keeps the candles coming first
+                    columns = {name: np.concatenate(
+                        [columns[name], old[name]] if replace
+                        else [old[name], columns[name]])
+                        for name in columns}
+                _, ixs = np.unique(columns["time"], return_index=True)
+                candle_store.write_store(
+                    outfile, instrument, granularity,
+                    **{name: arr[ixs] for name, arr in columns.items()})
+            self._add_coverage(instrument, granularity, start, end)
+        ca_logger.debug(f"Saved {len(clO)} candles for {instrument} "
+                        f"{granularity} ({start}-{end})")
+
+    def load(self, instrument: str, granularity: str, start: datetime,
+             end: datetime) -> CandleList:
+        """Function to load the candles between 'start' and 'end' (both
+        included). Only the year partitions overlapping the time range are
+        opened, and only the pages holding the candles in the time range
+        are read from them
+
+        Returns:
+            CandleList object. It will be empty if there are no candles
+            in the archive for this time range
+        """
+        tstart, tend = to_epoch(start), to_epoch(end)
+        pieces = []
+        for year in range(start.year, end.year + 1):
+            infile = self._partition(instrument, granularity, year)
+            if not os.path.exists(infile):
+                continue
+            _, columns = candle_store.read_store(infile)
+            lo = np.searchsorted(columns["time"], tstart, "left")
+            hi = np.searchsorted(columns["time"], tend, "right")
+            pieces.append({name: columns[name][lo:hi]
+                           for name in ("time", "o", "h", "l", "c")})
+        return CandleList.from_arrays(
+            instrument=instrument,
+            granularity=granularity,
+            copy=False,
+            **{name: np.concatenate([p[name] for p in pieces])
+               if pieces else []
+               for name in ("time", "o", "h", "l", "c")})
+
+    def __repr__(self):
+        return "CandleArchive"
+
+    def __str__(self):
+        return f"CandleArchive(root='{self.root}')"
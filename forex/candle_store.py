@@ -0,0 +1,140 @@
+"""Binary on-disk storage for the columns of a CandleList.
+
+A store file has a fixed-size header followed by one block per column,
+all little-endian:
+
+    magic (8s) | version (H) | flags (H) | reserved (I) | n (Q) |
+    instrument (32s) | granularity (16s) | padding up to HEADER_SIZE
+
+and then the 'time' (int64 seconds since utils.EPOCH), 'o', 'h', 'l',
+'c' and 'rsi' (float64) columns, n values each. The columns are opened
+with numpy.memmap, so opening a store does not read the candle data
+and the pages of a file are shared by all the processes reading it.
+"""
+import logging
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+# create logger
+cs_logger = logging.getLogger(__name__)
+cs_logger.setLevel(logging.INFO)
+
+MAGIC = b"FXCANDLE"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQ32s16s")
+HEADER_SIZE = 128
+COLUMNS = (("time", "<i8"), ("o", "<f8"), ("h", "<f8"), ("l", "<f8"),
+           ("c", "<f8"), ("rsi", "<f8"))
+# flags
+HAS_RSI = 1
+
+
+def read_header(infile: str) -> dict:
+    """Function to read the header of a store file
+
+    Arguments:
+        infile: Path to store file
+
+    Returns:
+        dict with 'version', 'n', 'instrument', 'granularity' and
+        'has_rsi' keys
+    """
+    with open(infile, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE or raw[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{infile} is not a candle store file")
+    magic, version, flags, _, n, instrument, granularity = \
+        HEADER.unpack_from(raw)
+    if version != VERSION:
+        raise ValueError(f"Unsupported candle store version {version} "
+                         f"in {infile}")
+    return {"version": version,
+            "n": n,
+            "instrument": instrument.rstrip(b"\0").decode(),
+            "granularity": granularity.rstrip(b"\0").decode(),
+            "has_rsi": bool(flags & HAS_RSI)}
+
+
+def write_store(outfile: str, instrument: str, granularity: str,
+                time, o, h, l, c, rsi=None) -> str:
+    """Function to write CandleList columns to a store file. The file is
+    written next to 'outfile' and then renamed, so readers never see a
+    partially written store
+
+    Arguments:
+        outfile: Path to store file
+        time: int64 seconds since utils.EPOCH
+        o, h, l, c: Prices
+        rsi: RSI values. Optional
+
+    Returns:
+        path to store file
+    """
+    n = len(time)
+    flags = 0
+    if rsi is None:
+        rsi = np.full(n, np.nan)
+    else:
+        flags |= HAS_RSI
+    values = {"time": time, "o": o, "h": h, "l": l, "c": c, "rsi": rsi}
+
+    # a file of its own for each writer, as several threads or processes
+    # can be writing the same store
+    f = tempfile.NamedTemporaryFile(dir=os.path.dirname(outfile) or ".",
+                                    prefix=os.path.basename(outfile) + ".",
+                                    suffix=".tmp", delete=False)
+    try:
+        with f:
+            header = HEADER.pack(MAGIC, VERSION, flags, 0, n,
+                                 instrument.encode(), granularity.encode())
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            for name, dtype in COLUMNS:
+                arr = np.asarray(values[name], dtype=dtype)
+                if len(arr) != n:
+                    raise ValueError(f"Column '{name}' has {len(arr)} "
+                                     f"values, {n} expected")
+                f.write(arr.tobytes())
+        os.replace(f.name, outfile)
+    except BaseException:
+        if os.path.exists(f.name):
+            os.unlink(f.name)
+        raise
+    cs_logger.debug(f"Wrote {n} candles to {outfile}")
+
+    return outfile
+
+
+def read_store(infile: str, mmap: bool = True) -> tuple:
+    """Function to read the columns in a store file
+
+    Arguments:
+        infile: Path to store file
+        mmap: If True, the columns are read-only numpy.memmap arrays
+              backed by the file. Otherwise they are read into memory
+
+    Returns:
+        (header, columns) tuple. 'header' as returned by read_header and
+        'columns' a dict with the column arrays. columns['rsi'] is None if
+        the store does not contain the RSI
+    """
+    header = read_header(infile)
+    n = header["n"]
+    columns = {}
+    offset = HEADER_SIZE
+    for name, dtype in COLUMNS:
+        if n == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        elif mmap:
+            columns[name] = np.memmap(infile, dtype=dtype, mode="r",
+                                      offset=offset, shape=(n,))
+        else:
+            columns[name] = np.fromfile(infile, dtype=dtype, count=n,
+                                        offset=offset)
+        offset += n * np.dtype(dtype).itemsize
+    if not header["has_rsi"]:
+        columns["rsi"] = None
+
+    return header, columns
@@ -1,9 +1,13 @@
 from params import tradebot_params, clist_params, pivots_params
+from forex.candle import CandleList
 from forex.harea import HArea, HAreaList
-from utils import add_pips2price, substract_pips2price, calculate_pips
+from utils import (add_pips2price, substract_pips2price, calculate_pips,
+                   granularity_seconds, from_epoch)
 
 import logging
+import numpy as np
 import pandas as pd
+from zoneinfo import ZoneInfo
 
 # create logger
 cl_logger = logging.getLogger(__name__)
@@ -127,14 +131,96 @@ def calc_atr(clO) -> float:
              Used for calculation
     '''
     length, tot_diff_in_pips = 0, 0
-    for c in clO.candles:
-        diff = abs(c.h-c.l)
+    diffs = np.abs(clO.get_column("h") - clO.get_column("l"))
+    for diff in diffs.tolist():
         tot_diff_in_pips = tot_diff_in_pips + \
             float(calculate_pips(clO.instrument, diff))
         length += 1
     return round(tot_diff_in_pips/length, 3)
 
 
+def _utc_offsets(times: np.ndarray, tz: ZoneInfo) -> np.ndarray:
+    """Function to get the UTC offset (in seconds) of 'tz' for each of the
+    times (seconds since utils.EPOCH). The offset is looked up once per
+    day, at 12:00 UTC, as the DST changes happen during the weekend,
+    when the market is closed"""
+    days, inverse = np.unique(times // 86400, return_inverse=True)
+    offsets = np.array(
+        [tz.utcoffset(from_epoch(day * 86400 + 43200)).total_seconds()
+         for day in days.tolist()], dtype=np.int64)
+    return offsets[inverse]
+
+
+def resample(clO, granularity: str, partial: bool = True,
+             daily_alignment: int = 17,
+             alignment_timezone: str = "America/New_York"):
+    """Function to build a CandleList with a coarser granularity from
+    'clO'. Candles are grouped in time buckets aligned as Oanda aligns
+    them: daily candles (and the H2, H4, H8, H12 ones) start at hour
+    'daily_alignment' in 'alignment_timezone' (i.e. 17:00 New York,
+    which is 21:00 or 22:00 UTC) and minute candles start at the
+    multiples of their length. For each bucket, 'o' is the open of the
+    first candle, 'h' the highest high, 'l' the lowest low and 'c' the
+    close of the last candle.
+
+    Arguments:
+        clO: CandleList object
+        granularity: Target granularity. i.e. H8, D
+        partial: If False, then the first and last buckets are
+                 discarded when 'clO' does not span them completely
+        daily_alignment: Hour at which the daily candles start. The
+                         default is the one used by Oanda's REST API, as
+                         Connect.query does not set it
+        alignment_timezone: Timezone for 'daily_alignment'
+
+    Returns:
+        CandleList object
+    """
+    step = granularity_seconds(granularity)
+    base = granularity_seconds(clO.granularity)
+    if step > 86400 or step < base or step % base:
+        raise ValueError(f"Can't resample {clO.granularity} to "
+                         f"{granularity}")
+
+    time = clO.get_column("time")
+    order = None
+    if np.any(time[1:] < time[:-1]):
+        order = np.argsort(time, kind="stable")
+        time = time[order]
+    columns = {name: clO.get_column(name) if order is None
+               else clO.get_column(name)[order]
+               for name in ("o", "h", "l", "c")}
+
+    if step < 3600:
+        buckets = time - time % step
+    else:
+        # bucket boundaries in local time of the daily alignment
+        offsets = _utc_offsets(time, ZoneInfo(alignment_timezone))
+        local = time + offsets
+        day_start = daily_alignment * 3600
+        buckets = local - (local - day_start) % step - offsets
+
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[:1] - 1))
+    if len(starts) == 0:
+        return CandleList.from_arrays(clO.instrument, granularity,
+                                      time=[], o=[], h=[], l=[], c=[])
+    ends = np.append(starts[1:], len(buckets))
+    keep = np.ones(len(starts), dtype=bool)
+    if not partial:
+        keep[0] = time[0] == buckets[0]
+        keep[-1] &= time[-1] + base >= buckets[-1] + step
+
+    return CandleList.from_arrays(
+        instrument=clO.instrument,
+        granularity=granularity,
+        copy=False,
+        time=buckets[starts][keep],
+        o=columns["o"][starts][keep],
+        h=np.maximum.reduceat(columns["h"], starts)[keep],
+        l=np.minimum.reduceat(columns["l"], starts)[keep],
+        c=columns["c"][ends - 1][keep])
+
+
 def calc_diff(df_loc, increment_price: float):
     '''Function to select the best S/R for areas that
     are less than 3*increment_price.
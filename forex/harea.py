@@ -3,6 +3,7 @@ import sys
 
 from datetime import timedelta, datetime
 from api.oanda.connect import Connect
+from api.oanda.governor import APIError
 from params import gparams
 from forex.candle import Candle
 
@@ -86,8 +87,14 @@ class HArea(object):
                            granularity=granularity)
 
             h_logger.debug("Fetching data from API")
-            res = conn.query(start=cstart.isoformat(),
-                             end=cend.isoformat())
+            try:
+                res = conn.query(start=cstart.isoformat(),
+                                 end=cend.isoformat())
+            except APIError as err:
+                h_logger.warning(f"Could not fetch the candles for "
+                                 f"{self.instrument} {granularity} "
+                                 f"({cstart}-{cend}): {err}")
+                return candle.time
 
             seen = False
             if res.candles:
@@ -208,10 +215,8 @@ class HAreaList(object):
                   Used for plotting
             outfile : Output file
         """
-        prices, datetimes = ([] for i in range(2))
-        for c in clO.candles:
-            prices.append(c.c)
-            datetimes.append(c.time)
+        prices = clO.get_column("c").tolist()
+        datetimes = clO.times
 
         # massage datetimes so they can be plotted in X-axis
         x = [mdates.date2num(i) for i in datetimes]
@@ -6,7 +6,7 @@ import numpy as np
 from utils import periodToDelta, substract_pips2price, add_pips2price
 from params import gparams, pivots_params
 from forex.segment import SegmentList, Segment
-from zigzag import peak_valley_pivots, pivots_to_modes
+from forex.zigzag import pivots_to_modes
 from statistics import mean
 
 # create logger
@@ -75,7 +75,7 @@ class Pivot(object):
                 # merge if type of previous (s) is equal to self.pre
                 p_logger.debug("Merge because of same Segment type")
                 self.pre.prepend(s)
-            elif self.pre.type != s.type and len(s.clist) < n_candles:
+            elif self.pre.type != s.type and s.count < n_candles:
                 # merge if types of previous segment and self.pre are
                 # different but len(s.clist) is less than n_candles
                 # calculate the % that s.diff is with respect to self.pre.diff
@@ -132,7 +132,7 @@ class Pivot(object):
             if self.aft.type == s.type:
                 p_logger.debug("Merge because of same Segment type")
                 self.aft.append(s)
-            elif self.aft.type != s.type and len(s.clist) < n_candles:
+            elif self.aft.type != s.type and s.count < n_candles:
                 # calculate the % that s.diff is with respect to self.pre.diff
                 perc_diff = s.diff * 100 / self.aft.diff
                 # do not merge if perc_diff that s represents with respect
@@ -165,7 +165,7 @@ class Pivot(object):
             if type == 'diff':
                 score_pre = self.pre.diff
             elif type == 'candles':
-                score_pre = len(self.pre.clist)
+                score_pre = self.pre.count
         else:
             score_pre = 0.0
 
@@ -174,7 +174,7 @@ class Pivot(object):
             if type == 'diff':
                 score_aft = self.aft.diff
             elif type == 'candles':
-                score_aft = len(self.aft.clist)
+                score_aft = self.aft.count
         else:
             score_aft = 0.0
 
@@ -246,11 +246,12 @@ class PivotList(object):
 
     Class variables:
         clist: CandleList object
-        pivots: List with Pivot objects
+        pivots: List with Pivot objects. It must not be modified, as it is
+                indexed by time and by type
         slist: SegmentList object"""
 
     __slots__ = ["clist", "pivots", "slist",
-                 "th_bounces"]
+                 "th_bounces", "_by_time", "_by_type", "_by_price"]
 
     def __init__(self, clist, pivots=None, slist=None,
                  th_bounces: float = None) -> None:
@@ -268,6 +269,58 @@ class PivotList(object):
             self.pivots = po_l
             self.slist = SegmentList(slist=segs,
                                      instrument=clist.instrument)
+        # the indexes are built the first time they are needed
+        self._by_time = self._by_type = self._by_price = None
+
+    def _build_index(self) -> None:
+        """Build the dict with the first Pivot at each time, the arrays
+        with the positions of the Pivots of each type and the price index
+        used by inarea_pivots: for the close and for the extreme (the high
+        of the peaks and the low of the valleys) of the Pivot candles, the
+        sorted prices and the position of the Pivot of each price"""
+        self._by_time = {}
+        for p in self.pivots:
+            self._by_time.setdefault(p.candle.time, p)
+        types = np.array([p.type for p in self.pivots])
+        self._by_type = {t: np.flatnonzero(types == t)
+                         for t in np.unique(types).tolist()}
+        closes = np.array([p.candle.c for p in self.pivots], dtype=float)
+        extremes = np.array([p.candle.h if p.type == 1 else
+                             p.candle.l if p.type == -1 else np.nan
+                             for p in self.pivots], dtype=float)
+        self._by_price = []
+        for prices in (closes, extremes):
+            order = np.argsort(prices, kind="stable")
+            self._by_price.append((prices[order], order))
+
+    def _inarea_ixs(self, lower: float, upper: float) -> np.ndarray:
+        """Function to get the positions of the Pivots whose close or
+        extreme price is in [lower, upper]
+
+        Returns:
+            Sorted list of positions
+        """
+        if self._by_price is None:
+            self._build_index()
+        ixs = set()
+        for prices, order in self._by_price:
+            ixs.update(order[prices.searchsorted(lower, "left"):
+                             prices.searchsorted(upper, "right")].tolist())
+        return sorted(ixs)
+
+    def __getstate__(self):
+        # the indexes are built again when needed
+        return {key: getattr(self, key) for key in self.__slots__
+                if hasattr(self, key) and key not in ("_by_time",
+                                                      "_by_type",
+                                                      "_by_price")}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        for key, value in state.items():
+            setattr(self, key, value)
+        self._by_time = self._by_type = self._by_price = None
 
     def __iter__(self):
         self.pos = 0
@@ -298,9 +351,7 @@ class PivotList(object):
             List with Pivot objects
             List with Segment objects
         """
-        yarr = np.array([cl.c for cl in self.clist.candles])
-        pivots = peak_valley_pivots(yarr, th_bounces,
-                                    th_bounces*-1)
+        pivots = self.clist.zigzag(th_bounces)
         modes = pivots_to_modes(pivots)
 
         segs = []  # this list will hold the Segment objects
@@ -317,8 +368,10 @@ class PivotList(object):
             assert len(np.unique(submode).tolist()) == 1, "more than one type in modes"
             s = Segment(
                 type=submode[0],
-                clist=self.clist.candles[pair[0]: pair[1]],
+                clist=self.clist,
                 instrument=self.clist.instrument,
+                start_ix=int(pair[0]),
+                end_ix=int(pair[1]),
             )
             # create Pivot object
             cl = self.clist.candles[pair[0]]
@@ -348,8 +401,9 @@ class PivotList(object):
 
     def fetch_by_time(self, d: datetime) -> Pivot:
         '''Function to fetch a Pivot object using a datetime'''
-        p = next((p for p in self.pivots if p.candle.time == d), None)
-        return p
+        if self._by_time is None:
+            self._build_index()
+        return self._by_time.get(d)
 
     def fetch_by_type(self, type: int) -> 'PivotList':
         '''Function to get all pivots from a certain type.
@@ -358,7 +412,9 @@ class PivotList(object):
             type : 1 or -1
         '''
 
-        pl = [p for p in self.pivots if p.type == type]
+        if self._by_type is None:
+            self._build_index()
+        pl = [self.pivots[ix] for ix in self._by_type.get(type, [])]
 
         return PivotList(pivots=pl,
                          clist=self.clist,
@@ -415,8 +471,15 @@ class PivotList(object):
         p_logger.debug("SR U-limit: {0}; L-limit: {1}".format(round(upper, 4),
                                                               round(lower, 4)))
 
+        # positions of the pivots in the area, in the order of the list
+        ixs = self._inarea_ixs(lower, upper)
+        if last_pivot is True and self.pivots and \
+                (not ixs or ixs[-1] != len(self.pivots) - 1):
+            ixs.append(len(self.pivots) - 1)
+
         pl = []
-        for p in self.pivots:
+        seen = set()  # times of the pivots in pl
+        for p in (self.pivots[ix] for ix in ixs):
             # always consider the last pivot in bounces.plist as in_area as
             # this part of the entry setup
             if self.pivots[-1].candle.time == p.candle.time \
@@ -435,35 +498,22 @@ class PivotList(object):
                                    n_candles=pivots_params.n_candles,
                                    diff_th=pivots_params.diff_th)
                 pl.append(newp)
-            else:
-                part_list = ['c']
-                if p.type == 1:
-                    part_list.append('h')
-                elif p.type == -1:
-                    part_list.append('l')
-
-                for part in part_list:
-                    price = getattr(p.candle, part)
-                    # only consider pivots in the area
-                    if price >= lower and price <= upper:
-                        # check if this pivot already exists in pl
-                        p_seen = False
-                        for op in pl:
-                            if op.candle.time == p.candle.time:
-                                p_seen = True
-                        if p_seen is False:
-                            p_logger.debug(f"Pivot {p.candle.time} identified in area")
-                            if pivots_params.runmerge_pre is True and \
-                                    p.pre is not None:
-                                p.merge_pre(slist=self.slist,
-                                            n_candles=pivots_params.n_candles,
-                                            diff_th=pivots_params.diff_th)
-                            if pivots_params.runmerge_aft is True and \
-                                    p.aft is not None:
-                                p.merge_aft(slist=self.slist,
-                                            n_candles=pivots_params.n_candles,
-                                            diff_th=pivots_params.diff_th)
-                            pl.append(p)
+                seen.add(newp.candle.time)
+            elif p.candle.time not in seen:
+                # the pivot is not in pl yet
+                p_logger.debug(f"Pivot {p.candle.time} identified in area")
+                if pivots_params.runmerge_pre is True and \
+                        p.pre is not None:
+                    p.merge_pre(slist=self.slist,
+                                n_candles=pivots_params.n_candles,
+                                diff_th=pivots_params.diff_th)
+                if pivots_params.runmerge_aft is True and \
+                        p.aft is not None:
+                    p.merge_aft(slist=self.slist,
+                                n_candles=pivots_params.n_candles,
+                                diff_th=pivots_params.diff_th)
+                pl.append(p)
+                seen.add(p.candle.time)
 
         return PivotList(clist=self.clist,
                          pivots=pl,
@@ -500,11 +550,9 @@ class PivotList(object):
         '''
         p_logger.debug("Running plot_pivots")
 
-        prices, rsi, datetimes = ([] for i in range(3))
-        for c in self.clist.candles:
-            prices.append(c.c)
-            rsi.append(c.rsi)
-            datetimes.append(c.time)
+        prices = self.clist.get_column("c").tolist()
+        rsi = self.clist.get_column("rsi").tolist()
+        datetimes = self.clist.times
 
         # plotting the rsi values
         fig_rsi = plt.figure(figsize=gparams.size)
@@ -0,0 +1,190 @@
+"""
+Range maximum/minimum queries over a price column.
+"""
+import numpy as np
+
+
+class RangeExtrema(object):
+    """Class to answer max/min queries over any range of an array in O(1).
+
+    The values are split into blocks of BLOCK values. For each of max and
+    min it keeps the index of the extremum of every prefix and suffix of
+    each block, and a sparse table over the extrema of the blocks (level
+    k holds the index of the extremum of every run of 2**k blocks). A
+    range spanning several blocks is answered with the suffix of its
+    first block, the prefix of its last block and two overlapping runs of
+    the blocks in between; a range within a block is scanned with numpy.
+    The tables are built the first time they are needed, in O(n) time and
+    memory (the sparse table has n / BLOCK * log2(n / BLOCK) entries,
+    fewer than n for any array that fits in memory).
+    When several positions hold the extremum, the first one is returned.
+
+    Class variables:
+        values: Array with the values. It must not be modified
+    """
+
+    # number of values in a block
+    BLOCK = 64
+
+    __slots__ = ["values", "_levels", "_offset", "_n"]
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float64)
+        self._levels = {}
+        self._offset = 0
+        self._n = len(self.values)
+
+    def __len__(self):
+        return self._n
+
+    def window(self, start: int, end: int) -> "RangeExtrema":
+        """Function to get a RangeExtrema for values[start:end], sharing the
+        tables with self"""
+        if not 0 <= start <= end <= self._n:
+            raise ValueError(f"Invalid window: {start}-{end}")
+        ext = RangeExtrema.__new__(RangeExtrema)
+        ext.values = self.values
+        ext._levels = self._levels
+        ext._offset = self._offset + start
+        ext._n = end - start
+        return ext
+
+    def _table(self, kind: str) -> tuple:
+        """Function to get the tables of 'kind' ('max' or 'min')
+
+        Returns:
+            (prefix, suffix, levels). prefix[i] is the index of the
+            extremum of the values from the start of the block of i to i,
+            suffix[i] the one from i to the end of its block, and
+            levels[k][b] the one of the blocks b to b + 2**k - 1
+        """
+        table = self._levels.get(kind)
+        if table is not None:
+            return table
+        n, size = len(self.values), self.BLOCK
+        n_blocks = -(-n // size)
+        # the min is the max of the negated values, with the same ties
+        signed = self.values if kind == "max" else -self.values
+        padded = np.full(n_blocks * size, -np.inf)
+        padded[:n] = signed
+        blocks = padded.reshape(n_blocks, size)
+        cols = np.arange(size)
+
+        # a value is the extremum of its prefix if it is greater than the
+        # values before it, and of its suffix if it is not smaller than
+        # the values after it (the first position wins the ties)
+        before = np.maximum.accumulate(blocks, axis=1)
+        new = np.ones(blocks.shape, dtype=bool)
+        new[:, 1:] = blocks[:, 1:] > before[:, :-1]
+        prefix = np.maximum.accumulate(np.where(new, cols, 0), axis=1)
+        after = np.maximum.accumulate(blocks[:, ::-1], axis=1)
+        new = np.ones(blocks.shape, dtype=bool)
+        new[:, 1:] = blocks[:, ::-1][:, 1:] >= after[:, :-1]
+        suffix = size - 1 - np.maximum.accumulate(
+            np.where(new, cols, 0), axis=1)[:, ::-1]
+        base = (np.arange(n_blocks) * size)[:, None]
+        prefix = (prefix + base).ravel()
+        suffix = (suffix + base).ravel()
+
+        levels = [prefix[size - 1::size]]
+        width = 1
+        while 2 * width <= n_blocks:
+            prev = levels[-1]
+            left = prev[:n_blocks - 2 * width + 1]
+            right = prev[width:n_blocks - width + 1]
+            levels.append(np.where(padded[left] >= padded[right], left,
+                                   right))
+            width *= 2
+        table = self._levels[kind] = (prefix, suffix, levels)
+        return table
+
+    def _arg(self, kind: str, start: int, end: int) -> int:
+        if end is None:
+            end = self._n
+        if not 0 <= start < end <= self._n:
+            raise ValueError(f"Invalid range: {start}-{end}")
+        start = int(start) + self._offset
+        end = int(end) + self._offset
+        values, size = self.values, self.BLOCK
+        first, last = start // size, (end - 1) // size
+        if first == last:
+            window = values[start:end]
+            ix = start + int(np.argmax(window) if kind == "max"
+                             else np.argmin(window))
+            return ix - self._offset
+        prefix, suffix, levels = self._table(kind)
+        # candidates from left to right, so the first one wins the ties
+        candidates = [int(suffix[start])]
+        if last - first > 1:
+            k = (last - first - 1).bit_length() - 1
+            level = levels[k]
+            candidates += [int(level[first + 1]),
+                           int(level[last - (1 << k)])]
+        candidates.append(int(prefix[end - 1]))
+        ix = candidates[0]
+        for c in candidates[1:]:
+            if (values[c] > values[ix]) if kind == "max" \
+                    else (values[c] < values[ix]):
+                ix = c
+        return ix - self._offset
+
+    def argmax(self, start: int = 0, end: int = None) -> int:
+        """Index of the max value in values[start:end]"""
+        return self._arg("max", start, end)
+
+    def argmin(self, start: int = 0, end: int = None) -> int:
+        """Index of the min value in values[start:end]"""
+        return self._arg("min", start, end)
+
+    def max(self, start: int = 0, end: int = None) -> float:
+        """Max value in values[start:end]"""
+        return float(self.values[self._offset + self.argmax(start, end)])
+
+    def min(self, start: int = 0, end: int = None) -> float:
+        """Min value in values[start:end]"""
+        return float(self.values[self._offset + self.argmin(start, end)])
+
+    def last_below(self, price: float, end: int = None) -> int:
+        """Function to get the index of the last value below 'price' in
+        values[:end], using a binary search over range min queries
+
+        Returns:
+            index. None if there are no values below 'price'
+        """
+        return self._last("min", price, end)
+
+    def last_above(self, price: float, end: int = None) -> int:
+        """Function to get the index of the last value above 'price' in
+        values[:end]
+
+        Returns:
+            index. None if there are no values above 'price'
+        """
+        return self._last("max", price, end)
+
+    def _last(self, kind: str, price: float, end: int) -> int:
+        if end is None:
+            end = self._n
+        if end <= 0:
+            return None
+
+        def crosses(start):
+            # is there any value beyond 'price' in values[start:end]?
+            if kind == "min":
+                return self.min(start, end) < price
+            return self.max(start, end) > price
+
+        if not crosses(0):
+            return None
+        # the last 'start' for which values[start:end] crosses 'price'
+        lo, hi = 0, end - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if crosses(mid):
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def __repr__(self):
+        return "RangeExtrema"
@@ -1,9 +1,10 @@
-from utils import calculate_pips
+from utils import calculate_pips, from_epoch, EPOCH
+from forex.candle import CandleList, CandleListView
 import matplotlib
 import datetime
 import pickle
 
-from typing import List, Dict
+import numpy as np
 
 matplotlib.use('PS')
 
@@ -12,24 +13,91 @@ class Segment(object):
     """Class containing a Segment object identified linking the pivots in the
     PivotList
 
+    The candles of the Segment are a range of the candles of a CandleList,
+    which is shared with the rest of the Segments of the PivotList, so
+    merging two adjacent Segments only updates start_ix/end_ix.
+
     Class variables
     ---------------
     type : 1 or -1. 1 when the segment goes upwards and -1 downwards
-    clist : List of dictionaries, in which each of the dicts is a candle
+    parent : CandleList holding the candles. It must not be modified
+    start_ix : Index in parent of the first candle in this Segment
+    end_ix : Index in parent following the last candle in this Segment
     instrument : Pair
     """
 
-    __slots__ = ['type', 'clist', 'instrument', '_diff']
+    __slots__ = ['type', 'parent', 'start_ix', 'end_ix', 'instrument',
+                 '_owners', '_cache']
+
+    def __init__(self, type: int, clist, instrument: str,
+                 start_ix: int = None, end_ix: int = None):
+        """Constructor
 
-    def __init__(self, type: int, clist: List[Dict], instrument: str):
+        Arguments:
+            clist: CandleList holding the candles or list of Candle objects
+            start_ix: Index in clist of the first candle. Default: 0
+            end_ix: Index in clist following the last candle.
+                    Default: len(clist)
+        """
+        if not isinstance(clist, CandleList):
+            clist = CandleList(instrument=instrument, granularity=None,
+                               candles=clist)
         self.type = type
-        self.clist = clist
+        self.parent = clist
+        self.start_ix = 0 if start_ix is None else start_ix
+        self.end_ix = len(clist) if end_ix is None else end_ix
         self.instrument = instrument
-        self._diff = self._calc_diff()
+        # (SegmentList, index) of the SegmentLists holding this Segment
+        self._owners = []
+        # start, end and clist, computed on first use. Emptied when the
+        # Segment is merged
+        self._cache = {}
 
     @property
-    def diff(self):
-        return self._diff
+    def clist(self):
+        """Sequence of Candle objects in this Segment"""
+        clist = self._cache.get("clist")
+        if clist is None:
+            clist = self._cache["clist"] = CandleListView(
+                self.parent, self.start_ix, self.end_ix).candles
+        return clist
+
+    @property
+    def count(self) -> int:
+        """Number of candles in this Segment"""
+        return self.end_ix - self.start_ix
+
+    @property
+    def diff(self) -> float:
+        """Absolute difference in number of pips between the first and
+        the last candles of this segment"""
+        closes = self.parent.get_column("c")
+        diff = abs(closes[self.end_ix - 1] - closes[self.start_ix])
+        diff_pips = float(calculate_pips(self.instrument, diff))
+        if diff_pips == 0:
+            diff_pips = 1.0
+        return diff_pips
+
+    def __getstate__(self):
+        # the SegmentLists register themselves again on load
+        return {key: getattr(self, key) for key in self.__slots__
+                if hasattr(self, key) and key not in ("_owners", "_cache")}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        state = dict(state)
+        state["_owners"] = []
+        state["_cache"] = {}
+        if isinstance(state.get("clist"), list):
+            # Segment pickled with its own list of Candle objects
+            candles = state.pop("clist")
+            state.pop("_diff", None)
+            state["parent"] = CandleList(instrument=state["instrument"],
+                                         granularity=None, candles=candles)
+            state["start_ix"], state["end_ix"] = 0, len(candles)
+        for key, value in state.items():
+            setattr(self, key, value)
 
     def pickle_dump(self, outfile: str) -> str:
         '''Function to pickle this particular Segment
@@ -64,39 +132,49 @@ class Segment(object):
         return inseg
 
     def prepend(self, s) -> None:
-        '''Function to prepend s to self. The merge will be done by
-        concatenating s.clist to self.clist and increasing self.count to
-        self.count+s.count
+        '''Function to prepend s to self. When s ends where self starts in
+        the same CandleList, only self.start_ix is updated. Otherwise, the
+        candles of s and self are concatenated in a new CandleList
 
         Arguments:
             s : Segment object to be merged
         '''
-
-        self.clist = s.clist+self.clist
-        self._diff = self._calc_diff()
+        if s.parent is self.parent and s.end_ix == self.start_ix:
+            self.start_ix = s.start_ix
+        else:
+            self._concat(s, self)
+        self._moved()
 
     def append(self, s) -> None:
-        '''Function to append s to self. The merge will be done by
-        concatenating self.clist to self.clist and increasing self.count to
-        self.count+s.count
+        '''Function to append s to self. When s starts where self ends in
+        the same CandleList, only self.end_ix is updated. Otherwise, the
+        candles of self and s are concatenated in a new CandleList
 
         Arguments:
-            s : Segment object to be merged  
-        '''
-        self.clist = self.clist+s.clist
-        self._diff = self._calc_diff()
-
-    def _calc_diff(self) -> float:
-        '''Private function to calculate the absolute difference in
-        number of pips between the first and the last candles
-        of this segment. The candle part considered is
-        controlled by gparams.part
+            s : Segment object to be merged
         '''
-        diff = abs(self.clist[-1].c - self.clist[0].c)
-        diff_pips = float(calculate_pips(self.instrument, diff))
-        if diff_pips == 0:
-            diff_pips = 1.0
-        return diff_pips
+        if s.parent is self.parent and s.start_ix == self.end_ix:
+            self.end_ix = s.end_ix
+        else:
+            self._concat(self, s)
+        self._moved()
+
+    def _concat(self, first, second) -> None:
+        clist = CandleListView(first.parent, first.start_ix,
+                               first.end_ix) + \
+            CandleListView(second.parent, second.start_ix, second.end_ix)
+        self.parent, self.start_ix, self.end_ix = clist, 0, len(clist)
+
+    def _moved(self) -> None:
+        self._cache = {}
+        for slist, ix in self._owners:
+            slist._update_index(ix)
+
+    def _start_time(self) -> int:
+        return int(self.parent.get_column("time")[self.start_ix])
+
+    def _end_time(self) -> int:
+        return int(self.parent.get_column("time")[self.end_ix - 1])
 
     def is_short(self, min_n_candles: int, diff_in_pips: int) -> bool:
         '''Function to check if segment is short (self.diff < pip_th or
@@ -118,11 +196,17 @@ class Segment(object):
 
     def start(self) -> datetime:
         '''Function that returns the start of this Segment'''
-        return self.clist[0].time
+        start = self._cache.get("start")
+        if start is None:
+            start = self._cache["start"] = from_epoch(self._start_time())
+        return start
 
     def end(self) -> datetime:
         '''Function that returns the end of this Segment'''
-        return self.clist[-1].time
+        end = self._cache.get("end")
+        if end is None:
+            end = self._cache["end"] = from_epoch(self._end_time())
+        return end
 
     def get_lowest(self):
         '''Function to get the candle with the lowest price in self.clist
@@ -130,15 +214,11 @@ class Segment(object):
         Returns:
             Candle object
         '''
-        sel_c = price = None
-        for c in self.clist:
-            if price is None:
-                price = c.l
-                sel_c = c
-            elif c.l < price:
-                price = c.l
-                sel_c = c
-        return sel_c
+        if self.count == 0:
+            return None
+        # argmin returns the first candle with the lowest price
+        ix = self.parent.extrema("l").argmin(self.start_ix, self.end_ix)
+        return self.parent.candles[ix]
 
     def get_highest(self):
         '''Function to get the candle with the highest price in self.clist
@@ -146,15 +226,11 @@ class Segment(object):
         Returns:
             Candle object
         '''
-        price = sel_c = None
-        for c in self.clist:
-            if price is None:
-                price = c.h
-                sel_c = c
-            elif c.h > price:
-                price = c.h
-                sel_c = c
-        return sel_c
+        if self.count == 0:
+            return None
+        # argmax returns the first candle with the highest price
+        ix = self.parent.extrema("h").argmax(self.start_ix, self.end_ix)
+        return self.parent.candles[ix]
 
     def __repr__(self):
         return "Segment"
@@ -173,17 +249,69 @@ class SegmentList(object):
 
     Class variables
     ---------------
-    slist : List of Segment objects
+    slist : List of Segment objects. It must not be modified, the Segments
+            are merged with Segment.prepend/append
     instrument : Pair
     diff : Diff in pips between first candle in first Segment
            and last candle in the last Segment
     '''
-    __slots__ = ['slist', 'instrument', '_diff']
+    __slots__ = ['slist', 'instrument', '_diff', '_starts', '_ends']
 
     def __init__(self, slist: list, instrument: str):
         self.slist = slist
         self.instrument = instrument
         self._diff = self.calc_diff()
+        self._build_index()
+
+    def _build_index(self) -> None:
+        """Build the arrays used by fetch_by_start/fetch_by_end. _starts
+        holds the max start time (in seconds since utils.EPOCH) of the
+        Segments up to each position and _ends the min end time of the
+        Segments from each position on, so both are sorted even when the
+        merges leave the Segments out of order"""
+        for ix, s in enumerate(self.slist):
+            s._owners.append((self, ix))
+        starts = np.array([s._start_time() for s in self.slist],
+                          dtype=np.int64)
+        ends = np.array([s._end_time() for s in self.slist], dtype=np.int64)
+        self._starts = np.maximum.accumulate(starts)
+        self._ends = np.minimum.accumulate(ends[::-1])[::-1].copy()
+
+    def _update_index(self, ix: int) -> None:
+        """Update the index arrays after the Segment at position 'ix' was
+        merged. Only the positions whose value changes are updated"""
+        starts, ends, n = self._starts, self._ends, len(self.slist)
+        value = self.slist[ix]._start_time()
+        for j in range(ix, n):
+            if j > ix:
+                value = self.slist[j]._start_time()
+            if j > 0:
+                value = max(value, starts[j - 1])
+            if j > ix and value == starts[j]:
+                break
+            starts[j] = value
+        value = self.slist[ix]._end_time()
+        for j in range(ix, -1, -1):
+            if j < ix:
+                value = self.slist[j]._end_time()
+            if j < n - 1:
+                value = min(value, ends[j + 1])
+            if j < ix and value == ends[j]:
+                break
+            ends[j] = value
+
+    def __getstate__(self):
+        # the index arrays are rebuilt on load
+        return {key: getattr(self, key) for key in ('slist', 'instrument',
+                                                    '_diff')
+                if hasattr(self, key)}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        for key, value in state.items():
+            setattr(self, key, value)
+        self._build_index()
 
     @property
     def diff(self):
@@ -260,20 +388,17 @@ class SegmentList(object):
         '''Get length in terms of number of candles representing the sum
         of candles in each Segment of the SegmentList'''
 
-        length = 0
-        for s in self.slist:
-            length = length+len(s.clist)
-        return length
+        return sum(s.count for s in self.slist)
 
     def start(self) -> datetime:
         '''Get the start datetime for this SegmentList
         This start will be the time of the first candle in SegmentList'''
-        return self.slist[0].clist[0].time
+        return self.slist[0].start()
 
     def end(self) -> datetime:
         '''Get the end datetime for this SegmentList
         This start will be the time of the first candle in SegmentList'''
-        return self.slist[-1].clist[-1].time
+        return self.slist[-1].end()
 
     def fetch_by_start(self, dt: datetime, max_diff: int = 3600):
         '''Function to get a certain Segment by
@@ -290,11 +415,11 @@ class SegmentList(object):
         Returns:
             Segment object. None if not found
         '''
-        for s in self.slist:
-            if s.start() == dt or s.start() > dt or \
-                 abs(s.start()-dt) <= datetime.timedelta(0, max_diff):
-                return s
-
+        # the first Segment starting after dt-max_diff
+        th = dt - datetime.timedelta(0, max(max_diff, 0))
+        ix = int(np.searchsorted(self._starts, _seconds(th), "left"))
+        if ix < len(self.slist):
+            return self.slist[ix]
         return None
 
     def fetch_by_end(self, dt: datetime, max_diff: int = 3600):
@@ -311,11 +436,12 @@ class SegmentList(object):
 
         Returns:
             Segment object. None if not found'''
-
-        for s in reversed(self.slist):
-            if s.end() == dt or s.end() < dt or \
-                 s.end()-dt <= datetime.timedelta(0, max_diff):
-                return s
+        # the last Segment ending before dt+max_diff
+        th = dt + datetime.timedelta(0, max(max_diff, 0))
+        ix = int(np.searchsorted(self._ends, _seconds(th), "right")) - 1
+        if ix >= 0:
+            return self.slist[ix]
+        return None
 
     def __repr__(self):
         return "SegmentList"
@@ -327,3 +453,7 @@ class SegmentList(object):
                 sb.append("{key}='{value}'".format(key=key,
                                                    value=getattr(self, key)))
         return ', '.join(sb)
+
+
+def _seconds(d: datetime) -> float:
+    return (d - EPOCH) / datetime.timedelta(seconds=1)
@@ -0,0 +1,293 @@
+"""
+ZigZag indicator: peaks and valleys of a price series.
+
+peak_valley_pivots and pivots_to_modes return the same as the functions
+of the ZigZag package (version 0.1.3), but the series is processed in
+blocks with numpy. The ZigZag class keeps the pivots of a series whose
+values are appended over time and gets the pivots of any window of it.
+"""
+import bisect
+
+import numpy as np
+
+PEAK, VALLEY = 1, -1
+
+# number of values checked at once when looking for the next reversal.
+# It is doubled while no reversal is found
+_BLOCK = 64
+
+
+def _initial_pivot(X: np.ndarray, up: float, down: float) -> tuple:
+    """Function to identify X[0] as a peak or a valley
+
+    Arguments:
+        X: Array with the values
+        up: Min relative change to define a peak, plus 1
+        down: Min relative change to define a valley, plus 1
+
+    Returns:
+        PEAK or VALLEY
+        False if no change reaching the thresholds was found, in which case
+        the type depends on the last value of X
+    """
+    n, x0 = len(X), X[0]
+    max_x = min_x = x0
+    a, block = 1, _BLOCK
+    while a < n:
+        b = min(n, a + block)
+        x = X[a:b]
+        # max/min of the values before each x
+        cmax = np.maximum.accumulate(np.concatenate(([max_x], x)))
+        cmin = np.minimum.accumulate(np.concatenate(([min_x], x)))
+        up_hit = x / cmin[:-1] >= up
+        down_hit = x / cmax[:-1] <= down
+        hit = up_hit | down_hit
+        if hit.any():
+            k = int(np.argmax(hit))
+            # the max/min is X[0] if no later value improved it
+            if up_hit[k]:
+                return (VALLEY if cmin[k] == x0 else PEAK), True
+            return (PEAK if cmax[k] == x0 else VALLEY), True
+        max_x, min_x = cmax[-1], cmin[-1]
+        a, block = b, 2 * block
+    return (VALLEY if x0 < X[n - 1] else PEAK), False
+
+
+def _scan(X: np.ndarray, start: int, end: int, state: tuple, up: float,
+          down: float, marks: list, record: tuple = None,
+          sync: tuple = None) -> tuple:
+    """Function to run the ZigZag over X[start:end]
+
+    Arguments:
+        X: Array with the values
+        start: Index of the first value to process
+        end: Index following the last value to process
+        state: (trend, last_t, last_x) before X[start]. last_t is the
+               index of the candidate pivot and last_x its value
+        up: Min relative change to define a peak, plus 1
+        down: Min relative change to define a valley, plus 1
+        marks: List to which a (t, index, type) tuple is appended for each
+               pivot confirmed at index t
+        record: (trends, last_ts) arrays in which the trend and last_t
+                after each value are stored
+        sync: (trends, last_ts) arrays of another scan of X. The scan stops
+              after the first value with the same trend and last_t in
+              both scans, as they are the same from there on
+
+    Returns:
+        Index following the last value processed
+        state after it
+    """
+    trend, last_t, last_x = state
+    a, block = start, _BLOCK
+    while a < end:
+        b = min(end, a + block)
+        x = X[a:b]
+        if trend == VALLEY:
+            ext = np.minimum.accumulate(np.concatenate(([last_x], x)))[:-1]
+            hit = x / ext >= up
+            better = x < ext
+        else:
+            ext = np.maximum.accumulate(np.concatenate(([last_x], x)))[:-1]
+            hit = x / ext <= down
+            better = x > ext
+        k = int(np.argmax(hit)) if hit.any() else len(x)
+        if record is not None or sync is not None:
+            last_ts = np.maximum.accumulate(
+                np.where(better[:k], np.arange(a, a + k), last_t))
+            if record is not None:
+                record[0][a:a + k] = trend
+                record[1][a:a + k] = last_ts
+            if sync is not None:
+                same = (sync[0][a:a + k] == trend) & \
+                    (sync[1][a:a + k] == last_ts)
+                if same.any():
+                    j = int(np.argmax(same))
+                    t = int(last_ts[j])
+                    return a + j + 1, (trend, t, X[t])
+        improved = np.flatnonzero(better[:k])
+        if len(improved):
+            last_t = a + int(improved[-1])
+            last_x = X[last_t]
+        if k == len(x):
+            a, block = b, 2 * block
+            continue
+        # reversal: the candidate is confirmed as a pivot
+        t = a + k
+        marks.append((t, last_t, trend))
+        trend, last_t, last_x = -trend, t, X[t]
+        if record is not None:
+            record[0][t] = trend
+            record[1][t] = t
+        if sync is not None and sync[0][t] == trend and sync[1][t] == t:
+            return t + 1, (trend, last_t, last_x)
+        a, block = t + 1, _BLOCK
+    return end, (trend, last_t, last_x)
+
+
+def _to_pivots(n: int, initial: int, marks: list, state: tuple,
+               offset: int = 0) -> np.ndarray:
+    pivots = np.zeros(n, dtype=np.int8)
+    pivots[0] = initial
+    if marks:
+        ixs = np.array([m[1] for m in marks]) - offset
+        pivots[ixs] = [m[2] for m in marks]
+    trend, last_t = state[0], state[1] - offset
+    # the first and last values are always a pivot
+    if last_t == n - 1:
+        pivots[last_t] = trend
+    elif pivots[n - 1] == 0:
+        pivots[n - 1] = -trend
+    return pivots
+
+
+def peak_valley_pivots(X, up_thresh: float,
+                       down_thresh: float) -> np.ndarray:
+    """Function to find the peaks and valleys of a series
+
+    Arguments:
+        X: Series
+        up_thresh: Min relative change to define a peak
+        down_thresh: Min relative change to define a valley. It must be
+                     negative
+
+    Returns:
+        int8 array with 1 for the peaks, -1 for the valleys and 0 otherwise.
+        The first and last values are always a peak or a valley
+    """
+    if down_thresh > 0:
+        raise ValueError("The down_thresh must be negative.")
+    X = np.asarray(X, dtype=np.float64)
+    up, down = up_thresh + 1, down_thresh + 1
+    initial, _ = _initial_pivot(X, up, down)
+    marks = []
+    _, state = _scan(X, 1, len(X), (-initial, 0, X[0]), up, down, marks)
+    return _to_pivots(len(X), initial, marks, state)
+
+
+def pivots_to_modes(pivots) -> np.ndarray:
+    """Function to translate the pivots into trend modes
+
+    Arguments:
+        pivots: Array returned by peak_valley_pivots
+
+    Returns:
+        int8 array with 1 between a valley (excluded) and a peak
+        (included) and -1 between a peak (excluded) and a valley (included)
+    """
+    pivots = np.asarray(pivots, dtype=np.int8)
+    modes = np.zeros(len(pivots), dtype=np.int8)
+    if len(pivots) == 0:
+        return modes
+    modes[0] = pivots[0]
+    # index of the last pivot before each value
+    ixs = np.where(pivots != 0, np.arange(len(pivots)), 0)
+    prev = np.maximum.accumulate(ixs)[:-1]
+    modes[1:] = -pivots[prev]
+    return modes
+
+
+class ZigZag(object):
+    """Class representing the ZigZag indicator over a series whose values
+    are appended over time.
+
+    update() only processes the new values, so keeping the pivots of a
+    growing series costs O(new values). The state of the scan after each
+    value is kept, so the scan of a window of the series (i.e. of a
+    CandleListView) stops as soon as it meets the scan of the whole
+    series, usually a couple of pivots after the start of the window.
+
+    Class variables:
+        values: Array with the values processed. It must not be modified
+        up_thresh: Min relative change to define a peak
+        down_thresh: Min relative change to define a valley (negative)
+    """
+
+    __slots__ = ["values", "up_thresh", "down_thresh", "_up", "_down",
+                 "_initial", "_state", "_marks", "_trends", "_last_ts"]
+
+    def __init__(self, values, up_thresh: float, down_thresh: float):
+        if down_thresh > 0:
+            raise ValueError("The down_thresh must be negative.")
+        self.up_thresh = up_thresh
+        self.down_thresh = down_thresh
+        self._up, self._down = up_thresh + 1, down_thresh + 1
+        self.values = np.empty(0)
+        self._initial = None
+        self._state = None
+        self._marks = []
+        self._trends = np.empty(0, dtype=np.int8)
+        self._last_ts = np.empty(0, dtype=np.int64)
+        self.update(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def update(self, values) -> "ZigZag":
+        """Function to process the values appended to the series
+
+        Arguments:
+            values: The whole series. The first len(self) values must be
+                    the ones already processed
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n, m = len(self.values), len(values)
+        if m < n:
+            raise ValueError(f"The series can not shrink: {n} -> {m}")
+        self.values = values
+        if m == n:
+            return self
+        if m > len(self._trends):
+            capacity = max(2 * len(self._trends), m, 16)
+            self._trends = np.resize(self._trends, capacity)
+            self._last_ts = np.resize(self._last_ts, capacity)
+        if self._initial is None:
+            # the type of the first pivot is not known until the first
+            # change reaching the thresholds
+            initial, found = _initial_pivot(values, self._up, self._down)
+            if not found:
+                return self
+            self._initial = initial
+            self._state = (-initial, 0, values[0])
+            self._trends[0], self._last_ts[0] = -initial, 0
+            n = 1
+        _, self._state = _scan(values, n, m, self._state, self._up,
+                               self._down, self._marks,
+                               record=(self._trends, self._last_ts))
+        return self
+
+    def pivots(self, start: int = 0, end: int = None) -> np.ndarray:
+        """Function to get the pivots of values[start:end]
+
+        Returns:
+            Same as peak_valley_pivots(values[start:end], up_thresh,
+            down_thresh)
+        """
+        X = self.values
+        if end is None:
+            end = len(X)
+        if not 0 <= start < end <= len(X):
+            raise ValueError(f"Invalid window: {start}-{end}")
+        if start == 0 and end == len(X) and self._initial is not None:
+            return _to_pivots(end, self._initial, self._marks, self._state)
+        initial, _ = _initial_pivot(X[start:end], self._up, self._down)
+        marks = []
+        sync = None if self._initial is None else (self._trends,
+                                                   self._last_ts)
+        stop, state = _scan(X, start + 1, end, (-initial, start, X[start]),
+                            self._up, self._down, marks, sync=sync)
+        if stop < end:
+            # from 'stop' on, the window has the pivots of the whole series
+            i = bisect.bisect_left(self._marks, (stop,))
+            j = bisect.bisect_left(self._marks, (end,))
+            marks.extend(self._marks[i:j])
+            last_t = int(self._last_ts[end - 1])
+            state = (int(self._trends[end - 1]), last_t, X[last_t])
+        return _to_pivots(end - start, initial, marks, state, offset=start)
+
+    def modes(self, start: int = 0, end: int = None) -> np.ndarray:
+        """Function to get the trend modes of values[start:end]"""
+        return pivots_to_modes(self.pivots(start, end))
+
+    def __repr__(self):
+        return "ZigZag"
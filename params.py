@@ -14,6 +14,10 @@ class gparams:
     ic_perc: int = 20
     # size of images
     size = (20, 10)
+    # Folder with the local candle archive (see forex.candle_archive). If
+    # set, candles are read from the archive when it covers the requested
+    # time range instead of querying the API
+    archive_dir: str = None
 
 
 @dataclass
@@ -0,0 +1,30 @@
+import pytest
+
+from api.oanda.governor import reset_governor
+from api.oanda.replay_server import ReplayServer
+from api.params import Params as apiparams
+from forex.candle import CandleList
+from utils import DATA_DIR
+
+
+@pytest.fixture
+def clO_pickled():
+    clO = CandleList.pickle_load(DATA_DIR+"/clist_audusd_2010_2020.pckl")
+    clO.calc_rsi()
+
+    return clO
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """Local stand-in for Oanda's REST API serving the candles in
+    clist_audusd_2010_2020.pckl"""
+    clO = CandleList.pickle_load(DATA_DIR + "/clist_audusd_2010_2020.pckl")
+    server = ReplayServer(clists=[clO]).start()
+    server.clO = clO
+    monkeypatch.setattr(apiparams, "url", server.url)
+    monkeypatch.setattr(apiparams, "backoff_base", 0.01)
+    reset_governor()
+    yield server
+    server.stop()
+    reset_governor()
@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+
+from datetime import datetime
+from api.oanda.async_connect import AsyncConnect, gather, get_executor
+from api.oanda.governor import APIError
+
+
+def test_query(fake_api):
+    conn = AsyncConnect(instrument="AUD_USD", granularity="D")
+    clO = asyncio.run(conn.query("2018-11-16T22:00:00",
+                                 "2018-11-20T22:00:00"))
+
+    assert clO.instrument == "AUD_USD"
+    assert len(clO) == 3
+    assert clO.candles[0].time == datetime(2018, 11, 18, 22, 0)
+
+
+def test_fetch_candle(fake_api):
+    conn = AsyncConnect(instrument="AUD_USD", granularity="D")
+    candle = asyncio.run(conn.fetch_candle(datetime(2019, 5, 7, 21, 0)))
+
+    assert candle.o == 0.70118
+
+
+def test_gather(fake_api):
+    """Queries run concurrently, but not more than 'limit' at a time"""
+    fake_api.latency = 0.1
+    days = [f"2019-05-{day:02d}T21:00:00" for day in range(5, 10)] * 2
+    conn = AsyncConnect(instrument="AUD_USD", granularity="D")
+
+    async def main():
+        return await gather(*(conn.query(day, day) for day in days),
+                            limit=3)
+    clists = asyncio.run(main())
+
+    assert [clO.candles[0].time.day for clO in clists] == \
+        [5, 6, 7, 8, 9] * 2
+    assert fake_api.max_active == 3
+
+
+def test_executor(fake_api):
+    """The requests are not capped by the default executor of the loop"""
+    fake_api.latency = 0.2
+    days = [f"2019-05-{day:02d}T21:00:00" for day in range(1, 11)]
+    conn = AsyncConnect(instrument="AUD_USD", granularity="D",
+                        executor=get_executor(10))
+
+    async def main():
+        return await gather(*(conn.query(day, day) for day in days),
+                            limit=10)
+    asyncio.run(main())
+
+    assert fake_api.max_active == 10
+
+
+def test_gather_error(fake_api):
+    """The coroutines not started are discarded if one fails"""
+    conn = AsyncConnect(instrument="AUD_USD", granularity="D")
+    fake_api.errors = [400]
+
+    async def main():
+        aws = [conn.query("2019-05-07T21:00:00", "2019-05-07T21:00:00")
+               for _ in range(4)]
+        with pytest.raises(APIError):
+            await gather(*aws, limit=1)
+        return aws
+    aws = asyncio.run(main())
+
+    assert fake_api.n_requests == 1
+    assert all(aw.cr_frame is None for aw in aws)
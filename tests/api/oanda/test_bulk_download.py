@@ -0,0 +1,79 @@
+import datetime
+import numpy as np
+import pytest
+
+from api.oanda.bulk_download import download, plan_chunks
+from api.oanda.governor import APIError
+from api.params import Params as apiparams
+from forex.candle import CandleList
+from forex.candle_archive import CandleArchive
+from utils import to_epoch
+
+start = datetime.datetime(2015, 1, 1)
+end = datetime.datetime(2018, 1, 1)
+
+
+@pytest.fixture
+def bulk_api(fake_api, monkeypatch):
+    fake_api.clists[("EUR_USD", "D")] = fake_api.clO
+    fake_api.max_count = 300
+    monkeypatch.setattr(apiparams, "max_count", 300)
+    return fake_api
+
+
+def test_download(bulk_api, tmp_path):
+    summary = download(f"{tmp_path}/archive", ["AUD_USD", "EUR_USD"], ["D"],
+                       start, end, workers=4)
+
+    assert bulk_api.n_requests == summary["chunks"] == 8
+    archive = CandleArchive(f"{tmp_path}/archive")
+    times = bulk_api.clO.get_column("time")
+    expected = times[(times >= to_epoch(start)) & (times <= to_epoch(end))]
+    for instrument in ("AUD_USD", "EUR_USD"):
+        assert archive.coverage(instrument, "D") == [(start, end)]
+        clO = archive.load(instrument, "D", start, end)
+        assert clO.get_column("time").tolist() == expected.tolist()
+    assert summary["candles"] == 2 * len(expected)
+
+
+def test_download_resume(bulk_api, tmp_path):
+    """Only the chunks that failed are downloaded again"""
+    bulk_api.errors = [400]
+    with pytest.raises(APIError):
+        download(f"{tmp_path}/archive", ["AUD_USD"], ["D"], start, end,
+                 workers=1)
+    archive = CandleArchive(f"{tmp_path}/archive")
+    assert len(plan_chunks(archive, "AUD_USD", "D", start, end)) == 1
+    assert bulk_api.n_requests == 4
+
+    summary = download(f"{tmp_path}/archive", ["AUD_USD"], ["D"], start,
+                       end)
+    assert summary["chunks"] == 1
+    assert bulk_api.n_requests == 5
+    assert archive.coverage("AUD_USD", "D") == [(start, end)]
+
+    summary = download(f"{tmp_path}/archive", ["AUD_USD"], ["D"], start,
+                       end)
+    assert summary["chunks"] == 0
+    assert bulk_api.n_requests == 5
+
+
+def test_download_gap_free(fake_api, monkeypatch, tmp_path):
+    """Chunks of gap-free candles hold at most apiparams.max_count
+    candles, as both bounds of a chunk are included"""
+    times = np.arange(250) * 3600 + to_epoch(datetime.datetime(2019, 1, 7))
+    prices = np.linspace(0.7, 0.8, 250)
+    fake_api.clists[("AUD_USD", "H1")] = CandleList.from_arrays(
+        "AUD_USD", "H1", times, prices, prices, prices, prices)
+    fake_api.max_count = 100
+    monkeypatch.setattr(apiparams, "max_count", 100)
+    hstart = datetime.datetime(2019, 1, 7)
+    hend = datetime.datetime(2019, 1, 17, 9)
+
+    summary = download(f"{tmp_path}/archive", ["AUD_USD"], ["H1"], hstart,
+                       hend)
+    assert summary["chunks"] == 3
+    archive = CandleArchive(f"{tmp_path}/archive")
+    assert archive.coverage("AUD_USD", "H1") == [(hstart, hend)]
+    assert archive.load("AUD_USD", "H1", hstart,
+                        hend).get_column("time").tolist() == times.tolist()
@@ -1,9 +1,20 @@
 import pytest
 import logging
+import time
+import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from api.oanda.connect import Connect
+import api.oanda.connect
+
+from api.oanda.connect import (Connect, get_session, close_session,
+                               decode_candles, single_flight_stats)
+from api.oanda.governor import APIError
+from api.params import Params as apiparams
+from forex.candle import CandleList
+from forex.candle_archive import CandleArchive
 from trading_journal.trade_utils import process_start
+from utils import to_epoch
 
 
 @pytest.fixture
@@ -85,14 +96,17 @@ def test_validate_datetime():
         conn.validate_datetime("2018-05-23T21")
 
 
-def test_query_in_future():
-    """Query with a future datetime"""
+def test_query_in_future(fake_api):
+    """Query with a future datetime (and an invalid instrument) raises
+    the error returned by the API"""
     timeframe = "D"
     now = datetime.now()
     aligned_start = process_start(dt=now, timeframe=timeframe).isoformat().split(".")[0]
 
     conn = Connect(instrument=timeframe, granularity="AUD_USD")
-    assert conn.query(aligned_start, count=1).candles == []
+    with pytest.raises(APIError) as excinfo:
+        conn.query(aligned_start, count=1)
+    assert excinfo.value.status_code == 400
 
 
 date_data = [
@@ -112,3 +126,217 @@ def test_fetch_candle(day, expected_datetime):
         assert candle.time == expected_datetime
     else:
         assert candle is None
+
+
+def test_get_session():
+    """All the Connect objects share a Session"""
+    session = get_session()
+    assert get_session() is session
+    assert session.get_adapter("https://").poolmanager.connection_pool_kw[
+        "maxsize"] == apiparams.pool_maxsize
+
+    close_session()
+    assert get_session() is not session
+
+
+def test_fetch_range(fake_api):
+    """The candles of a range are fetched with a single request, both
+    bounds included"""
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    clO = conn.fetch_range(datetime(2019, 5, 1, 21, 0),
+                           datetime(2019, 5, 7, 21, 0))
+
+    assert fake_api.n_requests == 1
+    assert clO.times[0] == datetime(2019, 5, 1, 21, 0)
+    assert clO.times[-1] == datetime(2019, 5, 7, 21, 0)
+    assert len(clO) == 5
+
+
+def test_query_pooled_connection(fake_api):
+    """Consecutive queries reuse the same connection"""
+    # serve the daily candles for H12 too
+    fake_api.clists[("AUD_USD", "H12")] = fake_api.clO
+    close_session()
+    for granularity in ("D", "D", "H12"):
+        conn = Connect(instrument="AUD_USD", granularity=granularity)
+        clO = conn.query("2018-11-16T22:00:00", "2018-11-20T22:00:00")
+        assert len(clO) == 3
+        assert clO.candles[0].time == datetime(2018, 11, 18, 22, 0)
+
+    assert fake_api.n_connections == 1
+
+
+def test_query_pages(fake_api, monkeypatch):
+    """Time ranges with more than apiparams.max_count candles are split
+    into pages"""
+    fake_api.max_count = 300
+    monkeypatch.setattr(apiparams, "max_count", 300)
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    clO = conn.query("2010-11-16T22:00:00", "2020-11-19T22:00:00")
+
+    assert fake_api.n_requests == 13
+    assert clO.get_column("time").tolist() == \
+        fake_api.clO.get_column("time").tolist()
+    assert clO.get_column("c").tolist() == \
+        fake_api.clO.get_column("c").tolist()
+
+
+def test_query_pages_gap_free(fake_api, monkeypatch):
+    """Pages of gap-free candles hold at most apiparams.max_count candles,
+    as the 'to' parameter is included, and do not overlap"""
+    times = np.arange(250) * 3600 + to_epoch(datetime(2019, 1, 7))
+    prices = np.linspace(0.7, 0.8, 250)
+    fake_api.clists[("AUD_USD", "H1")] = CandleList.from_arrays(
+        "AUD_USD", "H1", times, prices, prices, prices, prices)
+    fake_api.max_count = 100
+    monkeypatch.setattr(apiparams, "max_count", 100)
+
+    conn = Connect(instrument="AUD_USD", granularity="H1")
+    # the 100th candle is the last one of the first page
+    clO = conn.query("2019-01-07T00:00:00", "2019-01-17T09:00:00")
+
+    assert fake_api.n_requests == 3
+    assert clO.get_column("time").tolist() == times.tolist()
+
+
+def test_query_error(fake_api, monkeypatch):
+    """APIError is raised if the API returns an error"""
+    fake_api.max_count = 300
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    with pytest.raises(APIError) as excinfo:
+        conn.query("2010-11-16T22:00:00", "2020-11-19T22:00:00")
+    assert excinfo.value.status_code == 400
+    # client errors are not retried
+    assert fake_api.n_requests == 1
+
+
+def test_query_cache(fake_api, monkeypatch, tmp_path):
+    """Only the time ranges that are not in the cache are fetched"""
+    monkeypatch.setattr(apiparams, "cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(api.oanda.connect, "_utcnow",
+                        lambda: datetime(2021, 1, 1))
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    clO = conn.query("2019-05-01T21:00:00", "2019-06-03T21:00:00")
+    assert fake_api.n_requests == 1
+    assert len(clO) == 24
+
+    clO = conn.query("2019-05-05T21:00:00", "2019-05-30T21:00:00")
+    assert fake_api.n_requests == 1
+    assert clO.candles[0].time == datetime(2019, 5, 5, 21, 0)
+    assert clO.candles[-1].time == datetime(2019, 5, 30, 21, 0)
+
+    # only the ranges before and after the cached one are fetched
+    clO = conn.query("2019-04-01T21:00:00", "2019-07-01T21:00:00")
+    assert fake_api.n_requests == 3
+    expected = fake_api.clO.slice(start=datetime(2019, 4, 1, 21, 0),
+                                  end=datetime(2019, 7, 1, 21, 0))
+    assert clO.get_column("time").tolist() == \
+        expected.get_column("time").tolist()
+    assert clO.get_column("c").tolist() == expected.get_column("c").tolist()
+
+
+def test_query_cache_incomplete(fake_api, monkeypatch, tmp_path):
+    """The candle that is not complete yet is not cached"""
+    monkeypatch.setattr(apiparams, "cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(api.oanda.connect, "_utcnow",
+                        lambda: datetime(2019, 5, 8, 12, 0))
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    clO = conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+    assert len(clO) == 5
+    assert clO.candles[-1].time == datetime(2019, 5, 7, 21, 0)
+
+    clO = conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+    assert fake_api.n_requests == 2
+    assert len(clO) == 5
+
+
+def test_query_cache_forming(fake_api, monkeypatch, tmp_path):
+    """The candle returned as not complete by the API is not cached, even
+    if the local clock says it is"""
+    monkeypatch.setattr(apiparams, "cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(api.oanda.connect, "_utcnow",
+                        lambda: datetime(2019, 6, 1, 12, 0))
+    fake_api.forming = datetime(2019, 5, 7, 21, 0)
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    assert len(conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")) == 5
+    assert CandleArchive(apiparams.cache_dir).coverage("AUD_USD", "D") == \
+        [(datetime(2019, 5, 1, 21, 0), datetime(2019, 5, 7, 20, 59, 59))]
+
+    fake_api.forming = None
+    clO = conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+    assert fake_api.n_requests == 2
+    assert len(clO) == 5
+
+
+def test_decode_candles():
+    content = (b'{"instrument": "AUD_USD", "granularity": "D", "candles": ['
+               b'{"complete": true, "volume": 100, '
+               b'"time": "2019-05-07T21:00:00.000000000Z", "mid": '
+               b'{"o": "0.70118", "h": "0.70270", "l": "0.69918", '
+               b'"c": "0.70100"}}, '
+               b'{"complete": false, "volume": 10, '
+               b'"time": "2019-05-08T21:00:00.000000000Z", "mid": '
+               b'{"o": "0.70100", "h": "0.70200", "l": "0.70000", '
+               b'"c": "0.70150"}}]}')
+    columns = decode_candles(content)
+
+    assert columns["time"].tolist() == [1557262800, 1557349200]
+    assert columns["o"].tolist() == [0.70118, 0.701]
+    assert columns["h"].tolist() == [0.7027, 0.702]
+    assert columns["l"].tolist() == [0.69918, 0.7]
+    assert columns["c"].tolist() == [0.701, 0.7015]
+    assert columns["complete"].tolist() == [True, False]
+
+    columns = decode_candles(b'{"candles": []}')
+    assert len(columns["time"]) == len(columns["c"]) == 0
+
+
+def test_query_single_flight(fake_api):
+    """Identical queries running at the same time share the request"""
+    fake_api.latency = 0.3
+    before = single_flight_stats()
+
+    def query(_):
+        conn = Connect(instrument="AUD_USD", granularity="D")
+        return conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+
+    with ThreadPoolExecutor(max_workers=6) as ex:
+        clists = list(ex.map(query, range(6)))
+
+    assert fake_api.n_requests == 1
+    after = single_flight_stats()
+    assert after["calls"] - before["calls"] == 6
+    assert after["hits"] - before["hits"] == 5
+    assert all(len(clO) == 5 for clO in clists)
+    # each query gets its own CandleList
+    assert len({id(clO) for clO in clists}) == 6
+    clists[0].calc_rsi()
+    assert all(clO.get_column("rsi") is None for clO in clists[1:])
+
+    # queries that are not running at the same time are not shared
+    query(0)
+    assert fake_api.n_requests == 2
+
+
+def test_single_flight_shared():
+    """The leader is told that the result is shared if other threads got
+    it, so no thread modifies the result the others copy"""
+    flight = api.oanda.connect.SingleFlight()
+    result = object()
+
+    def func():
+        # wait for the followers to join the call
+        while flight.stats()["hits"] < 3:
+            time.sleep(0.01)
+        return result
+
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        calls = list(ex.map(lambda _: flight.do("key", func), range(4)))
+
+    assert calls == [(result, True)] * 4
+    assert flight.do("key", lambda: result) == (result, False)
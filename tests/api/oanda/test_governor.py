@@ -0,0 +1,120 @@
+import pytest
+import time
+
+from api.oanda.connect import Connect
+from api.oanda.governor import (APIError, CircuitBreaker, CircuitOpenError,
+                                TokenBucket, get_governor)
+from api.params import Params as apiparams
+
+
+def test_token_bucket():
+    """Requests beyond the burst are spaced by the rate"""
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(12)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert time.monotonic() - start >= 0.19
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    # a single trial request is allowed
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_circuit_breaker_trial():
+    """A failed trial request (429 included) opens the circuit again"""
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    # only the thread sending the trial request resolves it
+    assert not breaker.fail_trial()
+    assert breaker.allow()
+    assert breaker.fail_trial()
+    assert breaker.state == "open"
+    assert not breaker.fail_trial()
+
+
+def test_retry(fake_api):
+    """Requests failing with 429/5xx are retried"""
+    fake_api.errors = [503, 429, 500]
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    clO = conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+
+    assert len(clO) == 5
+    stats = get_governor().stats()
+    assert stats["requests"] == 4
+    assert stats["retries"] == 3
+    assert stats["throttled"] == 1
+    assert stats["server_errors"] == 2
+
+
+def test_retry_budget(fake_api, monkeypatch):
+    """APIError is raised once the retries are exhausted, and the circuit
+    breaker rejects the next requests"""
+    monkeypatch.setattr(apiparams, "max_retries", 2)
+    monkeypatch.setattr(apiparams, "breaker_threshold", 1)
+    fake_api.errors = [503] * 10
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    with pytest.raises(APIError) as excinfo:
+        conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+    assert excinfo.value.status_code == 503
+    assert fake_api.n_requests == 3
+
+    with pytest.raises(CircuitOpenError):
+        conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+    assert fake_api.n_requests == 3
+    stats = get_governor().stats()
+    assert stats["failures"] == 1
+    assert stats["rejected"] == 1
+
+
+def test_failing_request(fake_api):
+    """A single request failing after all its retries does not open the
+    circuit breaker for the other requests"""
+    fake_api.errors = [503] * (apiparams.max_retries + 1)
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    with pytest.raises(APIError):
+        conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+    assert get_governor().breaker.state == "closed"
+
+    clO = conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+    assert len(clO) == 5
+    assert "rejected" not in get_governor().stats()
+
+
+def test_trial_request(fake_api, monkeypatch):
+    """The trial request of a half-open circuit breaker is not retried and
+    a 429 opens the circuit again"""
+    monkeypatch.setattr(apiparams, "max_retries", 0)
+    monkeypatch.setattr(apiparams, "breaker_threshold", 1)
+    monkeypatch.setattr(apiparams, "breaker_reset", 0.05)
+    fake_api.errors = [503, 429]
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    for status_code in (503, 429):
+        time.sleep(0.06)
+        with pytest.raises(APIError) as excinfo:
+            conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+        assert excinfo.value.status_code == status_code
+        assert get_governor().breaker.state == "open"
+
+    time.sleep(0.06)
+    assert len(conn.query("2019-05-01T21:00:00",
+                          "2019-05-07T21:00:00")) == 5
+    assert get_governor().breaker.state == "closed"
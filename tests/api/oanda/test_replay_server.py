@@ -0,0 +1,76 @@
+import pytest
+import requests
+
+from api.oanda.connect import Connect
+from api.oanda.governor import get_governor, reset_governor
+from api.oanda.replay_server import ReplayServer
+from api.params import Params as apiparams
+from forex.candle_archive import CandleArchive
+
+
+@pytest.fixture
+def archive_api(clO_pickled, tmp_path, monkeypatch):
+    """ReplayServer serving the candles in a CandleArchive"""
+    archive = CandleArchive(f"{tmp_path}/archive")
+    archive.save(clO_pickled)
+    server = ReplayServer(archive=archive.root, seed=1).start()
+    monkeypatch.setattr(apiparams, "url", server.url)
+    monkeypatch.setattr(apiparams, "backoff_base", 0.01)
+    reset_governor()
+    yield server
+    server.stop()
+    reset_governor()
+
+
+def test_candles(archive_api, clO_pickled):
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    clO = conn.query("2019-05-01T21:00:00", "2019-05-07T21:00:00")
+    assert len(clO) == 5
+    assert clO.get_column("c").tolist() == \
+        clO_pickled.slice(clO.times[0], clO.times[-1]).get_column("c").tolist()
+
+    clO = conn.query("2019-05-01T21:00:00", count=3)
+    assert len(clO) == 3
+
+    # the last candles before 'to'
+    resp = requests.get(f"{archive_api.url}/AUD_USD/candles",
+                        params={"granularity": "D", "count": 2,
+                                "to": "2019-05-07T21:00:00"})
+    assert [c["time"][:10] for c in resp.json()["candles"]] == \
+        ["2019-05-06", "2019-05-07"]
+
+
+def test_invalid_requests(archive_api):
+    archive_api.max_count = 1000
+    url = f"{archive_api.url}/AUD_USD/candles"
+    assert requests.get(url, params={"granularity": "H4",
+                                     "from": "2019-05-01T21:00:00"}
+                        ).status_code == 400
+    assert requests.get(url, params={"granularity": "D",
+                                     "from": "2019-05-01T21:00:00",
+                                     "count": 1001}).status_code == 400
+    assert requests.get(url, params={"granularity": "D",
+                                     "from": "2010-05-01T21:00:00",
+                                     "to": "2030-05-01T21:00:00"}
+                        ).status_code == 400
+    assert requests.get(f"{archive_api.url}/AUD_USD/other"
+                        ).status_code == 404
+
+
+def test_error_injection(archive_api):
+    """The injected errors are retried by the Governor"""
+    archive_api.stall = 0
+    archive_api.errors = ["timeout", 429]
+    archive_api.error_rate = 0.3
+
+    conn = Connect(instrument="AUD_USD", granularity="D")
+    for _ in range(10):
+        assert len(conn.query("2019-05-01T21:00:00",
+                              "2019-05-07T21:00:00")) == 5
+
+    stats = get_governor().stats()
+    assert stats["connection_errors"] == 1
+    assert stats["throttled"] == 1
+    assert stats["server_errors"] > 0
+    assert stats["requests"] == archive_api.n_requests == \
+        10 + stats["retries"]
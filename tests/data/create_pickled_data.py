@@ -10,6 +10,7 @@ conn = Connect(
         granularity='D')
 clO = conn.query('2010-11-16T22:00:00', '2020-11-19T22:00:00')
 clO.pickle_dump(f"{DATA_DIR}/clist_audusd_2010_2020.pckl")
+clO.store_dump(f"{DATA_DIR}/clist_audusd_2010_2020.candles")
 
 # pickle CandleLists H8
 conn = Connect(
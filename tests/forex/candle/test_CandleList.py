@@ -6,9 +6,11 @@
 import os
 import logging
 import datetime
+import pytest
+import numpy as np
 
 from utils import DATA_DIR
-from forex.candle import CandleList
+from forex.candle import CandleList, CandleListView, rsi_bounces
 
 
 def test_candlelist_inst(clO):
@@ -168,3 +170,143 @@ def test_add_two_clists(clO, clO1):
 
     newClO = clO + clO1
     assert len(newClO.candles) == 4
+
+
+def test_get_column(clO):
+    """Check the columnar storage of the CandleList"""
+    assert clO.get_column("c").tolist() == [0.72950, 0.72000]
+    assert clO.get_column("time").dtype == 'int64'
+    assert clO.get_column("rsi") is None
+    assert clO.times[1] == datetime.datetime(2018, 11, 19, 22, 0)
+    assert clO.candles[-1].time == datetime.datetime(2018, 11, 19, 22, 0)
+    with pytest.raises(ValueError):
+        clO.get_column("volume")
+
+
+def test_from_arrays_copy():
+    """The arrays of the caller are copied unless copy=False"""
+    time = np.array([0, 86400], dtype=np.int64)
+    c = np.array([0.7295, 0.72])
+
+    clO = CandleList.from_arrays("AUD_USD", "D", time=time, o=c, h=c, l=c,
+                                 c=c)
+    assert time.flags.writeable and c.flags.writeable
+    c[0] = 0.7
+    assert clO.get_column("c").tolist() == [0.7295, 0.72]
+
+    clO = CandleList.from_arrays("AUD_USD", "D", time=time, o=c, h=c, l=c,
+                                 c=c, copy=False)
+    assert clO.get_column("c") is c
+    assert not c.flags.writeable
+
+
+def test_candles_from_columns(clO_pickled):
+    """Check that the Candles materialised from the columns are the ones
+    stored in the legacy pickled CandleList"""
+    clO_pickled.calc_rsi()
+    candles = list(clO_pickled.candles)
+
+    assert len(candles) == len(clO_pickled)
+    assert candles[15] == clO_pickled.candles[15]
+    assert candles[15].rsi == 61.54
+    assert [c.c for c in candles] == clO_pickled.get_column("c").tolist()
+
+
+@pytest.mark.parametrize("adatetime,tolerance,expected", [
+    (datetime.datetime(2019, 5, 7, 22, 0), None,
+     datetime.datetime(2019, 5, 7, 21, 0)),
+    (datetime.datetime(2019, 5, 4, 22, 0), None,
+     datetime.datetime(2019, 5, 5, 21, 0)),
+    (datetime.datetime(2019, 5, 4, 22, 0), datetime.timedelta(hours=12),
+     None),
+    (datetime.datetime(2000, 1, 1, 0, 0), None,
+     datetime.datetime(2010, 11, 16, 22, 0))
+])
+def test_nearest(clO_pickled, adatetime, tolerance, expected):
+    """Test the nearest time lookup"""
+    ix = clO_pickled.nearest(adatetime, tolerance=tolerance)
+    if expected is None:
+        assert ix is None
+    else:
+        assert clO_pickled.candles[ix].time == expected
+
+
+def test_slice_view(clO_pickled, tmp_path):
+    """Check that slice returns a view sharing the storage"""
+    start = datetime.datetime(2019, 5, 7, 21, 0)
+    end = datetime.datetime(2019, 7, 1, 21, 0)
+    view = clO_pickled.slice(start=start, end=end)
+
+    assert isinstance(view, CandleListView)
+    assert len(view) == 40
+    assert view.candles[0].time == start
+    assert np.shares_memory(view.get_column("c"),
+                            clO_pickled.get_column("c"))
+
+    subview = view.slice(start=datetime.datetime(2019, 6, 3, 21, 0),
+                         end=end)
+    assert subview.parent is clO_pickled
+    assert subview.candles[0] == clO_pickled[subview.candles[0].time]
+
+    copied = view.copy()
+    assert not isinstance(copied, CandleListView)
+    assert not np.shares_memory(copied.get_column("c"),
+                                clO_pickled.get_column("c"))
+
+    view.pickle_dump(f"{tmp_path}/view.pckl")
+    loaded = CandleList.pickle_load(f"{tmp_path}/view.pckl")
+    assert not isinstance(loaded, CandleListView)
+    assert loaded.get_column("c").tolist() == view.get_column("c").tolist()
+
+
+def test_update_rsi(clO_pickled):
+    """Check that extending the RSI candle by candle gives the same values
+    as calculating it for the whole CandleList"""
+    clO_pickled.calc_rsi()
+    candles = list(clO_pickled.candles)
+
+    clO = CandleList(clO_pickled.instrument, clO_pickled.granularity,
+                     candles=candles[:30])
+    clO.calc_rsi()
+    first = clO.get_column("c")
+    for c in candles[30:60]:
+        clO.update_rsi([c])
+    clO.update_rsi(clO_pickled.slice(start=candles[60].time,
+                                     end=candles[-1].time))
+
+    assert len(clO) == len(clO_pickled)
+    assert len(first) == 30
+    assert clO.candles[50].rsi == 48.59
+    np.testing.assert_array_equal(clO.get_column("rsi"),
+                                  clO_pickled.get_column("rsi"))
+    assert clO[candles[70].time] == candles[70]
+
+    # no EWM state, the RSI is calculated for the whole CandleList
+    clO = CandleList(clO_pickled.instrument, clO_pickled.granularity,
+                     candles=candles[:30])
+    clO.update_rsi(candles[30:60])
+    assert clO.candles[50].rsi == 48.59
+
+
+def test_rsibounces_windows(clO_pickled):
+    """Check the RSI bounces calculated for several windows at once"""
+    clO_pickled.calc_rsi()
+    times = clO_pickled.times
+    windows = [(times[100], times[300]), (times[500], times[900])]
+
+    res = clO_pickled.calc_rsi_bounces(windows=windows)
+
+    assert len(res) == 2
+    assert res == [clO_pickled.slice(start=start, end=end).calc_rsi_bounces()
+                   for start, end in windows]
+
+
+@pytest.mark.parametrize("type,expected", [
+    ("short", {"number": 2, "lengths": [3, 1]}),
+    ("long", {"number": 1, "lengths": [2]})
+])
+def test_rsi_bounces(type, expected):
+    """RSI values equal to the threshold do not change the region"""
+    rsi = [np.nan, 71, 70, 72, 73, 50, 28, 30, 25, 75]
+
+    assert rsi_bounces(rsi, type) == expected
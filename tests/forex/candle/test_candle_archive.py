@@ -0,0 +1,84 @@
+import datetime
+import pytest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from forex.candle_archive import CandleArchive
+
+
+def test_save_load(clO_pickled, tmp_path):
+    """Check that the candles are partitioned by year and loaded back for
+    a time range"""
+    archive = CandleArchive(f"{tmp_path}/archive")
+    archive.save(clO_pickled)
+
+    assert (tmp_path / "archive/AUD_USD/D/2015.candles").exists()
+    assert archive.covers("AUD_USD", "D",
+                          datetime.datetime(2012, 1, 1),
+                          datetime.datetime(2020, 1, 1))
+    assert not archive.covers("AUD_USD", "D",
+                              datetime.datetime(2009, 1, 1),
+                              datetime.datetime(2012, 1, 1))
+
+    start = datetime.datetime(2019, 5, 7, 21, 0)
+    end = datetime.datetime(2019, 7, 1, 21, 0)
+    clO = archive.load("AUD_USD", "D", start, end)
+
+    assert len(clO) == 40
+    assert clO.candles[0] == clO_pickled[start]
+    assert clO.candles[-1].time == end
+
+    # a range spanning several partitions
+    clO = archive.load("AUD_USD", "D", datetime.datetime(2012, 6, 1),
+                       datetime.datetime(2014, 6, 1))
+    assert clO.candles[0].time == datetime.datetime(2012, 6, 1, 21, 0)
+    assert clO.candles[-1].time == datetime.datetime(2014, 5, 29, 21, 0)
+
+
+def test_save_merge(clO_pickled, tmp_path):
+    """Saving overlapping CandleLists does not duplicate candles"""
+    times = clO_pickled.times
+    archive = CandleArchive(f"{tmp_path}/archive")
+    archive.save(clO_pickled.slice(start=times[0], end=times[1000]))
+    archive.save(clO_pickled.slice(start=times[900], end=times[-1]))
+
+    assert archive.coverage("AUD_USD", "D") == [(times[0], times[-1])]
+    clO = archive.load("AUD_USD", "D", times[0], times[-1])
+    assert clO.get_column("c").tolist() == \
+        clO_pickled.get_column("c").tolist()
+
+
+@pytest.mark.parametrize("executor", [ThreadPoolExecutor,
+                                      ProcessPoolExecutor])
+def test_save_concurrent(clO_pickled, tmp_path, executor):
+    """Concurrent saves to the same archive (from several threads or
+    processes) do not lose candles"""
+    times = clO_pickled.times
+    archive = CandleArchive(f"{tmp_path}/archive")
+    bounds = list(range(0, len(times), 100)) + [len(times) - 1]
+    chunks = [clO_pickled.slice(start=times[a], end=times[b]).copy()
+              for a, b in zip(bounds[:-1], bounds[1:])]
+    with executor(max_workers=8) as ex:
+        list(ex.map(archive.save, chunks))
+
+    assert archive.coverage("AUD_USD", "D") == [(times[0], times[-1])]
+    clO = archive.load("AUD_USD", "D", times[0], times[-1])
+    assert clO.get_column("time").tolist() == \
+        clO_pickled.get_column("time").tolist()
+    assert not list((tmp_path / "archive").glob("**/*.tmp"))
+
+
+def test_missing(clO_pickled, tmp_path):
+    """Check the parts of a time range that are not in the archive"""
+    times = clO_pickled.times
+    archive = CandleArchive(f"{tmp_path}/archive")
+    archive.save(clO_pickled.slice(start=times[100], end=times[200]))
+    archive.save(clO_pickled.slice(start=times[300], end=times[400]))
+
+    assert archive.missing("AUD_USD", "D", times[0], times[500]) == \
+        [(times[0], times[100]), (times[200], times[300]),
+         (times[400], times[500])]
+    assert archive.missing("AUD_USD", "D", times[150], times[350]) == \
+        [(times[200], times[300])]
+    assert archive.missing("AUD_USD", "D", times[310], times[390]) == []
+    assert archive.missing("AUD_USD", "D", times[600], times[700]) == \
+        [(times[600], times[700])]
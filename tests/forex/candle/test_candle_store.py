@@ -0,0 +1,64 @@
+import pytest
+import numpy as np
+
+from forex.candle import CandleList
+from forex.candle_store import read_header, read_store, write_store
+from utils import DATA_DIR
+
+
+def test_store_load(clO_pickled):
+    """Check the CandleList in the store fixture"""
+    clO = CandleList.store_load(DATA_DIR+"/clist_audusd_2010_2020.candles")
+
+    assert clO.instrument == 'AUD_USD'
+    assert clO.granularity == 'D'
+    assert len(clO) == len(clO_pickled)
+    assert clO.candles[15] == clO_pickled.candles[15]
+    assert clO.get_column("rsi") is None
+    assert not clO.get_column("c").flags.writeable
+
+
+def test_store_load_lazy_index(clO_pickled):
+    """Check that the time index is only built on the first lookup"""
+    clO = CandleList.store_load(DATA_DIR+"/clist_audusd_2010_2020.candles")
+
+    assert clO._stime is None
+    assert clO[clO_pickled.candles[15].time] == clO_pickled.candles[15]
+    assert clO._stime is clO.get_column("time")
+
+
+def test_store_dump(clO_pickled, tmp_path):
+    """Check that a CandleList is recovered from its store file"""
+    clO_pickled.calc_rsi()
+    outfile = clO_pickled.store_dump(f"{tmp_path}/clist.candles")
+
+    assert read_header(outfile) == {"version": 1,
+                                    "n": len(clO_pickled),
+                                    "instrument": "AUD_USD",
+                                    "granularity": "D",
+                                    "has_rsi": True}
+    for mmap in (True, False):
+        clO = CandleList.store_load(outfile, mmap=mmap)
+        for name in CandleList.COLUMNS:
+            np.testing.assert_array_equal(clO.get_column(name),
+                                          clO_pickled.get_column(name))
+    assert clO.candles[15].rsi == 61.54
+
+
+def test_store_empty(tmp_path):
+    outfile = write_store(f"{tmp_path}/empty.candles", "AUD_USD", "H8",
+                          time=[], o=[], h=[], l=[], c=[])
+    header, columns = read_store(outfile)
+
+    assert header["n"] == 0
+    assert len(columns["time"]) == 0
+
+
+def test_store_invalid(tmp_path):
+    with open(f"{tmp_path}/clist.pckl", "wb") as f:
+        f.write(b"\0" * 200)
+    with pytest.raises(ValueError):
+        read_header(f"{tmp_path}/clist.pckl")
+    with pytest.raises(ValueError):
+        write_store(f"{tmp_path}/invalid.candles", "AUD_USD", "H8",
+                    time=[1, 2], o=[1.0], h=[1.0], l=[1.0], c=[1.0])
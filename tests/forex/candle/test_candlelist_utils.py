@@ -1,6 +1,8 @@
 import datetime
+import pytest
 
-from forex.candlelist_utils import calc_SR,  calc_atr
+from forex.candle import CandleList
+from forex.candlelist_utils import calc_SR,  calc_atr, resample
 from params import pivots_params
 from forex.pivot import PivotList
 
@@ -28,3 +30,46 @@ def test_calc_atr(clO):
     atr = calc_atr(clO)
 
     assert atr == 374.1
+
+
+def test_resample(clOH8_2019_pickled, clO_pickled):
+    """Daily candles built from the H8 ones are the ones returned by the
+    API, including the weeks when the daily candle starts at 22:00 UTC"""
+    clO = resample(clOH8_2019_pickled, "D")
+
+    assert len(clO) == 257
+    assert clO.granularity == "D"
+    for c in clO.candles:
+        assert clO_pickled[c.time] == c
+        assert clO_pickled[c.time].h == c.h
+        assert clO_pickled[c.time].l == c.l
+        assert clO_pickled[c.time].c == c.c
+    assert clO.candles[0].time == datetime.datetime(2019, 1, 3, 22, 0)
+    assert clO.candles[50].time == datetime.datetime(2019, 3, 14, 21, 0)
+
+    # resampling to the same granularity gives the same candles
+    clO = resample(clOH8_2019_pickled, "H8")
+    assert clO.get_column("time").tolist() == \
+        clOH8_2019_pickled.get_column("time").tolist()
+
+    with pytest.raises(ValueError):
+        resample(clOH8_2019_pickled, "H12")
+
+
+def test_resample_partial():
+    """Buckets not spanned completely by the candles are discarded if
+    partial=False"""
+    # M15 candles from 21:15 to 22:45, the first M30 bucket is incomplete
+    clO = CandleList.from_arrays(
+        "AUD_USD", "M15",
+        time=[1557263700 + 900 * i for i in range(7)],
+        o=[1, 2, 3, 4, 5, 6, 7], h=[2, 3, 4, 5, 6, 7, 8],
+        l=[0, 1, 2, 3, 4, 5, 6], c=[2, 3, 4, 5, 6, 7, 8])
+
+    clO30 = resample(clO, "M30")
+    assert clO30.get_column("o").tolist() == [1, 2, 4, 6]
+    assert clO30.get_column("h").tolist() == [2, 4, 6, 8]
+
+    clO30 = resample(clO, "M30", partial=False)
+    assert clO30.get_column("o").tolist() == [2, 4, 6]
+    assert clO30.times[0] == datetime.datetime(2019, 5, 7, 21, 30)
@@ -0,0 +1,76 @@
+import datetime
+import pytest
+import numpy as np
+
+from forex.range_extrema import RangeExtrema
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(42)
+    # rounded so there are ties
+    return np.round(rng.normal(0.7, 0.05, 300), 2)
+
+
+def test_range_queries(values):
+    ext = RangeExtrema(values)
+    for start, end in [(0, 300), (0, 1), (5, 6), (17, 150), (128, 300),
+                       (299, 300), (3, 259)]:
+        window = values[start:end]
+        assert ext.argmax(start, end) == start + int(np.argmax(window))
+        assert ext.argmin(start, end) == start + int(np.argmin(window))
+        assert ext.max(start, end) == window.max()
+        assert ext.min(start, end) == window.min()
+    with pytest.raises(ValueError):
+        ext.max(10, 10)
+
+
+def test_range_queries_blocks():
+    rng = np.random.default_rng(7)
+    values = np.round(rng.normal(0.7, 0.05, 5000), 2)
+    ext = RangeExtrema(values)
+    bounds = np.sort(rng.integers(0, 5001, (500, 2)), axis=1)
+    for start, end in bounds:
+        if start == end:
+            continue
+        window = values[start:end]
+        assert ext.argmax(start, end) == start + int(np.argmax(window))
+        assert ext.argmin(start, end) == start + int(np.argmin(window))
+    # the tables are only built for ranges spanning several blocks
+    ext = RangeExtrema(values)
+    ext.argmax(10, 20)
+    assert not ext._levels
+    ext.argmax(10, 200)
+    assert set(ext._levels) == {"max"}
+
+
+def test_window(values):
+    ext = RangeExtrema(values).window(100, 200)
+
+    assert len(ext) == 100
+    assert ext.argmax() == int(np.argmax(values[100:200]))
+    assert ext.min(10, 20) == values[110:120].min()
+    assert ext.window(10, 20).argmin() == int(np.argmin(values[110:120]))
+
+
+@pytest.mark.parametrize("price", [0.6, 0.65, 0.7, 0.75, 0.9])
+def test_last_below_above(values, price):
+    ext = RangeExtrema(values)
+    for end in (300, 150, 1, 0):
+        below = np.flatnonzero(values[:end] < price)
+        above = np.flatnonzero(values[:end] > price)
+        assert ext.last_below(price, end) == \
+            (int(below[-1]) if len(below) else None)
+        assert ext.last_above(price, end) == \
+            (int(above[-1]) if len(above) else None)
+
+
+def test_candlelist_extrema(clO_pickled):
+    """A CandleListView uses the sparse tables of its parent"""
+    view = clO_pickled.slice(start=datetime.datetime(2019, 5, 7, 21, 0),
+                             end=datetime.datetime(2019, 7, 1, 21, 0))
+
+    assert view.extrema("h").max() == view.get_column("h").max()
+    assert view.extrema("h")._levels is clO_pickled.extrema("h")._levels
+    with pytest.raises(ValueError):
+        clO_pickled.extrema("time")
@@ -17,6 +17,12 @@ def clOH8_pickled():
     return CandleList.pickle_load(DATA_DIR+"/clist.AUDUSD.H8.2021.pckl")
 
 
+@pytest.fixture
+def clOH8_2019_pickled():
+    """Return the H8 pickled CandleList of 2019"""
+    return CandleList.pickle_load(DATA_DIR+"/clist.AUDUSD.H8.2019.pckl")
+
+
 @pytest.fixture
 def seg_pickled():
     return Segment.pickle_load(DATA_DIR+"/seg_audusd.pckl")
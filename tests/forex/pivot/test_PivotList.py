@@ -1,5 +1,6 @@
 import datetime
 import os
+import pickle
 
 from forex.pivot import PivotList
 
@@ -61,6 +62,22 @@ def test_fetch_by_time(pivotlist):
     adt = datetime.datetime(2014, 10, 2, 21, 0)
     rpt = pivotlist.fetch_by_time(adt)
     assert rpt.candle.time == datetime.datetime(2014, 10, 2, 21, 0)
+    assert pivotlist.fetch_by_time(datetime.datetime(2014, 10, 3)) is None
+
+
+def test_pickle(pivotlist, tmp_path):
+    """The indexes by time and type are rebuilt on load"""
+    outfile = f"{tmp_path}/pivotlist.pckl"
+    with open(outfile, "wb") as f:
+        pickle.dump(pivotlist, f)
+    with open(outfile, "rb") as f:
+        newpl = pickle.load(f)
+
+    assert len(newpl.fetch_by_type(type=1)) + \
+        len(newpl.fetch_by_type(type=-1)) == len(newpl) == 138
+    adt = datetime.datetime(2014, 10, 2, 21, 0)
+    assert newpl.fetch_by_time(adt) is newpl.pivots[
+        [p.candle.time for p in newpl.pivots].index(adt)]
 
 
 def test_pivots_report(pivotlist, tmp_path):
@@ -87,3 +104,15 @@ def test_calc_itrend(clO_pickled):
     assert pl1.calc_itrend().start() == datetime.datetime(2020, 3, 18, 21, 0)
     assert pl2.calc_itrend().start() == datetime.datetime(2019, 12, 30, 22, 0)
     assert pl3.calc_itrend().start() == datetime.datetime(2017, 9, 7, 21, 0)
+
+
+def test_inarea_ixs(pivotlist):
+    """The price index finds the pivots whose close, or high (peaks) or
+    low (valleys), is in the area"""
+    for price in (0.6, 0.7, 0.75, 0.9, 1.05):
+        lower, upper = price - 0.01, price + 0.01
+        ixs = [ix for ix, p in enumerate(pivotlist.pivots)
+               if lower <= p.candle.c <= upper
+               or (p.type == 1 and lower <= p.candle.h <= upper)
+               or (p.type == -1 and lower <= p.candle.l <= upper)]
+        assert pivotlist._inarea_ixs(lower, upper) == ixs
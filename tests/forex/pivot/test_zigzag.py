@@ -0,0 +1,83 @@
+import datetime
+import pytest
+import numpy as np
+
+from forex.candle import CandleList
+from forex.zigzag import ZigZag, peak_valley_pivots, pivots_to_modes
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(42)
+    # rounded so there are ties
+    return np.round(np.exp(np.cumsum(rng.normal(0, 0.01, 1000))), 3)
+
+
+def test_peak_valley_pivots():
+    X = np.array([1.0, 1.1, 1.2, 1.1, 1.0, 1.05, 1.3, 1.2, 1.25])
+    pivots = peak_valley_pivots(X, 0.1, -0.1)
+
+    assert pivots.tolist() == [-1, 0, 1, 0, -1, 0, 0, 0, -1]
+    assert pivots_to_modes(pivots).tolist() == [-1, 1, 1, -1, -1, 1, 1, 1,
+                                                1]
+    with pytest.raises(ValueError):
+        peak_valley_pivots(X, 0.1, 0.1)
+
+
+@pytest.mark.parametrize("th", [0.005, 0.02, 0.1])
+def test_zigzag_package(values, th):
+    """Same pivots and modes as the ZigZag package"""
+    zigzag = pytest.importorskip("zigzag")
+    pivots = zigzag.peak_valley_pivots(values, th, -th)
+
+    assert (peak_valley_pivots(values, th, -th) == pivots).all()
+    assert (pivots_to_modes(pivots) == zigzag.pivots_to_modes(pivots)).all()
+
+
+@pytest.mark.parametrize("th", [0.005, 0.02, 0.1])
+def test_update(values, th):
+    zz = ZigZag(values[:10], th, -th)
+    for n in (11, 12, 100, 101, 500, 1000):
+        zz.update(values[:n])
+        assert (zz.pivots() == peak_valley_pivots(values[:n], th,
+                                                  -th)).all()
+    with pytest.raises(ValueError):
+        zz.update(values[:10])
+
+
+@pytest.mark.parametrize("th", [0.005, 0.02, 0.1])
+def test_window(values, th):
+    zz = ZigZag(values, th, -th)
+    for start, end in [(0, 1), (0, 2), (3, 259), (128, 1000), (500, 501),
+                       (998, 1000), (100, 900)]:
+        window = values[start:end]
+        assert (zz.pivots(start, end) ==
+                peak_valley_pivots(window, th, -th)).all()
+        assert (zz.modes(start, end) ==
+                pivots_to_modes(peak_valley_pivots(window, th, -th))).all()
+
+
+def test_candlelist_zigzag(clO_pickled):
+    """The ZigZag of a CandleList is updated when candles are appended and
+    used by its views"""
+    th = 0.02
+    clO = clO_pickled.copy()
+    n = len(clO)
+    closes = clO.get_column("c")
+    clO = CandleList.from_arrays(clO.instrument, clO.granularity,
+                                 *(clO.get_column(name)[:n - 10]
+                                   for name in ("time", "o", "h", "l",
+                                                "c")))
+    assert (clO.zigzag(th) ==
+            peak_valley_pivots(closes[:n - 10], th, -th)).all()
+
+    for ix in range(n - 10, n):
+        clO.update_rsi([clO_pickled.candles[ix]])
+    assert (clO.zigzag(th) == peak_valley_pivots(closes, th, -th)).all()
+
+    view = clO.slice(start=datetime.datetime(2019, 5, 7, 21, 0),
+                     end=datetime.datetime(2019, 7, 1, 21, 0))
+    assert (view.zigzag(th, "h") ==
+            peak_valley_pivots(view.get_column("h"), th, -th)).all()
+    with pytest.raises(ValueError):
+        clO.zigzag(th, "time")
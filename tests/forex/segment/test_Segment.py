@@ -1,4 +1,5 @@
 import datetime
+from forex.segment import Segment, SegmentList
 
 
 def test_start(seg_pickled):
@@ -33,3 +34,49 @@ def test_prepend(seg_pickled, seg_pickledB):
     seg_pickled.prepend(seg_pickledB)
     assert len(seg_pickled.clist) == 60
     assert seg_pickled.diff == 35.7
+
+
+def test_merge_adjacent(clO_pickled):
+    """Merging adjacent Segments only updates the indices"""
+    seg = Segment(type=1, clist=clO_pickled, instrument="AUD_USD",
+                  start_ix=10, end_ix=20)
+    seg.append(Segment(type=1, clist=clO_pickled, instrument="AUD_USD",
+                       start_ix=20, end_ix=35))
+    seg.prepend(Segment(type=1, clist=clO_pickled, instrument="AUD_USD",
+                        start_ix=5, end_ix=10))
+
+    assert seg.parent is clO_pickled
+    assert (seg.start_ix, seg.end_ix) == (5, 35)
+    assert seg.clist == clO_pickled.candles[5:35]
+    assert seg.start() == clO_pickled.candles[5].time
+    assert seg.end() == clO_pickled.candles[34].time
+    assert seg.get_lowest().l == min(c.l for c in clO_pickled.candles[5:35])
+
+
+def test_cached_bounds(clO_pickled):
+    """start, end and clist are computed once and updated on merges"""
+    seg = Segment(type=1, clist=clO_pickled, instrument="AUD_USD",
+                  start_ix=10, end_ix=20)
+    assert seg.start() is seg.start()
+    assert seg.clist is seg.clist
+    assert seg.end() == clO_pickled.candles[19].time
+
+    seg.append(Segment(type=1, clist=clO_pickled, instrument="AUD_USD",
+                       start_ix=20, end_ix=35))
+    assert seg.end() == clO_pickled.candles[34].time
+    assert len(seg.clist) == 25
+    seg.prepend(Segment(type=1, clist=clO_pickled, instrument="AUD_USD",
+                        start_ix=5, end_ix=10))
+    assert seg.start() == clO_pickled.candles[5].time
+    assert len(seg.clist) == 30
+
+
+def test_pickle(pivotlist, tmp_path):
+    """The Segments of a PivotList share their CandleList when pickled"""
+    slist = pivotlist.slist
+    outfile = slist.pickle_dump(f"{tmp_path}/seglist.pckl")
+    new_slist = SegmentList.pickle_load(outfile)
+
+    assert [(s.start(), s.end(), s.diff) for s in new_slist.slist] == \
+        [(s.start(), s.end(), s.diff) for s in slist.slist]
+    assert all(s.parent is new_slist[0].parent for s in new_slist.slist)
@@ -39,3 +39,37 @@ def test_fetch_by_end(seglist_pickled):
     s = seglist_pickled.fetch_by_end(adt)
 
     assert s.end() == adt
+
+
+def fetch_by_start_scan(seglist, dt, max_diff=3600):
+    for s in seglist.slist:
+        if s.start() >= dt - datetime.timedelta(0, max_diff):
+            return s
+
+
+def fetch_by_end_scan(seglist, dt, max_diff=3600):
+    for s in reversed(seglist.slist):
+        if s.end() <= dt + datetime.timedelta(0, max_diff):
+            return s
+
+
+def test_fetch_after_merge(pivotlist):
+    """The Segments found are the ones found by scanning the list, also
+    when the merges leave the Segments out of order"""
+    seglist = pivotlist.slist
+    for price in (0.65, 0.7, 0.75, 0.8, 0.95):
+        pivotlist.inarea_pivots(price=price)
+    starts = [s.start() for s in seglist.slist]
+    assert starts != sorted(starts)
+
+    for s in seglist.slist[::5]:
+        for dt in (s.start(), s.end(),
+                   s.start() - datetime.timedelta(hours=30),
+                   s.end() + datetime.timedelta(hours=2)):
+            for max_diff in (0, 3600, 86400 * 5):
+                assert seglist.fetch_by_start(dt, max_diff) is \
+                    fetch_by_start_scan(seglist, dt, max_diff)
+                assert seglist.fetch_by_end(dt, max_diff) is \
+                    fetch_by_end_scan(seglist, dt, max_diff)
+    assert seglist.fetch_by_start(datetime.datetime(2030, 1, 1)) is None
+    assert seglist.fetch_by_end(datetime.datetime(2000, 1, 1)) is None
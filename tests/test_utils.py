@@ -1,7 +1,8 @@
 import pytest
 import datetime
 
-from utils import calculate_profit, is_even_hour
+from utils import (calculate_profit, is_even_hour, parse_times, to_epoch,
+                   granularity_seconds)
 
 prices = [((0.69200, 0.68750), "short", "AUD_USD", -45),
           ((0.69200, 0.68750), "long", "AUD_USD", 45),
@@ -23,3 +24,42 @@ datetimes = [(datetime.datetime(2015, 2, 28, 22, 0, 0), True),
 def test_is_even_hour(datetime, expected):
     res = is_even_hour(datetime)
     assert res == expected, "Non-correct time info"
+
+
+times = [("2019-05-07T21:00:00.000000000Z", datetime.datetime(2019, 5, 7, 21)),
+         ("2019-05-07T21:00:00", datetime.datetime(2019, 5, 7, 21)),
+         ("2019-05-07 21:00:00", datetime.datetime(2019, 5, 7, 21)),
+         ("07/05/2019 21:00:00", datetime.datetime(2019, 5, 7, 21)),
+         ("2019-05-07T23:00:00+02:00", datetime.datetime(2019, 5, 7, 21)),
+         ("2019-05-07T16:30:00.000-04:30", datetime.datetime(2019, 5, 7, 21)),
+         (datetime.datetime(2019, 5, 7, 23, tzinfo=datetime.timezone(
+             datetime.timedelta(hours=2))), datetime.datetime(2019, 5, 7, 21)),
+         (datetime.datetime(2019, 5, 7, 21), datetime.datetime(2019, 5, 7, 21))]
+
+
+@pytest.mark.parametrize("atime,expected", times)
+def test_parse_times(atime, expected):
+    res = parse_times([atime, "2020-01-01T00:00:00"])
+    assert res.tolist() == [to_epoch(expected),
+                            to_epoch(datetime.datetime(2020, 1, 1))]
+
+
+@pytest.mark.parametrize("atime", ["", "2019-05-07", "2019-13-07T21:00:00",
+                                   "2019-05-07T21:00:00garbage",
+                                   "2019-05-07T21:00:00+0200"])
+def test_parse_times_invalid(atime):
+    with pytest.raises(ValueError):
+        parse_times(["2019-05-07T21:00:00", atime])
+
+
+@pytest.mark.parametrize("granularity,expected", [("M30", 1800),
+                                                  ("H1", 3600),
+                                                  ("H8", 28800),
+                                                  ("D", 86400)])
+def test_granularity_seconds(granularity, expected):
+    assert granularity_seconds(granularity) == expected
+
+
+def test_granularity_seconds_invalid():
+    with pytest.raises(ValueError):
+        granularity_seconds("2D")
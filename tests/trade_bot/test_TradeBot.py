@@ -3,9 +3,10 @@ import os
 import pytest
 import glob
 
-from params import tradebot_params, pivots_params
+from params import tradebot_params, pivots_params, gparams
 from trade_bot.trade_bot import TradeBot
 from forex.candle import CandleList
+from forex.candle_archive import CandleArchive
 from utils import DATA_DIR
 
 # create logger
@@ -172,3 +173,19 @@ def test_prepare_trades_pips(clO_pickled,
         clist=clO_pickled)
     tl = tb.prepare_trades(pretrades=scan_pickled)
     assert len(tl) == 5 or len(tl) == 4
+
+
+def test_init_clist_archive(clO_pickled, tmp_path, monkeypatch):
+    """TradeBot reads its CandleList from the archive when it covers the
+    time range"""
+    archive = CandleArchive(f"{tmp_path}/archive")
+    archive.save(clO_pickled)
+    monkeypatch.setattr(gparams, "archive_dir", archive.root)
+
+    tb = TradeBot(pair='AUD_USD',
+                  timeframe='D',
+                  start='2019-06-03 21:00:00',
+                  end='2019-07-01 21:00:00')
+
+    assert tb.clist.candles[-1].time == tb.end
+    assert tb.clist.candles[0].time >= tb.start - tb.delta_period
@@ -1,11 +1,16 @@
 import pytest
+import datetime
 
-from forex.candle import Candle
+from forex.candle import Candle, CandleList
+from forex.candle_archive import CandleArchive
+from params import gparams, trade_params
 from trading_journal.trade_utils import (
     get_closest_hour,
     process_start,
     adjust_SL,
-    check_timeframes_fractions)
+    check_timeframes_fractions,
+    init_clist,
+    CandlePrefetcher)
 from data_for_tests import start_hours
 
 hour_data = [(9, "H8", 5), (21, "H8", 21), (17, "H8", 13)]
@@ -72,3 +77,73 @@ def test_adjust_sl(mock_candle_list):
             pair="AUD_USD", type=trade_types[ix], list_candles=tri_candle
         )
         assert sl_adjusted[ix] == new_SL
+
+
+def test_init_clist_archive(clO_pickled, tmp_path, monkeypatch):
+    """init_clist reads the candles from the archive when it covers the
+    time range"""
+    archive = CandleArchive(f"{tmp_path}/archive")
+    archive.save(clO_pickled)
+    monkeypatch.setattr(gparams, "archive_dir", archive.root)
+    monkeypatch.setattr(trade_params, "trade_period", 100)
+
+    clO = init_clist(timeframe="D", pair="AUD_USD",
+                     start=datetime.datetime(2019, 7, 1, 21, 0))
+
+    assert len(clO) == 72
+    assert clO.candles[-1].time == datetime.datetime(2019, 7, 1, 21, 0)
+
+
+def test_adjust_sl_clist():
+    """Test 'adjust_sl' function with a CandleList"""
+    for ix in range(len(high_low_candles)):
+        high, low = zip(*high_low_candles[ix])
+        clO = CandleList.from_arrays("AUD_USD", "D", time=[0, 86400, 172800],
+                                     o=low, h=high, l=low, c=low)
+        new_SL = adjust_SL(
+            pair="AUD_USD", type=trade_types[ix], list_candles=clO
+        )
+        assert sl_adjusted[ix] == new_SL
+
+
+def test_candle_prefetcher(fake_api):
+    """The candles for consecutive datetimes are fetched with a single
+    query"""
+    prefetcher = CandlePrefetcher(pair="AUD_USD", timeframe="D")
+    start = datetime.datetime(2019, 5, 1, 21, 0)
+    candles = [prefetcher.fetch_candle(start + datetime.timedelta(days=x))
+               for x in range(30)]
+
+    assert fake_api.n_requests == 1
+    assert len([c for c in candles if c is not None]) == 22
+    assert candles[0] == fake_api.clO[start]
+    # 2019-05-03 21:00 is Friday
+    assert candles[2] is None
+
+    # datetimes after the fetched ones trigger a new query
+    assert prefetcher.fetch_candle(start + datetime.timedelta(days=70)) \
+        .time == datetime.datetime(2019, 7, 10, 21, 0)
+    assert fake_api.n_requests == 2
+
+
+def test_init_clist_error(fake_api, monkeypatch):
+    """An empty CandleList is returned if the API returns an error"""
+    monkeypatch.setattr(gparams, "archive_dir", None)
+    fake_api.errors = [400]
+
+    clO = init_clist(timeframe="D", pair="AUD_USD",
+                     start=datetime.datetime(2019, 5, 1, 21, 0))
+    assert clO.instrument == "AUD_USD"
+    assert len(clO.candles) == 0
+
+
+def test_candle_prefetcher_error(fake_api):
+    """None is returned if the API returns an error and the candles are
+    queried again for the next datetime"""
+    prefetcher = CandlePrefetcher(pair="AUD_USD", timeframe="D")
+    start = datetime.datetime(2019, 5, 1, 21, 0)
+    fake_api.errors = [400]
+
+    assert prefetcher.fetch_candle(start) is None
+    assert prefetcher.fetch_candle(start) == fake_api.clO[start]
+    assert fake_api.n_requests == 2
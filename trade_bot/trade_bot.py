@@ -5,7 +5,9 @@ import re
 from datetime import datetime, timedelta
 from typing import List
 from api.oanda.connect import Connect
+from api.oanda.governor import APIError
 from forex.candle import CandleList, Candle
+from forex.candle_archive import CandleArchive
 from forex.harea import HAreaList
 from params import gparams, tradebot_params, pivots_params
 from forex.pivot import PivotList
@@ -81,11 +83,23 @@ class TradeBot(object):
         conn = Connect(
             instrument=self.pair,
             granularity=self.timeframe)
-        if tradebot_params.period_range > 4899:
-            tradebot_params.period_range = 4899
         initc_date = self.start-self.delta_period
 
-        clO = conn.query(initc_date.isoformat(), self.end.isoformat())
+        if gparams.archive_dir:
+            archive = CandleArchive(gparams.archive_dir)
+            if archive.covers(self.pair, self.timeframe, initc_date,
+                              self.end):
+                self.clist = archive.load(self.pair, self.timeframe,
+                                          initc_date, self.end)
+                return
+
+        try:
+            clO = conn.query(initc_date.isoformat(), self.end.isoformat())
+        except APIError as err:
+            tb_logger.error(f"Could not fetch the candles for {self.pair} "
+                            f"{self.timeframe}: {err}")
+            clO = CandleList(instrument=self.pair,
+                             granularity=self.timeframe)
         self.clist = clO
 
     def scan(self, prefix: str = 'pretrades', discard_sat: bool = True,
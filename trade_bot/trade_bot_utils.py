@@ -153,22 +153,13 @@ def adjust_SL_candles(type: str, clObj: CandleList, number: int = 7) -> float:
     Returns:
         adjusted SL
     """
-    SL, ix = None, 0
-    if not clObj.candles:
+    if len(clObj) == 0:
         raise Exception("No candles in CandleList. Can't calculate the SL")
-    for c in reversed(clObj.candles):
-        # go back 'number' candles
-        if ix == number:
-            break
-        ix += 1
-        if type == "short":
-            if SL is None:
-                SL = c.h
-            elif c.h > SL:
-                SL = c.h
-        if type == "long":
-            if SL is None:
-                SL = c.l
-            if c.l < SL:
-                SL = c.l
-    return SL
+    if number <= 0:
+        return None
+    # go back 'number' candles
+    start = max(len(clObj) - number, 0)
+    if type == "short":
+        return clObj.extrema("h").max(start)
+    if type == "long":
+        return clObj.extrema("l").min(start)
@@ -4,7 +4,6 @@ import math
 from datetime import datetime, timedelta
 
 from trading_journal.trade import Trade
-from api.oanda.connect import Connect
 from forex.harea import HArea
 from forex.candle import Candle
 from utils import (
@@ -68,11 +67,8 @@ class OpenTrade(Trade):
             cl_tm = self.clist_tm[new_datetime]
             if cl_tm is None:
                 if self.connect is True:
-                    conn = Connect(
-                        instrument=self.pair,
-                        granularity=trade_management_timeframe
-                    )
-                    cl_tm = conn.fetch_candle(d=new_datetime)
+                    cl_tm = self.prefetcher(trade_management_timeframe)\
+                        .fetch_candle(d=new_datetime)
             if cl_tm is not None:
                 if cl_tm not in self.preceding_candles:
                     self.preceding_candles.append(cl_tm)
@@ -146,15 +142,14 @@ class OpenTrade(Trade):
             return None
         if cl is None:
             if self.connect is True:
-                conn = Connect(instrument=self.pair,
-                               granularity=self.timeframe)
-                cl = conn.fetch_candle(d=d)
+                prefetcher = self.prefetcher(self.timeframe)
+                cl = prefetcher.fetch_candle(d=d)
                 if cl is None:
                     if is_even_hour(d):
                         d = d - timedelta(seconds=3600)
                     else:
                         d = d + timedelta(seconds=3600)
-                    cl = conn.fetch_candle(d=d)
+                    cl = prefetcher.fetch_candle(d=d)
         return cl
 
     def isin_profit(self, price: float) -> bool:
@@ -2,7 +2,6 @@ from __future__ import division
 import logging
 
 from trading_journal.constants import ALLOWED_ATTRBS
-from api.oanda.connect import Connect
 from datetime import datetime
 from forex.harea import HArea
 from forex.pivot import PivotList
@@ -15,7 +14,8 @@ from utils import (
 from trading_journal.trade_utils import (
     gen_datelist,
     check_candle_overlap,
-    init_clist
+    init_clist,
+    CandlePrefetcher
 )
 from params import trade_params, trade_management_params
 
@@ -64,6 +64,8 @@ class Trade:
         self.__dict__.update((k, v) for k, v in kwargs.items() if
                              k in ALLOWED_ATTRBS)
         self.init_clist = init_clist
+        # CandlePrefetcher objects for the candles missing from the clists
+        self.prefetchers = {}
         self._preinit__()
         self._validate_clists()
         self.entry = self.init_harea(entry) if not isinstance(entry, HArea) else entry
@@ -87,6 +89,14 @@ class Trade:
                           granularity=self.timeframe)
         return harea_obj
 
+    def prefetcher(self, timeframe: str) -> CandlePrefetcher:
+        """Function to get the CandlePrefetcher used to fetch the candles
+        of 'timeframe' that are missing from the clists"""
+        if timeframe not in self.prefetchers:
+            self.prefetchers[timeframe] = CandlePrefetcher(pair=self.pair,
+                                                           timeframe=timeframe)
+        return self.prefetchers[timeframe]
+
     def _validate_clists(self):
         """Method to check the validity of the clists"""
         if hasattr(self, "clist"):
@@ -119,9 +129,7 @@ class Trade:
             cl = self.clist[d]
             if cl is None:
                 if connect is True:
-                    conn = Connect(instrument=self.pair,
-                                   granularity=self.timeframe)
-                    cl = conn.fetch_candle(d=d)
+                    cl = self.prefetcher(self.timeframe).fetch_candle(d=d)
                 if cl is None:
                     count -= 1
                     continue
@@ -1,15 +1,18 @@
 # Collection of utilities used by the trade.py module
 import logging
 from typing import List
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from utils import (periodToDelta,
+                   granularity_seconds,
                    try_parsing_date,
                    add_pips2price,
                    substract_pips2price)
-from params import trade_params
+from params import trade_params, gparams
 from api.oanda.connect import Connect
+from api.oanda.governor import APIError
 from forex.candle import Candle, CandleList
+from forex.candle_archive import CandleArchive
 
 t_logger = logging.getLogger(__name__)
 t_logger.setLevel(logging.INFO)
@@ -92,10 +95,86 @@ def init_clist(timeframe: str, pair: str, start: datetime) -> CandleList:
         start = try_parsing_date(start)
     nstart = start - delta
 
+    if gparams.archive_dir:
+        archive = CandleArchive(gparams.archive_dir)
+        if archive.covers(pair, timeframe, nstart, start):
+            return archive.load(pair, timeframe, nstart, start)
+
     conn = Connect(
         instrument=pair,
         granularity=timeframe)
-    return conn.query(nstart.isoformat(), start.isoformat())
+    try:
+        return conn.query(nstart.isoformat(), start.isoformat())
+    except APIError as err:
+        t_logger.error(f"Could not fetch the candles for {pair} "
+                       f"{timeframe}: {err}")
+        return CandleList(instrument=pair, granularity=timeframe)
+
+
+class CandlePrefetcher(object):
+    """Class to fetch the candles missing from the CandleLists of a
+    Trade. Instead of doing a query for each datetime (see
+    Connect.fetch_candle), the first datetime that is missing triggers the
+    query of the following 'ncandles' candles, and the next datetimes are
+    taken from them
+
+    Class variables:
+        pair: Currency pair. i.e. AUD_USD
+        timeframe: Timeframe of the candles. i.e. D, H8, ...
+        ncandles: Number of candles fetched by each query
+        clist: CandleList with the candles fetched so far
+    """
+
+    __slots__ = ["pair", "timeframe", "ncandles", "clist", "_ranges"]
+
+    def __init__(self, pair: str, timeframe: str, ncandles: int = None):
+        self.pair = pair
+        self.timeframe = timeframe
+        # a trade is run for at most 'numperiods' candles, but there are
+        # no candles during the weekends
+        self.ncandles = ncandles or 2 * trade_params.numperiods
+        self.clist = None
+        # time ranges that have been fetched
+        self._ranges = []
+
+    def fetch_candle(self, d: datetime) -> Candle:
+        """Function to get the Candle for a datetime. As Connect.fetch_candle,
+        Candles starting 1h after or before 'd' are also considered
+
+        Returns:
+            Candle. None if there is no Candle for 'd'
+        """
+        if not any(start <= d <= end for start, end in self._ranges):
+            self._prefetch(d)
+        if self.clist is None:
+            return None
+        return self.clist[d]
+
+    def _prefetch(self, d: datetime) -> None:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if d > now:
+            return
+        end = min(d + timedelta(seconds=self.ncandles *
+                                granularity_seconds(self.timeframe)), now)
+        hour = timedelta(hours=1)
+        conn = Connect(instrument=self.pair, granularity=self.timeframe)
+        try:
+            clO = conn.query((d - hour).isoformat(timespec="seconds"),
+                             min(end + hour, now).isoformat(timespec="seconds"))
+        except APIError as err:
+            # the time range is not recorded as fetched, so it is queried
+            # again for the next datetime in it
+            t_logger.error(f"Could not fetch the candles for {self.pair} "
+                           f"{self.timeframe} ({d}-{end}): {err}")
+            return
+        t_logger.debug(f"Prefetched {len(clO)} {self.timeframe} candles "
+                       f"for {self.pair} ({d}-{end})")
+        self.clist = clO if self.clist is None else \
+            CandleList.concat([self.clist, clO])
+        self._ranges.append((d, end))
+
+    def __repr__(self):
+        return "CandlePrefetcher"
 
 
 def adjust_SL(pair: str, type: str, list_candles=List[Candle],
@@ -105,9 +184,17 @@ def adjust_SL(pair: str, type: str, list_candles=List[Candle],
     Arguments:
         pair: Instrument
         type: Trade type (short/long)
-        list_candles: List of candles
+        list_candles: List of candles or CandleList
         pips_offset: Number of pips to offset to obj.h and obj.l
     """
+    if isinstance(list_candles, CandleList):
+        if type == "short":
+            return add_pips2price(pair, list_candles.extrema("h").max(),
+                                  pips_offset)
+        if type == "long":
+            return substract_pips2price(pair, list_candles.extrema("l").min(),
+                                        pips_offset)
+
     if type == "short":
         max_candle = max(list_candles, key=lambda obj: obj.h)
         new_high = add_pips2price(pair, max_candle.h, pips_offset)
@@ -2,13 +2,26 @@ import re
 import os
 from typing import Tuple
 
-from datetime import datetime, timedelta
+import numpy as np
+
+from datetime import datetime, timedelta, timezone
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # location of directory used to store all data used by Unit Tests
 DATA_DIR = ROOT_DIR+"/tests/data"
 
+# reference used to store datetimes as number of seconds
+EPOCH = datetime(1970, 1, 1)
+
+# RFC3339 datetime as returned by the API. The offset is optional
+_RFC3339 = re.compile(r"(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:\.\d+)?"
+                      r"(?:Z|([+-])(\d{2}):(\d{2}))?")
+# newline-separated UTC datetimes that numpy parses once truncated to
+# 19 characters
+_UTC_TIME = r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?Z?"
+_UTC_TIMES = re.compile(rf"(?:{_UTC_TIME}\n)*{_UTC_TIME}")
+
 
 def try_parsing_date(date_string) -> datetime:
     """Function to parse a string that can be formatted in
@@ -29,6 +42,61 @@ def try_parsing_date(date_string) -> datetime:
     raise ValueError(f"no valid date format found: {date_string}")
 
 
+def parse_times(times) -> np.ndarray:
+    """Function to parse a sequence of datetimes (strings in any of the
+    formats accepted by try_parsing_date, RFC3339 strings as returned by
+    the API or datetime objects) all at once. Times with an offset are
+    converted to UTC
+
+    Returns:
+        int64 array with the number of seconds elapsed since EPOCH
+
+    Raises:
+        ValueError if a string is not in any of these formats
+    """
+    times = list(times)
+    try:
+        joined = "\n".join(times)
+    except TypeError:
+        joined = None
+    if joined is not None and _UTC_TIMES.fullmatch(joined):
+        # the API returns i.e. '2019-05-07T21:00:00.000000000Z', the
+        # fractional seconds and the 'Z' are discarded
+        return np.array(times, dtype="U19").astype(
+            "datetime64[s]").astype(np.int64)
+    return np.array([_parse_time(t) for t in times], dtype=np.int64)
+
+
+def _parse_time(t) -> int:
+    """Function to parse a single datetime. See parse_times"""
+    if isinstance(t, datetime):
+        if t.tzinfo is not None:
+            t = t.astimezone(timezone.utc).replace(tzinfo=None)
+        return to_epoch(t)
+    m = _RFC3339.fullmatch(t)
+    if m is None:
+        return to_epoch(try_parsing_date(t))
+    date, hour, sign, oh, om = m.groups()
+    seconds = to_epoch(datetime.strptime(f"{date}T{hour}",
+                                         "%Y-%m-%dT%H:%M:%S"))
+    if sign is not None:
+        offset = int(oh) * 3600 + int(om) * 60
+        seconds -= offset if sign == "+" else -offset
+    return seconds
+
+
+def to_epoch(d: datetime) -> int:
+    """Function to convert a naive (UTC) datetime to the number
+    of seconds elapsed since EPOCH"""
+    return (d - EPOCH) // timedelta(seconds=1)
+
+
+def from_epoch(seconds: int) -> datetime:
+    """Function to convert a number of seconds elapsed since
+    EPOCH to a naive (UTC) datetime"""
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
 def calculate_pips(pair: str, price: float) -> float:
     '''Function to calculate the number of pips
     for a given price
@@ -133,6 +201,25 @@ def periodToDelta(ncandles: int, timeframe: str):
     return delta
 
 
+def granularity_seconds(granularity: str) -> int:
+    """Function to get the number of seconds spanned by a candle
+
+    Arguments:
+        granularity: Oanda's granularity. i.e. M30, H1, H8, D, W. Monthly
+                     candles ('M') do not have a fixed length
+
+    Returns:
+        number of seconds
+    """
+    units = {"S": 1, "M": 60, "H": 3600, "D": 86400, "W": 604800}
+    m = re.match(r"^(?:([SMH])(\d+)|([DW]))$", granularity)
+    if m is None:
+        raise ValueError(f"Invalid granularity: {granularity}")
+    if m.group(3):
+        return units[m.group(3)]
+    return units[m.group(1)] * int(m.group(2))
+
+
 def get_ixfromdatetimes_list(datetimes_list, d) -> int:
     """Function to get the index of the element that is closest
     to the passed datetime